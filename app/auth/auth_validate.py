@@ -1,10 +1,19 @@
-"""auth_validate.py - checks if request has valid JWT token"""
+"""
+auth_validate.py - checks if request has valid JWT token
 
-from fastapi import Header, HTTPException
-from ..utils.jwt_util import decode_jwt_token
+Tokens are checked through auth/token_cache.py: the signature is verified
+once per token, later requests with the same token are a dictionary lookup.
+The dependencies are async so FastAPI runs them on the event loop instead of
+sending every request through the threadpool.
+"""
 
+from typing import Optional
 
-def auth_validate(authorization: str = Header(...)):
+from fastapi import Header, HTTPException, Query
+from .token_cache import token_cache
+
+
+async def auth_validate(authorization: str = Header(...)):
     """validates JWT from Authorization header, returns user data or 401"""
 
     if authorization is None:
@@ -14,9 +23,35 @@ def auth_validate(authorization: str = Header(...)):
         raise HTTPException(status_code=401, detail="Invalid format. Use: Bearer <token>")
 
     token = authorization.split(" ")[1]
-    user_data = decode_jwt_token(token)
+    user_data = token_cache.verify(token)
+
+    if user_data is None:
+        raise HTTPException(status_code=401, detail="Invalid, expired or revoked token")
+
+    return user_data
+
+
+async def auth_validate_stream(
+    token: Optional[str] = Query(default=None),
+    authorization: Optional[str] = Header(default=None)
+):
+    """
+    Same check for streaming endpoints.
+    Browsers' EventSource can't send headers, so the token may also
+    come as ?token=<jwt>.
+    """
+
+    if token is None and authorization is not None:
+        if not authorization.startswith("Bearer "):
+            raise HTTPException(status_code=401, detail="Invalid format. Use: Bearer <token>")
+        token = authorization.split(" ")[1]
+
+    if token is None:
+        raise HTTPException(status_code=401, detail="Token missing")
+
+    user_data = token_cache.verify(token)
 
     if user_data is None:
-        raise HTTPException(status_code=401, detail="Invalid or expired token")
+        raise HTTPException(status_code=401, detail="Invalid, expired or revoked token")
 
     return user_data
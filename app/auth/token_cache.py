@@ -0,0 +1,163 @@
+"""
+token_cache.py - Remembers tokens that were already verified
+=============================================================
+
+What this file does:
+- Checking a JWT signature on every request is wasted work for dashboards
+  that poll every few seconds with the same token
+- After a token is verified once, its payload is kept in an LRU cache,
+  keyed by a SHA-256 digest of the token (the token itself is not stored)
+  until the token's own "exp" time
+- A compact denylist revokes tokens before they expire:
+    by "jti"      - one token (logout), kept only until that token's exp
+    by user id    - every token of a user issued before a moment
+- Counts cache hits/misses and how long real verification takes
+  (shown on GET /metrics)
+
+Settings (environment variables):
+- JWT_CACHE_SIZE  verified tokens kept (default 10000)
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from ..utils.jwt_util import decode_jwt_token, TOKEN_EXPIRY_MINUTES
+
+
+# ============ SETTINGS ============
+CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "10000"))
+
+# Expired denylist entries are cleaned up at most this often (seconds)
+PURGE_INTERVAL = 60
+
+
+def token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+class TokenCache:
+    """
+    Verified-token LRU + denylist.
+    Used from request handlers (and threadpool code), so one lock.
+    """
+
+    def __init__(self, size: int = CACHE_SIZE):
+        self.size = size
+        self.lock = threading.Lock()
+        self.tokens = OrderedDict()     # digest -> (payload, exp)
+        self.revoked_ids = {}           # jti -> exp
+        self.revoked_before = {}        # user_id -> epoch seconds, tokens issued earlier are revoked
+        self.last_purge = time.time()
+
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self.verifications = 0
+        self.verify_seconds = 0.0
+        self.max_verify_seconds = 0.0
+
+    # ============ CHECK ============
+    def _is_revoked(self, payload: dict) -> bool:
+        if payload.get("jti") in self.revoked_ids:
+            return True
+        cutoff = self.revoked_before.get(payload.get("user_id"))
+        return cutoff is not None and payload.get("iat", 0) < cutoff
+
+    def verify(self, token: str):
+        """payload of a valid, unrevoked token - or None"""
+        digest = token_digest(token)
+        now = time.time()
+
+        # Step 1: already verified?
+        with self.lock:
+            entry = self.tokens.get(digest)
+            if entry is not None:
+                payload, exp = entry
+                if exp > now:
+                    self.tokens.move_to_end(digest)
+                    self.hits += 1
+                    if self._is_revoked(payload):
+                        self.rejected += 1
+                        return None
+                    return payload
+                del self.tokens[digest]
+            self.misses += 1
+
+        # Step 2: real signature + expiry check
+        started = time.perf_counter()
+        payload = decode_jwt_token(token)
+        elapsed = time.perf_counter() - started
+
+        with self.lock:
+            self.verifications += 1
+            self.verify_seconds += elapsed
+            self.max_verify_seconds = max(self.max_verify_seconds, elapsed)
+
+            if payload is None:
+                self.rejected += 1
+                return None
+
+            # Step 3: remember it until it expires
+            # (tokens without exp are never cached - they'd live forever)
+            if "exp" in payload:
+                self.tokens[digest] = (payload, payload["exp"])
+                while len(self.tokens) > self.size:
+                    self.tokens.popitem(last=False)
+
+            if self._is_revoked(payload):
+                self.rejected += 1
+                return None
+
+        return payload
+
+    # ============ REVOKE ============
+    def revoke(self, payload: dict):
+        """revoke one token (its jti) until it would have expired anyway"""
+        with self.lock:
+            if payload.get("jti"):
+                self.revoked_ids[payload["jti"]] = payload.get("exp", time.time())
+            self._purge()
+
+    def revoke_user(self, user_id: int, before: float = None):
+        """revoke every token issued to a user until now (or until `before`)"""
+        with self.lock:
+            self.revoked_before[user_id] = before if before is not None else time.time()
+            self._purge()
+
+    def _purge(self):
+        """drop denylist entries whose tokens have expired by now"""
+        now = time.time()
+        if now - self.last_purge < PURGE_INTERVAL:
+            return
+        self.last_purge = now
+        self.revoked_ids = {jti: exp for jti, exp in self.revoked_ids.items() if exp > now}
+
+        # tokens issued before the cutoff have all expired one lifetime later
+        lifetime = TOKEN_EXPIRY_MINUTES * 60
+        self.revoked_before = {
+            user_id: cutoff for user_id, cutoff in self.revoked_before.items()
+            if cutoff + lifetime > now
+        }
+
+    # ============ METRICS ============
+    def stats(self) -> dict:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "cached_tokens": len(self.tokens),
+                "revoked_tokens": len(self.revoked_ids),
+                "revoked_users": len(self.revoked_before),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "rejected": self.rejected,
+                "avg_verify_us": round(self.verify_seconds / self.verifications * 1e6, 1) if self.verifications else 0.0,
+                "max_verify_us": round(self.max_verify_seconds * 1e6, 1)
+            }
+
+
+# One shared cache for the whole process
+token_cache = TokenCache()
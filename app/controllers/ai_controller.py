@@ -5,15 +5,22 @@ What this file does:
 - Get AI market summary: GET /ai/market-summary/{asset_name}
 
 This API uses AI to analyze market data and give insights.
+Summaries are precomputed in the background (services/digest_service.py),
+so a request only reads the stored one. Assets without a stored summary yet
+are answered on demand, cached per asset and shared between concurrent
+requests (services/ai_cache.py).
 """
 
 
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-
-from ..database import SessionLocal
-from ..models.market_model import MarketPrice
-from ..services.ai_service import generate_ai_response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import ReadAsyncSessionLocal, get_read_db
+from ..services.price_cache import get_recent_prices
+from ..services.ai_service import generate_ai_response, history_series
+from ..services.ai_cache import ai_cache, window_hash
+from ..services.digest_service import digest_service
+from ..services.risk_engine import risk_engine
 from ..utils.risk_utils import calculate_risk
 from ..utils.forecast_utils import analyze_trend
 
@@ -26,45 +33,51 @@ router = APIRouter(
 )
 
 
-#  DATABASE SESSION 
-def get_db():
-    """
-    Creates a database session for each request.
-    """
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 #  GET MARKET SUMMARY 
 @router.get("/market-summary/{asset_name}")
-def market_summary(asset_name: str, db: Session = Depends(get_db)):
+async def market_summary(asset_name: str, db: AsyncSession = Depends(get_read_db)):
    
     
-    # Step 1: Get recent prices from database
-    prices = (
-        db.query(MarketPrice)
-        .filter(MarketPrice.asset_name == asset_name)
-        .order_by(MarketPrice.timestamp.desc())
-        .limit(10)
-        .all()
-    )
-
-    # Step 2: Calculate risk level
-    risk = calculate_risk(prices)
+    # Step 0: Precomputed summary - just read it
+    digest = digest_service.get(asset_name)
+    if digest is not None:
+        return {
+            "asset": asset_name,
+            "risk": digest["risk"],
+            "risk_metrics": risk_engine.asset_risk(asset_name),
+            "trend": digest["trend"],
+            "analysis": digest["analysis"],
+            "generated_at": digest["generated_at"],
+            "cache": "digest"
+        }
+
+    # Step 1: Get recent prices (price cache, database only on a miss)
+    prices = await get_recent_prices(db, asset_name, 10)
+
+    # Step 2: Risk level from volatility (cached until the next tick),
+    # or from these few prices if the asset has no cached history
+    risk_metrics = risk_engine.asset_risk(asset_name)
+    risk = risk_metrics["label"] if risk_metrics else calculate_risk(prices)
 
     # Step 3: Analyze price trend
     trend = analyze_trend(prices)
 
-    # Step 4: Get AI analysis
-    ai_result = generate_ai_response(asset_name, prices, risk)
+    # Step 4: Get AI analysis - from the cache, or one shared (async) AI call
+    # (may run after this request is done - single-flight task or background
+    # refresh - so it opens its own session instead of using `db`)
+    async def ask_ai():
+        async with ReadAsyncSessionLocal() as history_db:
+            series = await history_series(history_db, asset_name)
+        return await generate_ai_response(asset_name, prices, risk, series)
+
+    ai_result, cache_status = await ai_cache.get(asset_name, window_hash(prices, risk), ask_ai)
 
     # Step 5: Return all analysis data
     return {
         "asset": asset_name,
         "risk": risk,
+        "risk_metrics": risk_metrics,
         "trend": trend,
-        "analysis": ai_result.get("analysis", ai_result.get("ai_answer", ""))
+        "analysis": ai_result.get("analysis", ai_result.get("ai_answer", "")),
+        "cache": cache_status
     }
@@ -1,32 +1,38 @@
-""" create and check price alerts"""
-
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-
-from ..database import SessionLocal
-from ..models.alert_model import Alert
-from ..models.market_model import MarketPrice
-from ..schemas.alert_schema import AlertCreate, AlertResponse
-from ..auth.auth_validate import auth_validate
+""" create and check price alerts
+
+Alerts are evaluated on every tick by the alert engine (alert_engine.py),
+fired alerts are stored in alert_events:
+- GET /alerts/events lists them
+- GET /alerts/stream pushes them live (Server-Sent Events), and replays
+  missed ones after a reconnect (Last-Event-ID)
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import get_db, get_read_db
+from ..models.alert_model import Alert, AlertEvent
+from ..services.price_cache import get_recent_prices
+from ..schemas.alert_schema import AlertCreate, AlertResponse, AlertEventResponse
+from ..auth.auth_validate import auth_validate, auth_validate_stream
 from ..services.alert_service import check_alert
+from ..services.alert_engine import alert_engine, publish_events
+from ..services.alert_stream import stream_alerts
+from ..services.broadcast import broadcast
 
 
 router = APIRouter(prefix="/alerts", tags=["Alerts"])
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @router.post("/", response_model=AlertResponse)
-def create_alert(
+async def create_alert(
     alert: AlertCreate,
     current_user=Depends(auth_validate),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """create a new price alert for the logged-in user"""
     new_alert = Alert(
@@ -36,33 +42,66 @@ def create_alert(
         condition=alert.condition
     )
     db.add(new_alert)
-    db.commit()
-    db.refresh(new_alert)
+    await db.commit()
+    await db.refresh(new_alert)
+
+    # start watching it (here and on the other workers);
+    # if the price is already past the target, fire now (and disarm it)
+    broadcast.publish("alert", {
+        "id": new_alert.id,
+        "user_id": new_alert.user_id,
+        "asset_name": new_alert.asset_name,
+        "condition": new_alert.condition,
+        "target_price": new_alert.target_price
+    })
+    if alert_engine.add_alert(new_alert):
+        latest_price = (await get_recent_prices(db, new_alert.asset_name, 1))[0]
+        event = AlertEvent(
+            alert_id=new_alert.id,
+            user_id=new_alert.user_id,
+            asset_name=new_alert.asset_name,
+            condition=new_alert.condition,
+            target_price=new_alert.target_price,
+            price=latest_price.price
+        )
+        db.add(event)
+        new_alert.armed = False
+        await db.commit()
+        publish_events([{
+            "id": event.id,
+            "alert_id": event.alert_id,
+            "user_id": event.user_id,
+            "asset_name": event.asset_name,
+            "condition": event.condition,
+            "target_price": event.target_price,
+            "price": event.price,
+            "triggered_at": event.triggered_at
+        }])
+
     return new_alert
 
 
 @router.get("/check")
-def check_my_alerts(
+async def check_my_alerts(
     current_user=Depends(auth_validate),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """check if any alerts are triggered based on current prices"""
     user_id = current_user["user_id"]
-    alerts = db.query(Alert).filter(Alert.user_id == user_id).all()
+    result = await db.execute(select(Alert).where(Alert.user_id == user_id))
+    alerts = result.scalars().all()
 
     triggered_alerts = []
 
     for alert in alerts:
-        latest_price = (
-            db.query(MarketPrice)
-            .filter(MarketPrice.asset_name == alert.asset_name)
-            .order_by(MarketPrice.timestamp.desc())
-            .first()
-        )
+        # latest price comes from the in-memory cache, not one query per alert
+        recent = await get_recent_prices(db, alert.asset_name, 1)
 
-        if not latest_price:
+        if not recent:
             continue
 
+        latest_price = recent[0]
+
         if check_alert(alert, latest_price.price):
             message = (
                 f"{alert.asset_name} price is {latest_price.price}, "
@@ -72,3 +111,43 @@ def check_my_alerts(
 
     return {"alerts": triggered_alerts}
 
+
+
+@router.get("/events", response_model=list[AlertEventResponse])
+async def get_my_alert_events(
+    limit: int = Query(default=50, le=500),
+    current_user=Depends(auth_validate),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """alerts that fired for the logged-in user, newest first"""
+    result = await db.execute(
+        select(AlertEvent)
+        .where(AlertEvent.user_id == current_user["user_id"])
+        .order_by(AlertEvent.id.desc())
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+
+
+@router.get("/stream")
+async def stream_my_alerts(
+    last_event_id: Optional[int] = Query(default=None),
+    last_event_id_header: Optional[str] = Header(default=None, alias="Last-Event-ID"),
+    current_user=Depends(auth_validate_stream)
+):
+    """
+    Live alert events for the logged-in user (Server-Sent Events).
+
+    Browser: new EventSource("/alerts/stream?token=<jwt>")
+    After a reconnect the browser sends Last-Event-ID by itself, and
+    every event after that id is replayed before live events resume.
+    """
+    if last_event_id is None and last_event_id_header and last_event_id_header.isdigit():
+        last_event_id = int(last_event_id_header)
+
+    return StreamingResponse(
+        stream_alerts(current_user["user_id"], last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,129 @@
+"""
+analytics_controller.py - Technical indicators for an asset
+===========================================================
+
+What this file does:
+- Get indicators: GET /analytics/{asset_name}
+- Get risk (volatility, VaR, CVaR, drawdown): GET /analytics/{asset_name}/risk
+
+Examples:
+- GET /analytics/BTC?indicators=sma,rsi&window=14
+    recent ticks from the price cache
+- GET /analytics/BTC?indicators=ema,volatility&resolution=1h&hours=720
+    closes of 1h candles over the last 30 days
+
+The math lives in utils/indicators.py (NumPy, whole series at once).
+"""
+
+from datetime import datetime, timedelta
+from typing import Optional
+
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import get_read_db
+from ..services.price_cache import price_cache, get_recent_prices, to_epoch, from_epoch
+from ..services.risk_engine import risk_engine
+from ..services.rollup_service import get_candles
+from ..utils.indicators import INDICATORS
+
+
+router = APIRouter(
+    prefix="/analytics",
+    tags=["Analytics"]
+)
+
+
+def to_json_list(values, digits: int = 6):
+    """NumPy array -> list of floats, NaN (window not full yet) -> None"""
+    return [None if value != value else round(value, digits) for value in values.tolist()]
+
+
+async def load_series(db: AsyncSession, asset_name: str, resolution: Optional[str], hours: int):
+    """(timestamps, prices) as NumPy arrays, oldest first"""
+
+    # Candle closes for longer ranges
+    if resolution is not None:
+        start_time = datetime.utcnow() - timedelta(hours=hours)
+        candles = await get_candles(db, asset_name, resolution, start_time)
+        timestamps = np.array([to_epoch(candle.bucket_start) for candle in candles], dtype=np.float64)
+        prices = np.array([candle.close for candle in candles], dtype=np.float64)
+        return timestamps, prices
+
+    # Recent ticks from the price cache (fills it from the DB on a miss)
+    series = price_cache.series(asset_name)
+    if series is None:
+        await get_recent_prices(db, asset_name, price_cache.depth)
+        series = price_cache.series(asset_name)
+    if series is None:
+        return np.zeros(0), np.zeros(0)
+    return series
+
+
+@router.get("/{asset_name}")
+async def get_indicators(
+    asset_name: str,
+    indicators: str = Query(
+        default="sma,ema,rsi",
+        description=f"Comma separated: {', '.join(INDICATORS)}"
+    ),
+    window: int = Query(default=20, ge=2, le=1000),
+    points: int = Query(default=500, ge=1, le=5000, description="Return only the newest N points"),
+    resolution: Optional[str] = Query(
+        default=None,
+        pattern="^(1m|5m|1h|1d)$",
+        description="Use candle closes of this size instead of raw ticks"
+    ),
+    hours: int = Query(default=24, ge=1, le=24 * 365, description="Range when using candles"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """indicator series for an asset, aligned with the returned prices"""
+
+    # Step 1: Which indicators?
+    names = [name.strip() for name in indicators.split(",") if name.strip()]
+    unknown = [name for name in names if name not in INDICATORS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown indicators: {', '.join(unknown)}")
+
+    # Step 2: Price series as arrays
+    timestamps, prices = await load_series(db, asset_name, resolution, hours)
+    if len(prices) == 0:
+        raise HTTPException(status_code=404, detail=f"No prices for {asset_name}")
+
+    # Step 3: Compute over the whole series, return the newest `points`
+    results = {
+        name: INDICATORS[name](timestamps, prices, window)[-points:]
+        for name in names
+    }
+
+    return {
+        "asset": asset_name,
+        "window": window,
+        "resolution": resolution or "tick",
+        "timestamps": [str(from_epoch(ts)) for ts in timestamps[-points:].tolist()],
+        "prices": to_json_list(prices[-points:]),
+        "indicators": {name: to_json_list(values) for name, values in results.items()},
+        "latest": {name: to_json_list(values[-1:])[0] for name, values in results.items()}
+    }
+
+
+@router.get("/{asset_name}/risk")
+async def get_asset_risk(
+    asset_name: str,
+    window: Optional[int] = Query(default=None, ge=2, le=10000, description="Ticks to use (default RISK_WINDOW)"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """volatility-based risk of an asset, cached until its next tick"""
+    result = risk_engine.asset_risk(asset_name, window)
+
+    if result is None:
+        # not cached yet: load recent ticks once, then try again
+        await get_recent_prices(db, asset_name, price_cache.depth)
+        result = risk_engine.asset_risk(asset_name, window)
+
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Not enough prices for {asset_name}")
+
+    return result
+
@@ -3,32 +3,33 @@ auth_controller.py - handles user login
 
 basically: user gives email -> we give them a token
 if they're new, we just create an account for them
+
+logout revokes the token (auth/token_cache.py keeps a denylist),
+logout-all revokes every token the user has been given so far
+(both are sent to the other workers too, services/broadcast.py)
 """
 
+import time
+
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import SessionLocal
+from ..auth.auth_validate import auth_validate
+from ..auth.token_cache import token_cache
+from ..database import get_db
+from ..services.broadcast import broadcast
 from ..models.user_model import User
 from ..schemas.auth_schema import LoginRequest, TokenResponse
 from ..utils.jwt_util import create_jwt_token
-from ..utils.password_util import hash_password, verify_password
+from ..services.password_service import password_service, PasswordBusy
 
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 
-def get_db():
-    """get a db connection, close it when we're done"""
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @router.post("/login", response_model=TokenResponse)
-def login_user(request: LoginRequest, db: Session = Depends(get_db)):
+async def login_user(request: LoginRequest, db: AsyncSession = Depends(get_db)):
     """
     POST /auth/login
     send: {"email": "user@example.com", "password": "yourpassword"}
@@ -36,7 +37,8 @@ def login_user(request: LoginRequest, db: Session = Depends(get_db)):
     """
     
     # check if this email exists
-    user = db.query(User).filter(User.email == request.email).first()
+    result = await db.execute(select(User).where(User.email == request.email))
+    user = result.scalars().first()
     
     # user not found
     if not user:
@@ -46,8 +48,19 @@ def login_user(request: LoginRequest, db: Session = Depends(get_db)):
     if not user.hashed_password:
         raise HTTPException(status_code=401, detail="Please register first - no password set")
     
-    if not verify_password(request.password, user.hashed_password):
+    # bcrypt runs in the password pool, not on the event loop
+    try:
+        matches, new_hash = await password_service.verify(request.password, user.hashed_password)
+    except PasswordBusy:
+        raise HTTPException(status_code=503, detail="Too many logins, try again", headers={"Retry-After": "1"})
+
+    if not matches:
         raise HTTPException(status_code=401, detail="Invalid email or password")
+
+    # old SHA-256 (or old cost) hash: store the upgraded one
+    if new_hash is not None:
+        user.hashed_password = new_hash
+        await db.commit()
     
     # make a token with their info
     token = create_jwt_token({
@@ -57,3 +70,26 @@ def login_user(request: LoginRequest, db: Session = Depends(get_db)):
     })
 
     return {"access_token": token, "token_type": "Bearer"}
+
+
+@router.post("/logout")
+async def logout_user(current_user=Depends(auth_validate)):
+    """
+    POST /auth/logout
+    the token used for this request stops working right away
+    """
+    token_cache.revoke(current_user)
+    broadcast.publish("revoke", {"jti": current_user.get("jti"), "exp": current_user.get("exp")})
+    return {"message": "Logged out"}
+
+
+@router.post("/logout-all")
+async def logout_everywhere(current_user=Depends(auth_validate)):
+    """
+    POST /auth/logout-all
+    every token issued to this user until now stops working
+    """
+    before = time.time()
+    token_cache.revoke_user(current_user["user_id"], before)
+    broadcast.publish("revoke_user", {"user_id": current_user["user_id"], "before": before})
+    return {"message": "Logged out from all sessions"}
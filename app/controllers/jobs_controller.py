@@ -0,0 +1,25 @@
+"""
+jobs_controller.py - Background job status
+==========================================
+
+What this file does:
+- GET /jobs/status shows whether THIS worker is the job leader and, per job,
+  whether it runs, how often it ran or failed, and the last error
+  (services/job_runner.py)
+
+With several workers, a request lands on any one of them - look for the
+response with "leader": true to see the jobs actually running.
+"""
+
+from fastapi import APIRouter
+
+from ..services.job_runner import job_runner
+
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+@router.get("/status")
+def get_job_status():
+    """leader election state and per-job counters of this worker"""
+    return job_runner.status()
@@ -4,20 +4,33 @@ market_controller.py - Handles Market Price APIs
 
 What this file does:
 - Add a price: POST /market/price
+- Add many prices at once: POST /market/prices/batch
 - Get latest prices: GET /market/latest/{asset_name}
 - Get prices by time range: GET /market/history/{asset_name}
+  (add ?resolution=1m|5m|1h|1d to get OHLCV candles instead of raw ticks)
+- Export raw history as a stream: GET /market/history/{asset_name}/export
 
 These are the APIs for managing market prices.
 """
 
 #  IMPORTS
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
+from typing import Optional
 
-from ..database import SessionLocal
+from ..database import get_read_db
 from ..models.market_model import MarketPrice
-from ..schemas.market_schema import MarketInput, MarketOutput
+from ..schemas.market_schema import (
+    MarketInput, MarketOutput, MarketBatchInput, MarketBatchResponse, CandleOutput
+)
+from ..services.tick_ingestor import tick_ingestor, IngestQueueFull
+from ..services.price_cache import get_recent_prices
+from ..services.rollup_service import get_candles
+from ..services.export_service import EXPORT_FORMATS, arrow_available, export_prices
 
 
 #  CREATE ROUTER 
@@ -28,67 +41,74 @@ router = APIRouter(
 )
 
 
-#  DATABASE SESSION 
-def get_db():
-    """
-    Creates a database session for each request.
-    """
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 #  ADD MARKET PRICE 
 @router.post("/price", response_model=MarketOutput)
-def add_market_price(data: MarketInput, db: Session = Depends(get_db)):
-    
+async def add_market_price(data: MarketInput):
+    """
+    Add one price.
+    The price is written in the next batch together with other ticks,
+    we just wait (without blocking a worker thread) until it's committed.
+    """
     
-    # Step 1: Create new price object
-    new_price = MarketPrice(
-        asset_name=data.asset_name,
-        price=data.price
-    )
+    # Step 1: Queue the price for the batched writer
+    try:
+        future = tick_ingestor.submit(data.asset_name, data.price, data.timestamp)
+    except IngestQueueFull:
+        raise HTTPException(status_code=503, detail="Ingest queue is full, try again")
     
-    # Step 2: Save to database
-    db.add(new_price)
-    db.commit()
-    db.refresh(new_price)
+    # Step 2: Wait until its batch is saved (gives us the id)
+    new_price = await asyncio.wrap_future(future)
 
     return new_price
 
 
+#  ADD MANY MARKET PRICES 
+@router.post("/prices/batch", response_model=MarketBatchResponse, status_code=202)
+async def add_market_prices_batch(data: MarketBatchInput):
+    """
+    Add many prices in one request.
+    Prices are queued and written in bulk in the background.
+
+    URL: POST /market/prices/batch
+    Body: {"prices": [{"asset_name": "BTC", "price": 42000}, ...]}
+    Returns: {"accepted": 2, "queue_depth": 10}
+    """
+
+    try:
+        accepted = tick_ingestor.submit_many(
+            (item.asset_name, item.price, item.timestamp) for item in data.prices
+        )
+    except IngestQueueFull:
+        raise HTTPException(status_code=503, detail="Ingest queue is full, try again")
+
+    return {"accepted": accepted, "queue_depth": tick_ingestor.queue.qsize()}
+
+
 #  GET LATEST PRICES 
 @router.get("/latest/{asset_name}", response_model=list[MarketOutput])
-def get_latest_prices(asset_name: str, db: Session = Depends(get_db)):
+async def get_latest_prices(asset_name: str, db: AsyncSession = Depends(get_read_db)):
     """
     Get the latest 10 prices for an asset.
+    Served from the in-memory price cache (database only on a miss).
     
     URL: GET /market/latest/BTC
     Returns: list of recent prices (newest first)
     """
     
-    # Query database for this asset's prices
-    # Order by timestamp descending (newest first)
-    # Limit to 10 results
-    prices = (
-        db.query(MarketPrice)
-        .filter(MarketPrice.asset_name == asset_name)
-        .order_by(MarketPrice.timestamp.desc())
-        .limit(10)
-        .all()
-    )
-    
-    return prices
+    return await get_recent_prices(db, asset_name, 10)
 
 
 #  GET PRICES BY TIME RANGE 
-@router.get("/history/{asset_name}", response_model=list[MarketOutput])
-def get_price_history(
+@router.get("/history/{asset_name}", response_model=list[MarketOutput] | list[CandleOutput])
+async def get_price_history(
     asset_name: str,
     hours: int = Query(default=24, description="How many hours of data to get"),
-    db: Session = Depends(get_db)
+    resolution: Optional[str] = Query(
+        default=None,
+        pattern="^(1m|5m|1h|1d)$",
+        description="Return OHLCV candles of this size instead of raw prices"
+    ),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Get price history for a time range.
@@ -96,18 +116,55 @@ def get_price_history(
     
     URL: GET /market/history/BTC?hours=24
     Returns: list of prices from last N hours
+
+    URL: GET /market/history/BTC?hours=24&resolution=5m
+    Returns: list of 5 minute OHLCV candles (from the market_candles rollup)
     """
     
     # Calculate the start time
     start_time = datetime.utcnow() - timedelta(hours=hours)
+
+    # Candles requested: served from the pre-aggregated rollup table
+    if resolution is not None:
+        return await get_candles(db, asset_name, resolution, start_time)
     
     # Query with time range filter (uses idx_asset_timestamp index)
-    prices = (
-        db.query(MarketPrice)
-        .filter(MarketPrice.asset_name == asset_name)
-        .filter(MarketPrice.timestamp >= start_time)
+    result = await db.execute(
+        select(MarketPrice)
+        .where(MarketPrice.asset_name == asset_name)
+        .where(MarketPrice.timestamp >= start_time)
         .order_by(MarketPrice.timestamp.asc())
-        .all()
     )
     
-    return prices
+    return result.scalars().all()
+
+
+#  EXPORT PRICE HISTORY (STREAMING) 
+@router.get("/history/{asset_name}/export")
+async def export_price_history(
+    asset_name: str,
+    hours: int = Query(default=24, description="How many hours of data to export"),
+    format: str = Query(default="ndjson", pattern="^(ndjson|csv|arrow)$")
+):
+    """
+    Export every raw price in a time range as a stream.
+    Rows are read with a server-side cursor and sent chunk by chunk,
+    so a 30 day export uses the same memory as a 1 hour one.
+
+    URL: GET /market/history/BTC/export?hours=720&format=csv
+    Returns: NDJSON, CSV or Arrow IPC stream
+    """
+
+    if format == "arrow" and not arrow_available:
+        raise HTTPException(status_code=400, detail="Arrow export needs pyarrow installed")
+
+    start_time = datetime.utcnow() - timedelta(hours=hours)
+    extension = "arrows" if format == "arrow" else format
+
+    return StreamingResponse(
+        export_prices(asset_name, start_time, format),
+        media_type=EXPORT_FORMATS[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{asset_name}_{hours}h.{extension}"'
+        }
+    )
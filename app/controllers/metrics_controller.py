@@ -0,0 +1,60 @@
+"""
+metrics_controller.py - Internal performance numbers
+=====================================================
+
+What this file does:
+- GET /metrics returns counters from the background parts of the app
+  (tick ingestion queue, live price hub, multiplexed market feed,
+  websocket backpressure, price cache, alert engine, portfolio valuations,
+  risk cache, AI answer cache and digests, LLM client, verified-token cache,
+  password hashing pool, cross-worker broadcast, database pools)
+
+Useful when load testing: watch queue depth and flush latency.
+"""
+
+from fastapi import APIRouter
+
+from ..auth.token_cache import token_cache
+from ..database import pool_stats
+from ..services.backpressure import stream_stats
+from ..services.broadcast import broadcast
+from ..services.hub import price_hub
+from ..services.market_feed import market_feed
+from ..services.tick_ingestor import tick_ingestor
+from ..services.price_cache import price_cache
+from ..services.alert_engine import alert_engine
+from ..services.valuation_engine import valuation_engine
+from ..services.risk_engine import risk_engine
+from ..services.ai_cache import ai_cache
+from ..services.digest_service import digest_service
+from ..services.llm_provider import llm_client
+from ..services.password_service import password_service
+
+
+router = APIRouter(tags=["Metrics"])
+
+
+@router.get("/metrics")
+def get_metrics():
+    """current counters for ingestion and live streaming"""
+    return {
+        "ingest": tick_ingestor.stats(),
+        "price_hub": {
+            "subscribers": price_hub.subscriber_count(),
+            "published": price_hub.published,
+            "dropped": price_hub.dropped
+        },
+        "market_feed": market_feed.stats(),
+        "price_streams": stream_stats.stats(),
+        "price_cache": price_cache.stats(),
+        "alert_engine": alert_engine.stats(),
+        "valuation_engine": valuation_engine.stats(),
+        "risk_engine": risk_engine.stats(),
+        "ai_cache": ai_cache.stats(),
+        "ai_digests": digest_service.stats(),
+        "llm": llm_client.stats(),
+        "auth": token_cache.stats(),
+        "passwords": password_service.stats(),
+        "broadcast": broadcast.stats(),
+        "database": pool_stats()
+    }
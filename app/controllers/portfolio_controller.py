@@ -2,19 +2,32 @@
 
 What this file does:
 - Add asset to portfolio: POST /portfolio/add
+- Add or set many assets at once: POST /portfolio/batch
 - Get my portfolio: GET /portfolio/me
+- Value of my portfolio at live prices: GET /portfolio/valuation
+- Same, pushed on every price move: GET /portfolio/valuation/stream (SSE)
+- Risk of my portfolio (volatility, VaR, CVaR): GET /portfolio/risk
 
 
 """
 
 
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from typing import Optional
 
-from ..database import SessionLocal
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import get_db, get_read_db
 from ..models.portfolio_model import Portfolio
-from ..schemas.portfolio_schema import PortfolioCreate, PortfolioResponse
-from ..auth.auth_validate import auth_validate
+from ..schemas.portfolio_schema import (
+    PortfolioCreate, PortfolioResponse, PortfolioBatchInput, PortfolioValuation
+)
+from ..auth.auth_validate import auth_validate, auth_validate_stream
+from ..services.portfolio_service import upsert_positions
+from ..services.risk_engine import risk_engine
+from ..services.valuation_engine import valuation_engine, stream_valuation
 
 
 
@@ -25,63 +38,46 @@ router = APIRouter(
 
 
 
-def get_db():
-    """
-    Creates a database session for each request.
-    """
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 
 
 @router.post("/add", response_model=PortfolioResponse)
-def add_to_portfolio(
+async def add_to_portfolio(
     data: PortfolioCreate,
     current_user=Depends(auth_validate),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
 
     
     # Step 1: Get user id from JWT token
     user_id = current_user["user_id"]
 
-    # Step 2: Check if user already has this asset
-    existing_asset = (
-        db.query(Portfolio)
-        .filter(Portfolio.user_id == user_id)
-        .filter(Portfolio.asset_name == data.asset_name)
-        .first()
-    )
+    # Step 2: Insert the asset, or add to the existing quantity -
+    # one atomic statement, safe under concurrent requests
+    rows = await upsert_positions(db, user_id, [data])
 
-    # Step 3: If asset exists, add to existing quantity
-    if existing_asset is not None:
-        existing_asset.quantity = existing_asset.quantity + data.quantity
-        db.commit()
-        db.refresh(existing_asset)
-        return existing_asset
-
-    # Step 4: If new asset, create new entry
-    new_asset = Portfolio(
-        user_id=user_id,
-        asset_name=data.asset_name,
-        quantity=data.quantity
-    )
+    return rows[0]
 
-    db.add(new_asset)
-    db.commit()
-    db.refresh(new_asset)
 
-    return new_asset
+#  ADD / SET MANY ASSETS 
+@router.post("/batch", response_model=list[PortfolioResponse])
+async def add_many_to_portfolio(
+    data: PortfolioBatchInput,
+    current_user=Depends(auth_validate),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Apply many position changes in one round-trip
+    (e.g. importing a 500-line portfolio).
+    Same asset twice in one batch is combined first.
+    """
+    return await upsert_positions(db, current_user["user_id"], data.positions, data.mode)
 
 
 #  GET MY PORTFOLIO 
 @router.get("/me", response_model=list[PortfolioResponse])
-def get_my_portfolio(
+async def get_my_portfolio(
     current_user=Depends(auth_validate),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     
     
@@ -89,11 +85,50 @@ def get_my_portfolio(
     user_id = current_user["user_id"]
 
     # Step 2: Get all portfolio items for this user
-    portfolio_items = (
-        db.query(Portfolio)
-        .filter(Portfolio.user_id == user_id)
-        .all()
+    result = await db.execute(
+        select(Portfolio).where(Portfolio.user_id == user_id)
     )
+    portfolio_items = result.scalars().all()
 
     # Step 3: Return the list
     return portfolio_items
+
+
+#  VALUE MY PORTFOLIO 
+@router.get("/valuation", response_model=PortfolioValuation)
+async def get_my_valuation(current_user=Depends(auth_validate)):
+    """
+    Every position at the latest price, plus totals and change since the open.
+    Served from the in-memory valuation engine - no database query.
+    """
+    return valuation_engine.valuation(current_user["user_id"])
+
+
+@router.get("/valuation/stream")
+async def stream_my_valuation(current_user=Depends(auth_validate_stream)):
+    """
+    Server-Sent Events: the valuation now, then again whenever a held asset moves.
+    Browser: new EventSource("/portfolio/valuation/stream?token=<jwt>")
+    """
+    return StreamingResponse(
+        stream_valuation(current_user["user_id"]),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+#  RISK OF MY PORTFOLIO 
+@router.get("/risk")
+async def get_my_risk(
+    window: Optional[int] = Query(default=None, ge=2, le=10000, description="Points to use (default RISK_WINDOW)"),
+    current_user=Depends(auth_validate)
+):
+    """
+    Value-weighted volatility, VaR and CVaR of the logged-in user's holdings.
+    Cached until a held asset ticks or the holdings change.
+    """
+    result = risk_engine.portfolio_risk(current_user["user_id"], window)
+    if result is None:
+        raise HTTPException(status_code=404, detail="No priced holdings to measure")
+    return result
+
@@ -12,13 +12,14 @@ These are the APIs for managing users.
 
 # ============ IMPORTS ============
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import SessionLocal
+from ..database import get_db, get_read_db
 from ..models.user_model import User
 from ..schemas.user_schema import UserRegister, UserResponse
 from ..auth.auth_validate import auth_validate
-from ..utils.password_util import hash_password
+from ..services.password_service import password_service, PasswordBusy
 
 
 # ============ CREATE ROUTER ============
@@ -29,21 +30,9 @@ router = APIRouter(
 )
 
 
-# ============ DATABASE SESSION ============
-def get_db():
-    """
-    Creates a database session for each request.
-    """
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 # ============ API 1: CREATE USER ============
 @router.post("/", response_model=UserResponse)
-def create_user(user: UserRegister, db: Session = Depends(get_db)):
+async def create_user(user: UserRegister, db: AsyncSession = Depends(get_db)):
     """
     Create a new user.
     
@@ -53,43 +42,50 @@ def create_user(user: UserRegister, db: Session = Depends(get_db)):
     """
     
     # Step 1: Check if email already exists
-    existing_user = db.query(User).filter(User.email == user.email).first()
+    result = await db.execute(select(User).where(User.email == user.email))
+    existing_user = result.scalars().first()
     
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    # Step 2: Create new user with hashed password
+    # Step 2: Create new user with hashed password (hashed in the password pool)
+    try:
+        hashed_password = await password_service.hash(user.password)
+    except PasswordBusy:
+        raise HTTPException(status_code=503, detail="Too many sign-ups, try again", headers={"Retry-After": "1"})
+
     new_user = User(
         email=user.email,
-        hashed_password=hash_password(user.password),
+        hashed_password=hashed_password,
         role="user"
     )
     
     # Step 3: Save to database
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
 
     return new_user
 
 
 # ============ API 2: GET ALL USERS ============
 @router.get("/", response_model=list[UserResponse])
-def get_all_users(db: Session = Depends(get_db)):
+async def get_all_users(db: AsyncSession = Depends(get_read_db)):
     """
     Get all users from database.
     
     URL: GET /users/
     Returns: list of all users
     """
-    return db.query(User).all()
+    result = await db.execute(select(User))
+    return result.scalars().all()
 
 
 # ============ API 3: GET MY PROFILE ============
 @router.get("/me", response_model=UserResponse)
-def get_my_profile(
+async def get_my_profile(
     current_user=Depends(auth_validate),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Get profile of logged-in user.
@@ -104,7 +100,7 @@ def get_my_profile(
     user_id = current_user["user_id"]
 
     # Step 2: Find user in database
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
 
     # Step 3: If user not found (shouldn't happen)
     if user is None:
@@ -10,73 +10,230 @@ How WebSocket works:
 - REST API: request -> response -> connection closed
 - WebSocket: connection stays open -> server keeps sending data
 
+How prices reach the socket:
+- Every saved price is published once to the price hub
+- Each socket subscribes to the hub and gets the price pushed instantly
+- No per-socket database polling
+
+Slow clients (services/backpressure.py):
+- A busy client only gets the newest price per asset (older ones are skipped)
+- ?max_rate=N limits a client to N updates per second
+- Clients that can't keep up are disconnected with close code 1013
+
 Usage:
 - Connect to ws://localhost:8000/ws/market/BTC
-- Server sends price every 5 seconds
+- Server sends every new price as soon as it is saved
+
+Dashboards watching many assets should use ONE socket instead:
+- Connect to ws://localhost:8000/ws/market (optionally ?format=msgpack)
+- Send {"action": "subscribe", "assets": ["BTC", "ETH"]}
+- Server sends one frame per tick cycle with all subscribed assets
 """
 
 # ============ IMPORTS ============
 import asyncio
+import json
+
 from fastapi import APIRouter, WebSocket
-from sqlalchemy.orm import Session
 
-from ..database import SessionLocal
-from ..models.market_model import MarketPrice
+from ..database import ReadAsyncSessionLocal
+from ..services.backpressure import ClientStream, SlowConsumer, close_slow_consumer, stream_stats
+from ..services.hub import price_hub, market_hub, LatestValues
+from ..services.market_feed import market_feed, snapshot, MAX_ASSETS
+from ..services.price_cache import price_cache, get_recent_prices
 
 
 # ============ CREATE ROUTER ============
 router = APIRouter()
 
 
+# ============ HELPER: LATEST PRICE ============
+async def get_latest_price_message(asset_name: str):
+    """
+    Reads the newest price once, so a new client doesn't wait
+    for the next tick to see something.
+    """
+    # Normal case: the price cache has it, no database connection needed
+    latest_price = price_cache.latest_price(asset_name)
+
+    if latest_price is None:
+        async with ReadAsyncSessionLocal() as db:
+            recent = await get_recent_prices(db, asset_name, 1)
+
+        if not recent:
+            return None
+        latest_price = recent[0]
+
+    return {
+        "asset": latest_price.asset_name,
+        "price": latest_price.price,
+        "time": str(latest_price.timestamp)
+    }
+
+
 # ============ WEBSOCKET ENDPOINT ============
 @router.websocket("/ws/market/{asset_name}")
-async def market_price_stream(websocket: WebSocket, asset_name: str):
+async def market_price_stream(websocket: WebSocket, asset_name: str, max_rate: float = 0):
     """
     Stream live prices for an asset.
     
     URL: ws://localhost:8000/ws/market/BTC
+         ws://localhost:8000/ws/market/BTC?max_rate=1   (at most 1 update per second)
     
-    Once connected, server sends latest price every 5 seconds:
+    Once connected, server sends every new price:
     {"asset": "BTC", "price": 42000, "time": "..."}
     """
     
     # Step 1: Accept the WebSocket connection
     await websocket.accept()
+    stream_stats.open += 1
     
-    # Step 2: Create database session
-    db: Session = SessionLocal()
+    # Step 2: Subscribe to the price hub before reading the snapshot,
+    # so no tick can slip in between (mailbox keeps only the newest price)
+    mailbox = price_hub.subscribe(asset_name, LatestValues(key=lambda message: message["asset"]))
+    stream = ClientStream(websocket, mailbox, max_rate)
 
     try:
-        # Step 3: Keep running forever (until client disconnects)
+        # Step 3: Send the current price right away
+        snapshot_message = await get_latest_price_message(asset_name)
+        if snapshot_message is not None:
+            await stream.send(json.dumps(snapshot_message))
+
+        # Step 4: Forward the newest tick until client disconnects
         while True:
-            
-            # Step 4: Get latest price from database
-            prices = (
-                db.query(MarketPrice)
-                .filter(MarketPrice.asset_name == asset_name)
-                .order_by(MarketPrice.timestamp.desc())
-                .limit(1)
-                .all()
-            )
-            
-            # Step 5: If we have a price, send it
-            if len(prices) > 0:
-                latest_price = prices[0]
-                
-                # Send as JSON to client
-                await websocket.send_json({
-                    "asset": latest_price.asset_name,
-                    "price": latest_price.price,
-                    "time": str(latest_price.timestamp)
-                })
-
-            # Step 6: Wait 5 seconds before sending again
-            await asyncio.sleep(5)
+            for message in await stream.next():
+                await stream.send(json.dumps(message))
+
+    except SlowConsumer as error:
+        await close_slow_consumer(websocket, str(error))
 
     except Exception:
         # Client disconnected - this is normal
         pass
     
     finally:
-        # Step 7: Close database connection
-        db.close()
+        # Step 5: Stop receiving ticks for this client
+        price_hub.unsubscribe(asset_name, mailbox)
+        stream_stats.open -= 1
+
+
+# ============ MULTIPLEXED WEBSOCKET ============
+COMMAND_HELP = 'Send {"action": "subscribe" | "unsubscribe", "assets": [...]} or {"action": "rate", "max_rate": N}'
+
+
+async def handle_command(stream: ClientStream, encoder, assets: set, text: str):
+    """subscribe / unsubscribe / rate message from the client"""
+    try:
+        command = json.loads(text)
+        action = command["action"]
+        if action == "rate":
+            max_rate = float(command["max_rate"])
+        else:
+            requested = [str(asset) for asset in command["assets"]]
+    except (ValueError, KeyError, TypeError):
+        return encoder.control({"type": "error", "detail": COMMAND_HELP})
+
+    if action == "subscribe":
+        new_assets = [asset for asset in dict.fromkeys(requested) if asset not in assets]
+        if len(assets) + len(new_assets) > MAX_ASSETS:
+            return encoder.control({"type": "error", "detail": f"At most {MAX_ASSETS} assets per socket"})
+
+        # subscribe before reading the snapshot, so no tick slips in between
+        for asset in new_assets:
+            market_hub.subscribe(asset, stream.mailbox)
+            assets.add(asset)
+
+        await websocket_send(stream, encoder, encoder.control(encoder.subscribed(new_assets)))
+        updates = snapshot(new_assets)
+        return encoder.ticks(updates) if updates else None
+
+    if action == "unsubscribe":
+        removed = [asset for asset in dict.fromkeys(requested) if asset in assets]
+        for asset in removed:
+            market_hub.unsubscribe(asset, stream.mailbox)
+            assets.discard(asset)
+            encoder.forget(asset)
+        return encoder.control({"type": "unsubscribed", "assets": removed})
+
+    if action == "rate":
+        stream.set_rate(max_rate)
+        return encoder.control({"type": "rate", "max_rate": max_rate})
+
+    return encoder.control({"type": "error", "detail": f"Unknown action: {action}"})
+
+
+async def websocket_send(stream: ClientStream, encoder, frame):
+    await stream.send(frame)
+    market_feed.sent(encoder.format, frame)
+
+
+@router.websocket("/ws/market")
+async def market_feed_stream(websocket: WebSocket, format: str = "json", max_rate: float = 0):
+    """
+    Many assets over one socket.
+
+    URL: ws://localhost:8000/ws/market            (JSON frames)
+         ws://localhost:8000/ws/market?format=msgpack  (binary frames)
+         ws://localhost:8000/ws/market?max_rate=2      (at most 2 frames per second)
+
+    Client sends: {"action": "subscribe", "assets": ["BTC", "ETH"]}
+                  {"action": "rate", "max_rate": 2}
+    Server sends one frame per tick cycle with the new ticks of all
+    subscribed assets (formats: services/market_feed.py)
+    """
+
+    # Step 1: Accept and pick the encoding (JSON if msgpack isn't available)
+    await websocket.accept()
+    encoder = market_feed.encoder(format) or market_feed.encoder("json")
+    market_feed.connections += 1
+    stream_stats.open += 1
+
+    # One mailbox for all assets of this socket, newest update per asset
+    stream = ClientStream(websocket, LatestValues(key=lambda update: update.asset), max_rate)
+    assets = set()
+    receive = get = None
+
+    try:
+        await websocket_send(stream, encoder, encoder.control({
+            "type": "hello",
+            "format": encoder.format,
+            "max_assets": MAX_ASSETS
+        }))
+
+        # Step 2: Wait for whichever comes first - a client command or a batch of ticks
+        receive = asyncio.ensure_future(websocket.receive_text())
+        get = asyncio.ensure_future(stream.next())
+
+        while True:
+            done, _ = await asyncio.wait({receive, get}, return_when=asyncio.FIRST_COMPLETED)
+
+            # Step 3: Forward the batch (assets unsubscribed meanwhile are left out)
+            if get in done:
+                updates = [update for update in get.result() if update.asset in assets]
+                if updates:
+                    await websocket_send(stream, encoder, encoder.ticks(updates))
+                get = asyncio.ensure_future(stream.next())
+
+            # Step 4: Handle subscribe / unsubscribe / rate
+            if receive in done:
+                reply = await handle_command(stream, encoder, assets, receive.result())
+                if reply is not None:
+                    await websocket_send(stream, encoder, reply)
+                receive = asyncio.ensure_future(websocket.receive_text())
+
+    except SlowConsumer as error:
+        await close_slow_consumer(websocket, str(error))
+
+    except Exception:
+        # Client disconnected - this is normal
+        pass
+
+    finally:
+        # Step 5: Stop receiving ticks for this client
+        for task in (receive, get):
+            if task is not None:
+                task.cancel()
+        for asset in assets:
+            market_hub.unsubscribe(asset, stream.mailbox)
+        market_feed.connections -= 1
+        stream_stats.open -= 1
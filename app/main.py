@@ -3,22 +3,43 @@ main.py - starts the FastAPI server
 run with: uvicorn app.main:app --reload
 """
 
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from threading import Thread
 
 from .database import engine, SessionLocal
 from .models.base import Base
 from .models.user_model import User
 from .models.market_model import MarketPrice
 from .models.portfolio_model import Portfolio
-from .models.alert_model import Alert
-from .services.market_data_service import start_price_generator
+from .models.alert_model import Alert, AlertEvent
+from .models.candle_model import MarketCandle
+from .models.digest_model import AIDigest
+from .services.market_data_service import start_price_generator, publish_ticks
+from .services.hub import price_hub, market_hub, alert_hub, portfolio_hub
+from .services.market_feed import market_feed
+from .services.tick_ingestor import tick_ingestor
+from .services.price_cache import price_cache
+from .services.alert_engine import alert_engine, evaluate_ticks, apply_remote_alert, apply_remote_events
+from .services.valuation_engine import valuation_engine
+from .services.risk_engine import risk_engine
+from .services.digest_service import digest_service
+from .services.broadcast import broadcast
+from .services.job_runner import job_runner, ThreadJob, PeriodicJob, TaskJob
+from .services.rollup_service import repair_recent_candles, REPAIR_INTERVAL
+from .services.partition_service import (
+    is_partitioned, ensure_partitions, maintain_partitions, CHECK_INTERVAL as PARTITION_CHECK_INTERVAL
+)
+from .auth.token_cache import token_cache
+from .services.password_service import password_service
 
 from .controllers.ai_controller import router as ai_router
 from .controllers.alert_controller import router as alert_router
+from .controllers.analytics_controller import router as analytics_router
 from .controllers.auth_controller import router as auth_router
 from .controllers.market_controller import router as market_router
+from .controllers.jobs_controller import router as jobs_router
+from .controllers.metrics_controller import router as metrics_router
 from .controllers.portfolio_controller import router as portfolio_router
 from .controllers.user_controller import router as user_router
 from .controllers.ws_market_controller import router as ws_router
@@ -52,13 +73,104 @@ app.include_router(portfolio_router)
 app.include_router(market_router)
 app.include_router(ai_router)
 app.include_router(alert_router)
+app.include_router(analytics_router)
 app.include_router(ws_router)
+app.include_router(metrics_router)
+app.include_router(jobs_router)
 
 
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     """start background price generator when server starts"""
+    # live prices, alerts and valuations are delivered to websockets
+    # and event streams on this event loop
+    loop = asyncio.get_running_loop()
+    for hub in (price_hub, market_hub, alert_hub, portfolio_hub):
+        hub.start(loop)
+
+    # recent prices in memory, loaded once from the database
+    # and every alert, indexed per asset (starting from the cached prices)
+    # and every portfolio, as one holdings matrix
+    db = SessionLocal()
+    try:
+        price_cache.warm(db)
+        last_prices = {
+            asset_name: price_cache.latest_price(asset_name).price
+            for asset_name in price_cache.assets()
+        }
+        alert_engine.load(db, last_prices)
+        valuation_engine.load(db)
+
+        # ticks older than these are history: saved, not pushed live
+        for asset_name in price_cache.assets():
+            tick_ingestor.mark_seen(asset_name, price_cache.latest_price(asset_name).timestamp)
+    finally:
+        db.close()
+
+    # today's and the next few market_prices partitions, before the first
+    # tick is written (every worker does this, one at a time under an
+    # advisory lock - the ones already there are skipped)
     db = SessionLocal()
-    thread = Thread(target=start_price_generator, args=(db,), daemon=True)
-    thread.start()
-    print("Server started! Price generator running.")
\ No newline at end of file
+    try:
+        if is_partitioned(db):
+            ensure_partitions(db)
+            db.commit()
+        elif db.get_bind().dialect.name == "postgresql":
+            print("market_prices is not partitioned yet - run fix_db.py")
+    except Exception as error:
+        db.rollback()
+        print(f"Creating market_prices partitions failed: {error}")
+    finally:
+        db.close()
+
+    # batched price writer: saved ticks go to the cache, the hubs,
+    # the alert engine, the portfolio valuations and the risk cache
+    tick_ingestor.add_listener(price_cache.add_ticks)
+    tick_ingestor.add_listener(publish_ticks)
+    tick_ingestor.add_listener(market_feed.publish_ticks)
+    tick_ingestor.add_listener(evaluate_ticks)
+    tick_ingestor.add_listener(valuation_engine.add_ticks)
+    tick_ingestor.add_listener(risk_engine.add_ticks)
+    tick_ingestor.add_listener(broadcast.publish_ticks)
+    tick_ingestor.start()
+
+    # other workers' ticks and changes update this worker's copies
+    # (their ticks never re-fire alerts here - the saving worker does that)
+    broadcast.add_tick_listener(tick_ingestor.observe)
+    broadcast.add_tick_listener(price_cache.add_ticks)
+    broadcast.add_tick_listener(publish_ticks)
+    broadcast.add_tick_listener(market_feed.publish_ticks)
+    broadcast.add_tick_listener(alert_engine.observe)
+    broadcast.add_tick_listener(valuation_engine.add_ticks)
+    broadcast.add_tick_listener(risk_engine.add_ticks)
+    broadcast.on("alert_events", apply_remote_events)
+    broadcast.on("alert", apply_remote_alert)
+    broadcast.on("holding", lambda holding: valuation_engine.set_holding(*holding))
+    broadcast.on("revoke", token_cache.revoke)
+    broadcast.on("revoke_user", lambda data: token_cache.revoke_user(data["user_id"], data["before"]))
+    broadcast.on("digest", digest_service.apply_remote)
+    await broadcast.start()
+
+    # AI summaries are precomputed in the background, requests only read them
+    await digest_service.load()
+
+    # jobs that must run in exactly one worker: the price generator,
+    # the candle repair, the partition maintenance and the AI digests (services/job_runner.py)
+    job_runner.add(ThreadJob("price_generator", start_price_generator))
+    job_runner.add(PeriodicJob("candle_repair", repair_recent_candles, REPAIR_INTERVAL))
+    job_runner.add(PeriodicJob("partition_maintenance", maintain_partitions, PARTITION_CHECK_INTERVAL))
+    job_runner.add(TaskJob(
+        "ai_digests", digest_service.start, digest_service.stop,
+        lambda: digest_service.stats()["running"]
+    ))
+    await job_runner.start()
+    print("Server started! Background jobs:", "running here" if job_runner.leader else "another worker leads")
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    """stop the jobs (another worker takes over), write any queued prices"""
+    await job_runner.stop()
+    tick_ingestor.stop()
+    password_service.shutdown()
+    await broadcast.stop()
\ No newline at end of file
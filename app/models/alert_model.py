@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Index, Boolean, true
+from datetime import datetime
 from .base import Base
 
 
@@ -18,3 +19,32 @@ class Alert(Base):
 
     # Condition: above / below
     condition = Column(String, nullable=False)
+
+    # False after it fired, until the price moves back past the target
+    # (re-arm band, see services/alert_engine.py)
+    armed = Column(Boolean, nullable=False, default=True, server_default=true())
+
+
+class AlertEvent(Base):
+    """one row every time an alert fires"""
+    __tablename__ = "alert_events"
+
+    id = Column(Integer, primary_key=True)
+
+    # Which alert fired, and whose it is
+    alert_id = Column(Integer, ForeignKey("alerts.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+
+    # Copy of the alert at the time it fired
+    asset_name = Column(String, nullable=False)
+    condition = Column(String, nullable=False)
+    target_price = Column(Float, nullable=False)
+
+    # The price that triggered it, and when
+    price = Column(Float, nullable=False)
+    triggered_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    # "events of user X after id Y" (history + resume after reconnect)
+    __table_args__ = (
+        Index('idx_alert_events_user_id', 'user_id', 'id'),
+    )
@@ -0,0 +1,36 @@
+"""
+
+What this file does:
+- Defines the "market_candles" table (pre-aggregated OHLCV candles)
+- One row = one asset, one resolution (1m/5m/1h/1d), one time bucket
+- Kept up to date as ticks are written, so charts don't read raw ticks
+
+"""
+
+from sqlalchemy import Column, Integer, String, Float, DateTime
+from .base import Base
+
+
+class MarketCandle(Base):
+
+    # Name of the table in database
+    __tablename__ = "market_candles"
+
+    # Primary key = (asset, resolution, bucket start)
+    # The key's index is also what time-range queries use
+    asset_name = Column(String, primary_key=True)
+    resolution = Column(String, primary_key=True)    # "1m", "5m", "1h", "1d"
+    bucket_start = Column(DateTime, primary_key=True)
+
+    # Open / High / Low / Close prices in this bucket
+    open = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    close = Column(Float, nullable=False)
+
+    # Number of ticks in the bucket (we have no traded volume)
+    volume = Column(Integer, nullable=False)
+
+    # First / last tick time, used to merge open and close correctly
+    first_tick_at = Column(DateTime, nullable=False)
+    last_tick_at = Column(DateTime, nullable=False)
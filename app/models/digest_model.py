@@ -0,0 +1,32 @@
+"""
+
+What this file does:
+- Defines the "ai_digests" table (precomputed AI market summaries)
+- One row per asset, overwritten every time a new summary is generated
+- Lets a restarted server answer /ai/market-summary right away
+
+"""
+
+from sqlalchemy import Column, String, Float, Text, DateTime
+from .base import Base
+
+
+class AIDigest(Base):
+
+    # Name of the table in database
+    __tablename__ = "ai_digests"
+
+    # One summary per asset
+    asset_name = Column(String, primary_key=True)
+
+    # Inputs the summary was made from
+    price = Column(Float, nullable=False)
+    risk = Column(String, nullable=False)
+    trend = Column(String, nullable=False)
+
+    # The AI text and who wrote it ("gemini", "local", ...)
+    analysis = Column(Text, nullable=False)
+    source = Column(String, nullable=False)
+
+    # When it was generated
+    generated_at = Column(DateTime, nullable=False)
@@ -5,33 +5,45 @@ What this file does:
 - Stores price history for assets like BTC, ETH, etc.
 - Optimized for time-series queries with proper indexes
 
+Partitioned by time:
+- market_prices is a Postgres range-partitioned table on "timestamp",
+  one partition per day (or week), see services/partition_service.py
+- Queries with a time range only touch the partitions in that range,
+  and old data is removed by dropping whole partitions (no DELETE, no bloat)
+- Postgres requires the partition key in the primary key: (id, timestamp)
+- Only two indexes: the primary key and (asset_name, timestamp).
+  The old single-column indexes on id, asset_name and timestamp were
+  covered by these and only slowed down inserts
+
 """
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, Index
+from sqlalchemy import BigInteger, Column, String, Float, DateTime, Index
 from datetime import datetime
 from .base import Base
 
 
 
 class MarketPrice(Base):
-    
+
     # Name of the table in database
     __tablename__ = "market_prices"
 
     # Column 1: id - unique number for each price entry
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
 
     # Column 2: asset_name - which asset (BTC, ETH, AAPL, etc.)
-    asset_name = Column(String, index=True)
-    
+    asset_name = Column(String)
+
     # Column 3: price - the actual price value
     price = Column(Float)
 
-    # Column 4: timestamp - when was this price recorded (indexed for fast time queries)
-    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+    # Column 4: timestamp - when was this price recorded (the partition key)
+    timestamp = Column(DateTime, default=datetime.utcnow, primary_key=True)
 
     # Composite index for efficient time-range queries per asset
     # Example: "Get BTC prices from last 24 hours" uses this index
+    # (created on every partition automatically)
     __table_args__ = (
         Index('idx_asset_timestamp', 'asset_name', 'timestamp'),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
     )
@@ -4,11 +4,13 @@
 What this file does:
 - Defines the "portfolio" table structure
 - Stores which user owns which assets and how much
+- One row per (user, asset): a unique index makes "add to existing
+  quantity" a single INSERT ... ON CONFLICT DO UPDATE
 
 """
 
 
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Index
 from .base import Base
 
 
@@ -29,3 +31,8 @@ class Portfolio(Base):
 
     # Column 4: quantity - how much of this asset the user owns
     quantity = Column(Float)
+
+    # One row per user and asset (needed by the upsert in portfolio_service.py)
+    __table_args__ = (
+        Index('uq_portfolio_user_asset', 'user_id', 'asset_name', unique=True),
+    )
@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from datetime import datetime
 
 
 class AlertCreate(BaseModel):
@@ -12,6 +13,20 @@ class AlertResponse(BaseModel):
     asset_name: str
     target_price: float
     condition: str
+    armed: bool = True
+
+    class Config:
+        from_attributes = True
+
+
+class AlertEventResponse(BaseModel):
+    id: int
+    alert_id: int
+    asset_name: str
+    condition: str
+    target_price: float
+    price: float
+    triggered_at: datetime
 
     class Config:
         from_attributes = True
@@ -3,6 +3,8 @@
 What this file does:
 - MarketInput: what we need when adding a new price
 - MarketOutput: what we send back when returning prices
+- MarketBatchInput: many prices in one request (bulk ingestion)
+- CandleOutput: one OHLCV candle (for /market/history?resolution=5m)
 
 Example:
 - Someone adds: {"asset_name": "BTC", "price": 42000}
@@ -10,10 +12,14 @@ Example:
 """
 
 
-from pydantic import BaseModel
-from datetime import datetime
+from pydantic import BaseModel, field_validator
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 
 
+# Client clocks may run a little ahead of ours, not more
+MAX_FUTURE_SKEW = timedelta(seconds=5)
+
 
 class MarketInput(BaseModel):
    
@@ -24,6 +30,22 @@ class MarketInput(BaseModel):
     # The price value
     price: float
 
+    # When the price happened (optional - server time is used if missing)
+    # Older timestamps are saved as history but not pushed live (tick_ingestor.py)
+    timestamp: Optional[datetime] = None
+
+    @field_validator("timestamp")
+    @classmethod
+    def not_in_future(cls, value):
+        """stored as naive UTC; a far-future tick would hide every real one"""
+        if value is None:
+            return value
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        if value > datetime.utcnow() + MAX_FUTURE_SKEW:
+            raise ValueError("timestamp is in the future")
+        return value
+
 
 class MarketOutput(BaseModel):
     """
@@ -45,3 +67,47 @@ class MarketOutput(BaseModel):
     # This tells Pydantic to read data from SQLAlchemy model
     class Config:
         from_attributes = True
+
+
+class MarketBatchInput(BaseModel):
+    """
+    Many prices in one request.
+    Example: {"prices": [{"asset_name": "BTC", "price": 42000}, ...]}
+    """
+
+    prices: list[MarketInput]
+
+
+class MarketBatchResponse(BaseModel):
+    """
+    What we send back after queueing a batch.
+    """
+
+    # How many prices were queued
+    accepted: int
+
+    # How many prices are waiting to be written right now
+    queue_depth: int
+
+
+class CandleOutput(BaseModel):
+    """
+    One OHLCV candle.
+    Example: {"bucket_start": "...", "open": 42000, "high": 42100,
+              "low": 41950, "close": 42050, "volume": 300}
+    """
+
+    # Start of the time bucket
+    bucket_start: datetime
+
+    # Open / High / Low / Close prices in the bucket
+    open: float
+    high: float
+    low: float
+    close: float
+
+    # Number of ticks in the bucket
+    volume: int
+
+    class Config:
+        from_attributes = True
@@ -5,6 +5,8 @@ portfolio_schema.py - Defines how Portfolio data looks in API
 What this file does:
 - PortfolioCreate: what we need when adding asset to portfolio
 - PortfolioResponse: what we send back when returning portfolio
+- PortfolioBatchInput: many position changes in one request
+- PortfolioValuation: holdings priced at the latest market price
 
 Example:
 - User adds: {"asset_name": "BTC", "quantity": 0.5}
@@ -12,7 +14,10 @@ Example:
 """
 
 
-from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, Field
 
 
 
@@ -45,3 +50,45 @@ class PortfolioResponse(BaseModel):
    
     class Config:
         from_attributes = True
+
+
+
+class PositionValuation(BaseModel):
+    
+    
+    asset_name: str
+    quantity: float
+    
+    # Latest price and first price of the day (None if never priced)
+    price: Optional[float]
+    open_price: Optional[float]
+    
+    # quantity * price, and how much that moved since the open
+    value: float
+    change: float
+    change_pct: float
+
+
+
+class PortfolioBatchInput(BaseModel):
+    """
+    Many positions in one request.
+    Example: {"mode": "set", "positions": [{"asset_name": "BTC", "quantity": 0.5}, ...]}
+    """
+    
+    # "add" = add to current quantity, "set" = replace it
+    mode: str = Field(default="add", pattern="^(add|set)$")
+    
+    # 3 bind parameters per row, Postgres allows 32767 per statement
+    positions: list[PortfolioCreate] = Field(max_length=5000)
+
+
+
+class PortfolioValuation(BaseModel):
+    
+    
+    positions: list[PositionValuation]
+    total_value: float
+    change: float
+    change_pct: float
+    time: datetime
@@ -0,0 +1,160 @@
+"""
+ai_cache.py - Cache + request coalescing for AI market summaries
+================================================================
+
+What this file does:
+- Remembers the last AI answer per asset (LRU, at most AI_CACHE_SIZE assets)
+- Each answer is stored with a hash of the price window it was made from
+- Many users asking about "BTC" at once share ONE call to the AI
+  (single-flight: the 2nd..Nth request waits for the 1st one's result)
+- An old answer is still served while a new one is made in the background
+  (stale-while-revalidate), so users don't wait for the AI when there's
+  something reasonable to show
+
+When is an answer reused?
+- fresh: same price window, or younger than AI_CACHE_TTL seconds -> served as is
+- stale: younger than AI_CACHE_STALE seconds -> served, refresh started in background
+- too old / nothing cached -> wait for the AI (shared with other waiting requests)
+
+Settings (environment variables):
+- AI_CACHE_TTL     seconds an answer counts as fresh    (default 60)
+- AI_CACHE_STALE   seconds an answer may still be shown (default 600)
+- AI_CACHE_SIZE    assets kept                          (default 256)
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+
+
+# ============ SETTINGS ============
+CACHE_TTL = float(os.getenv("AI_CACHE_TTL", "60"))
+STALE_TTL = float(os.getenv("AI_CACHE_STALE", "600"))
+CACHE_SIZE = int(os.getenv("AI_CACHE_SIZE", "256"))
+
+# Failed answers are kept only briefly (so a rate limit isn't hammered,
+# but a working answer comes back soon)
+ERROR_TTL = 10.0
+ERROR_SOURCES = ("error", "rate_limited", "timeout")
+
+
+def window_hash(prices, *extra) -> str:
+    """short fingerprint of a price window (plus e.g. the risk label)"""
+    digest = hashlib.blake2b(digest_size=12)
+    for price in prices:
+        digest.update(f"{price.id}:{price.price!r};".encode())
+    for value in extra:
+        digest.update(f"|{value}".encode())
+    return digest.hexdigest()
+
+
+class CacheEntry:
+    __slots__ = ("value", "window", "created", "ttl")
+
+    def __init__(self, value, window, ttl):
+        self.value = value
+        self.window = window
+        self.created = time.monotonic()
+        self.ttl = ttl
+
+    def age(self) -> float:
+        return time.monotonic() - self.created
+
+
+class AICache:
+    """
+    Per-asset answer cache with single-flight refresh.
+    Only used from the event loop, so no lock is needed.
+    """
+
+    def __init__(self, ttl: float = CACHE_TTL, stale_ttl: float = STALE_TTL, size: int = CACHE_SIZE):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.size = size
+        self.entries = OrderedDict()   # asset_name -> CacheEntry (oldest used first)
+        self.inflight = {}             # asset_name -> asyncio.Task
+        self.hits = 0
+        self.stale = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+
+    async def get(self, asset_name: str, window: str, compute):
+        """
+        Answer for this asset and price window.
+        compute: async function () -> result dict, called at most once at a time per asset.
+        Returns (result, status) with status "hit", "stale" or "miss".
+        """
+        entry = self.entries.get(asset_name)
+
+        if entry is not None:
+            self.entries.move_to_end(asset_name)
+            age = entry.age()
+
+            # Fresh: nothing changed, or changed only a little while ago
+            if age < entry.ttl or (entry.window == window and age < self.stale_ttl):
+                self.hits += 1
+                return entry.value, "hit"
+
+            # Stale: show it, refresh in the background
+            if age < self.stale_ttl:
+                self.stale += 1
+                self._refresh(asset_name, window, compute)
+                return entry.value, "stale"
+
+        # Nothing usable: wait for the (shared) refresh
+        if asset_name in self.inflight:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+        task = self._refresh(asset_name, window, compute)
+        return await asyncio.shield(task), "miss"
+
+    def _refresh(self, asset_name, window, compute) -> asyncio.Task:
+        """start computing a new answer, unless one is already on its way"""
+        task = self.inflight.get(asset_name)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._compute(asset_name, window, compute))
+            self.inflight[asset_name] = task
+        return task
+
+    async def _compute(self, asset_name, window, compute):
+        try:
+            self.refreshes += 1
+            result = await compute()
+            ttl = ERROR_TTL if result.get("source") in ERROR_SOURCES else self.ttl
+
+            # keep a good old answer rather than replacing it with an error,
+            # and don't ask the AI again for ERROR_TTL seconds
+            old = self.entries.get(asset_name)
+            if ttl == ERROR_TTL and old is not None and old.age() < self.stale_ttl \
+                    and old.value.get("source") not in ERROR_SOURCES:
+                old.ttl = old.age() + ERROR_TTL
+                return result
+
+            self.entries[asset_name] = CacheEntry(result, window, ttl)
+            self.entries.move_to_end(asset_name)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+            return result
+        finally:
+            del self.inflight[asset_name]
+
+    def stats(self) -> dict:
+        total = self.hits + self.stale + self.misses + self.coalesced
+        return {
+            "entries": len(self.entries),
+            "inflight": len(self.inflight),
+            "hits": self.hits,
+            "stale": self.stale,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "refreshes": self.refreshes,
+            "hit_rate": round((self.hits + self.stale) / total, 4) if total else 0.0
+        }
+
+
+# One shared cache for the whole process
+ai_cache = AICache()
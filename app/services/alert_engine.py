@@ -0,0 +1,361 @@
+"""
+alert_engine.py - Evaluates price alerts as ticks arrive
+=========================================================
+
+What this file does:
+- Keeps every alert in memory, grouped by asset
+- Per asset, two sorted lists of target prices: "above" alerts and "below" alerts
+- For every new tick, finds the alerts whose target was crossed since the
+  previous tick with two binary searches (bisect) - no scan over all alerts
+- Saves a row in alert_events for every alert that fires, and pushes it
+  to the owner through alert_hub (topic = user id)
+- With several workers, each one evaluates the ticks it saved itself; other
+  workers' ticks only move the last prices (observe), and their new alerts
+  and fired events arrive through services/broadcast.py
+
+Crossing rules (same as check_alert):
+- "above" fires when price > target: price moved up from p0 to p1,
+  targets in [p0, p1) were crossed
+- "below" fires when price < target: price moved down from p0 to p1,
+  targets in (p1, p0] were crossed
+
+Re-arming (ALERT_REARM_PCT):
+- A fired alert is disarmed, so a price hovering around the target
+  doesn't fire it on every wiggle
+- It re-arms once the price moves back past the target by ALERT_REARM_PCT
+  ("above" 100 re-arms below 99.5 with the default 0.5%). Waiting alerts
+  sit in a second sorted index, so re-arming is a bisect too: a fired
+  "above" alert waits exactly like a "below" alert at its re-arm price
+- The state is saved in alerts.armed, so a restart doesn't re-fire them
+
+Settings (environment variables):
+- ALERT_REARM_PCT  move back past the target that re-arms an alert (default 0.005)
+"""
+
+import os
+import threading
+from bisect import bisect_left, bisect_right
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..models.alert_model import Alert, AlertEvent
+from .broadcast import broadcast
+from .hub import alert_hub
+
+
+# ============ SETTINGS ============
+REARM_PCT = float(os.getenv("ALERT_REARM_PCT", "0.005"))
+
+OPPOSITE = {"above": "below", "below": "above"}
+
+
+def rearm_price(condition: str, target_price: float) -> float:
+    """price the market must move back past before a fired alert re-arms"""
+    if condition == "above":
+        return target_price * (1 - REARM_PCT)
+    return target_price * (1 + REARM_PCT)
+
+
+class SortedTargets:
+    """alert ids sorted by target price, one list per condition"""
+
+    def __init__(self):
+        # parallel lists, sorted by target price
+        self.above_prices = []
+        self.above_ids = []
+        self.below_prices = []
+        self.below_ids = []
+
+    def _lists(self, condition: str):
+        if condition == "above":
+            return self.above_prices, self.above_ids
+        if condition == "below":
+            return self.below_prices, self.below_ids
+        return None, None
+
+    def add(self, alert_id: int, condition: str, target_price: float):
+        prices, ids = self._lists(condition)
+        if prices is None:
+            return
+        position = bisect_right(prices, target_price)
+        prices.insert(position, target_price)
+        ids.insert(position, alert_id)
+
+    def remove(self, alert_id: int, condition: str, target_price: float):
+        prices, ids = self._lists(condition)
+        if prices is None:
+            return
+        lo = bisect_left(prices, target_price)
+        hi = bisect_right(prices, target_price)
+        position = ids.index(alert_id, lo, hi)
+        del prices[position]
+        del ids[position]
+
+    def crossed(self, old_price, new_price):
+        """ids of alerts crossed by a move from old_price to new_price"""
+
+        # First price ever: every alert that is already met fires
+        if old_price is None:
+            hi = bisect_left(self.above_prices, new_price)
+            lo = bisect_right(self.below_prices, new_price)
+            return self.above_ids[:hi] + self.below_ids[lo:]
+
+        if new_price > old_price:
+            lo = bisect_left(self.above_prices, old_price)
+            hi = bisect_left(self.above_prices, new_price)
+            return self.above_ids[lo:hi]
+
+        if new_price < old_price:
+            lo = bisect_right(self.below_prices, new_price)
+            hi = bisect_right(self.below_prices, old_price)
+            return self.below_ids[lo:hi]
+
+        return []
+
+
+class AssetAlerts:
+    """armed and fired (waiting to re-arm) alerts for one asset"""
+
+    def __init__(self):
+        self.armed = SortedTargets()
+
+        # fired alerts, keyed by their re-arm price and the opposite condition
+        self.fired = SortedTargets()
+
+        # previous tick price (None until we've seen one)
+        self.last_price = None
+
+
+class AlertEngine:
+    """
+    All alerts, indexed per asset.
+    Ticks come from the ingestor thread, new alerts from API routes,
+    so both go through one lock.
+    """
+
+    def __init__(self):
+        self.assets = {}   # asset_name -> AssetAlerts
+        self.alerts = {}   # alert_id -> (user_id, asset_name, condition, target_price)
+        self.lock = threading.Lock()
+        self.ticks_evaluated = 0
+        self.triggered = 0
+        self.rearmed = 0
+
+    def _asset(self, asset_name):
+        if asset_name not in self.assets:
+            self.assets[asset_name] = AssetAlerts()
+        return self.assets[asset_name]
+
+    def _disarm(self, asset: AssetAlerts, alert_id: int):
+        _, _, condition, target_price = self.alerts[alert_id]
+        asset.armed.remove(alert_id, condition, target_price)
+        asset.fired.add(alert_id, OPPOSITE[condition], rearm_price(condition, target_price))
+
+    def _rearm(self, asset: AssetAlerts, alert_id: int):
+        _, _, condition, target_price = self.alerts[alert_id]
+        asset.fired.remove(alert_id, OPPOSITE[condition], rearm_price(condition, target_price))
+        asset.armed.add(alert_id, condition, target_price)
+
+    # ============ LOAD / ADD ============
+    def load(self, db: Session, last_prices: dict = None):
+        """
+        Load every alert with one query and build the sorted lists.
+        last_prices: {asset_name: price} so we don't re-fire on restart.
+        """
+        rows = db.execute(
+            select(Alert.id, Alert.user_id, Alert.asset_name, Alert.condition, Alert.target_price, Alert.armed)
+        ).all()
+
+        # sorted once, every insert below lands at the end of its list
+        rows = sorted(rows, key=lambda row: row.target_price)
+
+        with self.lock:
+            for row in rows:
+                if row.condition not in OPPOSITE:
+                    continue
+                self.alerts[row.id] = (row.user_id, row.asset_name, row.condition, row.target_price)
+                asset = self._asset(row.asset_name)
+                if row.armed is False:
+                    asset.fired.add(row.id, OPPOSITE[row.condition], rearm_price(row.condition, row.target_price))
+                else:
+                    asset.armed.add(row.id, row.condition, row.target_price)
+
+            for asset_name, price in (last_prices or {}).items():
+                self._asset(asset_name).last_price = price
+
+        print(f"Alert engine loaded: {len(rows)} alerts")
+
+    def add_alert(self, alert: Alert) -> bool:
+        """
+        Start watching a new alert.
+        Returns True if its condition is already met at the last price
+        (it then counts as fired: the caller records the event).
+        """
+        if alert.condition not in OPPOSITE:
+            return False
+
+        with self.lock:
+            self.alerts[alert.id] = (alert.user_id, alert.asset_name, alert.condition, alert.target_price)
+            asset = self._asset(alert.asset_name)
+            asset.armed.add(alert.id, alert.condition, alert.target_price)
+
+            last_price = asset.last_price
+            if last_price is None:
+                return False
+            if alert.condition == "above":
+                met = last_price > alert.target_price
+            else:
+                met = last_price < alert.target_price
+            if met:
+                self._disarm(asset, alert.id)
+            return met
+
+    # ============ EVALUATE ============
+    def _apply(self, ticks):
+        """
+        Move every asset through the ticks (in time order), firing and
+        re-arming alerts. Returns (triggers, re-armed alert ids).
+        Call with the lock held.
+        """
+        triggers = []
+        rearmed = []
+
+        for tick in ticks:
+            # every asset keeps its last price, so a new alert can be
+            # checked right away even if it is the first one on this asset
+            asset = self._asset(tick["asset_name"])
+            price = tick["price"]
+
+            # both lists are read before either index changes
+            fired = asset.armed.crossed(asset.last_price, price)
+            ready = asset.fired.crossed(asset.last_price, price)
+
+            for alert_id in fired:
+                user_id, asset_name, condition, target_price = self.alerts[alert_id]
+                triggers.append({
+                    "alert_id": alert_id,
+                    "user_id": user_id,
+                    "asset_name": asset_name,
+                    "condition": condition,
+                    "target_price": target_price,
+                    "price": price,
+                    "triggered_at": tick["timestamp"],
+                })
+                self._disarm(asset, alert_id)
+
+            for alert_id in ready:
+                self._rearm(asset, alert_id)
+            rearmed.extend(ready)
+
+            asset.last_price = price
+
+        return triggers, rearmed
+
+    def evaluate(self, ticks):
+        """
+        Check a batch of ticks (in time order).
+        Returns (one trigger dict per alert that fired, ids of re-armed alerts).
+        """
+        with self.lock:
+            triggers, rearmed = self._apply(ticks)
+            self.ticks_evaluated += len(ticks)
+            self.triggered += len(triggers)
+            self.rearmed += len(rearmed)
+        return triggers, rearmed
+
+    def observe(self, ticks):
+        """
+        Follow ticks another worker saved: last prices and armed state
+        move exactly as there, but nothing is recorded (that worker
+        evaluates the ticks and records the events).
+        """
+        with self.lock:
+            self._apply(ticks)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "alerts": len(self.alerts),
+                "assets": len(self.assets),
+                "ticks_evaluated": self.ticks_evaluated,
+                "triggered": self.triggered,
+                "rearmed": self.rearmed
+            }
+
+
+# One shared engine for the whole process
+alert_engine = AlertEngine()
+
+
+# ============ RECORD + PUSH ============
+def event_message(event: dict) -> dict:
+    """JSON-friendly version of a trigger, as pushed to users"""
+    return {
+        "id": event["id"],
+        "alert_id": event["alert_id"],
+        "asset": event["asset_name"],
+        "condition": event["condition"],
+        "target_price": event["target_price"],
+        "price": event["price"],
+        "time": str(event["triggered_at"])
+    }
+
+
+def publish_events(events):
+    """push recorded events (dicts with "id") to their owners, on every worker"""
+    messages = [(event["user_id"], event_message(event)) for event in events]
+    for user_id, message in messages:
+        alert_hub.publish(user_id, message)
+    if messages:
+        # one batch can fire many alerts - split to fit in one NOTIFY each
+        broadcast.publish_chunked("alert_events", messages)
+
+
+def apply_remote_events(messages):
+    """events fired on another worker: push them to this worker's streams"""
+    for user_id, message in messages:
+        alert_hub.publish(user_id, message)
+
+
+def apply_remote_alert(data: dict):
+    """alert created on another worker: watch it here too"""
+    alert_engine.add_alert(Alert(**data))
+
+
+def record_triggers(triggers, rearmed=()):
+    """
+    Save triggers to alert_events in one INSERT and the alerts' armed
+    state in the same transaction, then push the triggers.
+    """
+    if not triggers and not rearmed:
+        return
+
+    db = SessionLocal()
+    try:
+        ids = []
+        if triggers:
+            statement = insert(AlertEvent).returning(AlertEvent.id, sort_by_parameter_order=True)
+            ids = db.execute(statement, triggers).scalars().all()
+            fired = [trigger["alert_id"] for trigger in triggers]
+            db.execute(update(Alert).where(Alert.id.in_(fired)).values(armed=False))
+        if rearmed:
+            db.execute(update(Alert).where(Alert.id.in_(list(rearmed))).values(armed=True))
+        db.commit()
+    finally:
+        db.close()
+
+    for event_id, trigger in zip(ids, triggers):
+        trigger["id"] = event_id
+
+    publish_events(triggers)
+
+
+def evaluate_ticks(ticks):
+    """
+    Registered as a tick_ingestor listener:
+    evaluate the batch, record and push whatever fired.
+    """
+    triggers, rearmed = alert_engine.evaluate(ticks)
+    record_triggers(triggers, rearmed)
@@ -0,0 +1,108 @@
+"""
+alert_stream.py - Pushes triggered alerts to a user as Server-Sent Events
+=========================================================================
+
+What this file does:
+- Subscribes to alert_hub for one user (topic = user id)
+- On (re)connect, first replays every alert_events row newer than the
+  last event id the client saw, then forwards live events as they fire
+- Each SSE message carries the event id, so the browser sends it back
+  as Last-Event-ID when it reconnects - nothing is missed or repeated
+
+SSE format (one message):
+    id: 42
+    event: alert
+    data: {"id": 42, "alert_id": 7, "asset": "BTC", ...}
+
+Used by: GET /alerts/stream
+"""
+
+import asyncio
+import json
+
+from sqlalchemy import select
+
+from ..database import AsyncSessionLocal
+from ..models.alert_model import AlertEvent
+from .alert_engine import event_message
+from .hub import alert_hub
+
+
+# ============ SETTINGS ============
+# Events replayed at most on reconnect (older ones: GET /alerts/events)
+REPLAY_LIMIT = 500
+
+# Send a comment line this often so proxies don't close an idle stream
+KEEPALIVE_SECONDS = 15
+
+
+def sse_message(message: dict) -> bytes:
+    """one alert event as an SSE message"""
+    return f"id: {message['id']}\nevent: alert\ndata: {json.dumps(message)}\n\n".encode()
+
+
+async def missed_events(user_id: int, last_event_id: int):
+    """
+    Events of this user newer than last_event_id, oldest first.
+    Read from the primary: a replica could still be missing the newest rows.
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(AlertEvent)
+            .where(AlertEvent.user_id == user_id)
+            .where(AlertEvent.id > last_event_id)
+            .order_by(AlertEvent.id.asc())
+            .limit(REPLAY_LIMIT)
+        )
+        events = result.scalars().all()
+
+    return [
+        event_message({
+            "id": event.id,
+            "alert_id": event.alert_id,
+            "asset_name": event.asset_name,
+            "condition": event.condition,
+            "target_price": event.target_price,
+            "price": event.price,
+            "triggered_at": event.triggered_at
+        })
+        for event in events
+    ]
+
+
+async def stream_alerts(user_id: int, last_event_id: int = None):
+    """
+    Yields SSE bytes for one user until the client disconnects.
+    last_event_id=None means a fresh connection: live events only.
+    """
+
+    # Step 1: subscribe before the replay query, so no event can slip in between
+    queue = alert_hub.subscribe(user_id)
+
+    try:
+        # Tell the browser to wait 3 s before reconnecting
+        yield b"retry: 3000\n\n"
+
+        # Step 2: replay what was missed while disconnected
+        sent_up_to = last_event_id or 0
+        if last_event_id is not None:
+            for message in await missed_events(user_id, last_event_id):
+                yield sse_message(message)
+                sent_up_to = message["id"]
+
+        # Step 3: live events (skip any already sent by the replay)
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+
+            if message["id"] <= sent_up_to:
+                continue
+            yield sse_message(message)
+            sent_up_to = message["id"]
+
+    finally:
+        # Step 4: client went away - stop receiving events
+        alert_hub.unsubscribe(user_id, queue)
@@ -0,0 +1,140 @@
+"""
+backpressure.py - Keeps slow websocket clients from hurting everyone else
+=========================================================================
+
+What this file does:
+- Every price websocket reads from a LatestValues mailbox (services/hub.py):
+  while a client is busy, newer prices replace older ones (conflation),
+  so memory per client is bounded by the number of assets it watches
+- Clients may ask for at most N updates per second (?max_rate=N); prices
+  arriving in between are conflated too
+- Slow clients are disconnected (close code 1013 "try again later"):
+    one send takes longer than WS_SEND_TIMEOUT
+    average send time is above WS_SLOW_SEND_MS
+    an update has been waiting in the mailbox for more than WS_MAX_LAG
+    seconds (measured in time, not in updates: a burst of 100 ticks from
+    one ingestor flush is nothing for a client that keeps up, and 200
+    watched assets don't count as more lag than one)
+  A client on a bad mobile link reconnects and starts from the newest prices
+
+Settings (environment variables):
+- WS_SEND_TIMEOUT  seconds one frame may take to send        (default 5)
+- WS_SLOW_SEND_MS  max average send time, milliseconds        (default 250)
+- WS_MAX_LAG       max seconds an update may wait for a client (default 1)
+"""
+
+import asyncio
+import os
+import time
+
+
+# ============ SETTINGS ============
+SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "5"))
+SLOW_SEND_MS = float(os.getenv("WS_SLOW_SEND_MS", "250"))
+MAX_LAG = float(os.getenv("WS_MAX_LAG", "1"))
+
+# Average send time: exponential moving average, judged after a few sends
+SEND_AVERAGE_WEIGHT = 0.2
+MIN_SENDS = 5
+
+# WebSocket close code for "server overloaded, try again later"
+CLOSE_SLOW_CONSUMER = 1013
+
+
+class SlowConsumer(Exception):
+    """the client can't keep up - disconnect it"""
+
+
+class StreamStats:
+    """counters shared by all price websockets (shown on GET /metrics)"""
+
+    def __init__(self):
+        self.open = 0
+        self.frames = 0
+        self.slow_disconnects = 0
+        self.conflated = 0
+        self.throttled = 0
+        self.max_send_ms = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "open": self.open,
+            "frames": self.frames,
+            "conflated": self.conflated,
+            "throttled": self.throttled,
+            "slow_disconnects": self.slow_disconnects,
+            "max_send_ms": round(self.max_send_ms, 1)
+        }
+
+
+stream_stats = StreamStats()
+
+
+class ClientStream:
+    """
+    Outgoing side of one websocket: rate limit + slow-consumer checks.
+
+        stream = ClientStream(websocket, mailbox, max_rate)
+        messages = await stream.next()     # waits for the rate limit, then the mailbox
+        await stream.send(frame)           # raises SlowConsumer
+    """
+
+    def __init__(self, websocket, mailbox, max_rate: float = 0):
+        self.websocket = websocket
+        self.mailbox = mailbox
+        self.set_rate(max_rate)
+        self.last_send = 0.0
+        self.sends = 0
+        self.average_send = 0.0
+        self.reported_conflated = 0
+
+    def set_rate(self, max_rate: float):
+        """at most max_rate frames per second (0 = as fast as ticks arrive)"""
+        self.interval = 1.0 / max_rate if max_rate and max_rate > 0 else 0.0
+
+    async def next(self) -> list:
+        """newest messages, no sooner than the client's max rate allows"""
+        wait = self.last_send + self.interval - time.monotonic()
+        if wait > 0:
+            stream_stats.throttled += 1
+            await asyncio.sleep(wait)
+        messages = await self.mailbox.get()
+
+        stream_stats.conflated += self.mailbox.conflated - self.reported_conflated
+        self.reported_conflated = self.mailbox.conflated
+        return messages
+
+    async def send(self, frame):
+        """send one text/bytes frame, measuring how long the client takes"""
+        started = time.monotonic()
+        try:
+            if isinstance(frame, bytes):
+                await asyncio.wait_for(self.websocket.send_bytes(frame), SEND_TIMEOUT)
+            else:
+                await asyncio.wait_for(self.websocket.send_text(frame), SEND_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise SlowConsumer(f"send took longer than {SEND_TIMEOUT}s")
+
+        elapsed = time.monotonic() - started
+        self.last_send = started + elapsed
+        self.sends += 1
+        stream_stats.frames += 1
+        stream_stats.max_send_ms = max(stream_stats.max_send_ms, elapsed * 1000)
+
+        # Slow on average?
+        self.average_send += SEND_AVERAGE_WEIGHT * (elapsed - self.average_send)
+        if self.sends >= MIN_SENDS and self.average_send * 1000 > SLOW_SEND_MS:
+            raise SlowConsumer(f"average send {self.average_send * 1000:.0f} ms")
+
+        # Fallen behind? How long the oldest update not yet sent has waited
+        lag = self.mailbox.age()
+        if lag > MAX_LAG:
+            raise SlowConsumer(f"updates waited {lag:.1f}s to be sent")
+
+
+async def close_slow_consumer(websocket, reason: str):
+    stream_stats.slow_disconnects += 1
+    try:
+        await websocket.close(code=CLOSE_SLOW_CONSUMER, reason=f"slow consumer: {reason}"[:120])
+    except Exception:
+        pass
@@ -0,0 +1,330 @@
+"""
+broadcast.py - Messages between uvicorn worker processes
+========================================================
+
+What this file does:
+- With several workers, every process has its own price cache, hubs, alert
+  engine, valuations and token denylist. A tick saved by worker A must reach
+  the websocket clients of worker B too
+- Each worker publishes what changed in its own state; every OTHER worker
+  applies it to its local copy:
+    "ticks"         saved ticks    -> price cache, hubs, valuations, risk,
+                                      alert engine last prices (no re-firing)
+    "alert_events"  fired alerts   -> alert_hub (SSE clients)
+    "alert"         new alert      -> alert engine
+    "holding"       new quantity   -> valuation engine
+    "revoke"        logout         -> token denylist
+- A worker ignores its own messages (it already applied them directly)
+
+Backends (BROADCAST_BACKEND):
+- postgres  LISTEN/NOTIFY on the app database, no extra infrastructure.
+            NOTIFY payloads must stay under 8000 bytes, so ticks and alert
+            events are sent in chunks of at most BROADCAST_MAX_BYTES encoded
+            bytes, and any other message that is too big is dropped (and
+            counted).
+            Messages sent while a worker is
+            reconnecting are lost (alert events are also in the DB and SSE
+            clients replay them with Last-Event-ID)
+- memory    workers in ONE process sharing a bus (tests, single worker)
+- off       nothing is sent
+
+Received messages are handled on one background thread, in order, so tick
+listeners run exactly like they do on the ingestor's writer thread.
+
+Settings (environment variables):
+- BROADCAST_BACKEND    postgres | memory | off  (default postgres)
+- BROADCAST_CHANNEL    NOTIFY channel name      (default market_events)
+- BROADCAST_MAX_BYTES  max encoded message size (default 7000, NOTIFY limit is 8000)
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import asyncpg
+
+from ..database import DATABASE_URL
+from .price_cache import from_epoch, to_epoch
+
+
+# ============ SETTINGS ============
+BACKEND = os.getenv("BROADCAST_BACKEND", "postgres")
+CHANNEL = os.getenv("BROADCAST_CHANNEL", "market_events")
+MAX_BYTES = int(os.getenv("BROADCAST_MAX_BYTES", "7000"))
+
+# Room for the message envelope around a chunk of ticks
+# ({"type": "ticks", "origin": ..., "sent_at": ..., "data": [...]})
+ENVELOPE_BYTES = 200
+
+# Seconds between reconnect attempts of the LISTEN connection,
+# and to wait for a connection at all
+RECONNECT_DELAY = 2.0
+CONNECT_TIMEOUT = 5.0
+
+
+# ============ BACKENDS ============
+class MemoryBackend:
+    """every backend on the same bus gets every message (one process)"""
+
+    buses = {}   # bus name -> set of receive callbacks
+
+    def __init__(self, bus: str = CHANNEL):
+        self.bus = bus
+        self.on_message = None
+
+    async def start(self, on_message):
+        self.on_message = on_message
+        MemoryBackend.buses.setdefault(self.bus, set()).add(on_message)
+
+    async def publish(self, payload: str):
+        for on_message in list(MemoryBackend.buses.get(self.bus, ())):
+            on_message(payload)
+
+    async def stop(self):
+        MemoryBackend.buses.get(self.bus, set()).discard(self.on_message)
+
+
+class PostgresBackend:
+    """
+    LISTEN on one dedicated connection, NOTIFY through a second one
+    (an asyncpg connection runs one command at a time).
+    """
+
+    def __init__(self, dsn: str = DATABASE_URL, channel: str = CHANNEL):
+        self.dsn = dsn
+        self.channel = channel
+        self.listen_connection = None
+        self.notify_connection = None
+        self.notify_lock = asyncio.Lock()
+        self.task = None
+        self.reconnects = 0
+
+    async def start(self, on_message):
+        # connect once here, so a wrong setup fails at startup
+        self.notify_connection = await asyncpg.connect(self.dsn, timeout=CONNECT_TIMEOUT)
+        self.task = asyncio.get_running_loop().create_task(self._listen(on_message))
+
+    async def _listen(self, on_message):
+        """keep a LISTEN connection open, reconnecting when it drops"""
+        while True:
+            lost = asyncio.Event()
+            try:
+                self.listen_connection = await asyncpg.connect(self.dsn, timeout=CONNECT_TIMEOUT)
+                self.listen_connection.add_termination_listener(lambda connection: lost.set())
+                await self.listen_connection.add_listener(
+                    self.channel, lambda connection, pid, channel, payload: on_message(payload)
+                )
+                await lost.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                # anything (incl. asyncpg.InterfaceError on a connection closed
+                # mid-read) - reconnect, or this worker silently goes deaf
+                print(f"Broadcast LISTEN failed: {type(error).__name__}: {error}")
+            finally:
+                await self._close_listen_connection()
+            self.reconnects += 1
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def _close_listen_connection(self):
+        connection, self.listen_connection = self.listen_connection, None
+        if connection is not None and not connection.is_closed():
+            try:
+                await connection.close(timeout=CONNECT_TIMEOUT)
+            except Exception:
+                connection.terminate()
+
+    async def publish(self, payload: str):
+        async with self.notify_lock:
+            if self.notify_connection is None or self.notify_connection.is_closed():
+                self.notify_connection = await asyncpg.connect(self.dsn, timeout=CONNECT_TIMEOUT)
+            await self.notify_connection.execute("SELECT pg_notify($1, $2)", self.channel, payload)
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        if self.notify_connection is not None and not self.notify_connection.is_closed():
+            await self.notify_connection.close()
+
+
+def make_backend(name: str = BACKEND):
+    if name == "postgres":
+        return PostgresBackend()
+    if name == "memory":
+        return MemoryBackend()
+    if name == "off":
+        return None
+    raise ValueError(f"Unknown BROADCAST_BACKEND: {name}")
+
+
+# ============ BROADCAST ============
+class Broadcast:
+    """
+    Sends this worker's changes, applies the other workers' changes.
+
+        broadcast.on("alert", handler)       # handler(data), on the handler thread
+        broadcast.publish("alert", data)     # from any thread
+    """
+
+    def __init__(self, backend=None, worker_id: str = None):
+        self.backend = backend
+        self.worker_id = worker_id or uuid.uuid4().hex[:12]
+        self.loop = None
+        self.handlers = {}          # message type -> handler(data)
+        self.tick_listeners = []    # listener(ticks) for other workers' ticks
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="broadcast")
+
+        self.sent = 0
+        self.received = 0
+        self.failed = 0
+        self.oversized = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+        self.on("ticks", self._apply_ticks)
+
+    def on(self, message_type: str, handler):
+        self.handlers[message_type] = handler
+
+    def add_tick_listener(self, listener):
+        """listener(ticks) is called with ticks saved by other workers"""
+        self.tick_listeners.append(listener)
+
+    # ============ START / STOP ============
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        if self.backend is None:
+            return
+        try:
+            await self.backend.start(self._receive)
+        except Exception as error:
+            print(f"Broadcast backend {type(self.backend).__name__} unavailable ({error}), workers won't share ticks")
+            self.backend = None
+
+    async def stop(self):
+        if self.backend is not None:
+            await self.backend.stop()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    # ============ SEND ============
+    def publish(self, message_type: str, data):
+        """send to the other workers (thread-safe, never blocks the caller)"""
+        if self.backend is None or self.loop is None or self.loop.is_closed():
+            return
+
+        payload = json.dumps({
+            "type": message_type,
+            "origin": self.worker_id,
+            "sent_at": time.time(),
+            "data": data
+        })
+        size = len(payload.encode())
+        if size > MAX_BYTES:
+            # NOTIFY would reject it - don't let it fail on the loop
+            self.oversized += 1
+            print(f"Broadcast {message_type} message too large ({size} bytes), not sent")
+            return
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is self.loop:
+            self.loop.create_task(self._send(payload))
+        else:
+            self.loop.call_soon_threadsafe(lambda: self.loop.create_task(self._send(payload)))
+
+    async def _send(self, payload: str):
+        try:
+            await self.backend.publish(payload)
+            self.sent += 1
+        except Exception as error:
+            self.failed += 1
+            print(f"Broadcast publish failed: {error}")
+
+    def publish_chunked(self, message_type: str, items: list):
+        """
+        Send a list as one or more messages of the same type, each small
+        enough for one NOTIFY (measured in encoded bytes). Receivers get
+        the list in pieces, in order. Only an item that is too big on its
+        own is dropped (by publish).
+        """
+        budget = MAX_BYTES - ENVELOPE_BYTES
+        chunk, size = [], 0
+        for item in items:
+            item_size = len(json.dumps(item).encode()) + 2   # ", " between items
+            if chunk and size + item_size > budget:
+                self.publish(message_type, chunk)
+                chunk, size = [], 0
+            chunk.append(item)
+            size += item_size
+        if chunk:
+            self.publish(message_type, chunk)
+
+    def publish_ticks(self, ticks):
+        """
+        Registered as a tick_ingestor listener: saved ticks, in chunks
+        small enough for one NOTIFY (so long asset names can't push a
+        chunk over the limit).
+        """
+        self.publish_chunked("ticks", [
+            [tick["id"], tick["asset_name"], tick["price"], to_epoch(tick["timestamp"])]
+            for tick in ticks
+        ])
+
+    # ============ RECEIVE ============
+    def _receive(self, payload: str):
+        """called by the backend on the event loop"""
+        message = json.loads(payload)
+        if message["origin"] == self.worker_id:
+            return
+
+        latency = max(0.0, time.time() - message["sent_at"])
+        self.received += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+
+        handler = self.handlers.get(message["type"])
+        if handler is not None:
+            self.executor.submit(self._handle, handler, message["data"])
+
+    def _handle(self, handler, data):
+        try:
+            handler(data)
+        except Exception as error:
+            print(f"Broadcast handler error: {error}")
+
+    def _apply_ticks(self, rows):
+        ticks = [
+            {"id": tick_id, "asset_name": asset_name, "price": price, "timestamp": from_epoch(seconds)}
+            for tick_id, asset_name, price, seconds in rows
+        ]
+        for listener in self.tick_listeners:
+            try:
+                listener(ticks)
+            except Exception as error:
+                print(f"Remote tick listener error: {error}")
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__ if self.backend is not None else "off",
+            "worker_id": self.worker_id,
+            "sent": self.sent,
+            "received": self.received,
+            "failed": self.failed,
+            "oversized": self.oversized,
+            "avg_latency_ms": round(self.total_latency / self.received * 1000, 2) if self.received else 0.0,
+            "max_latency_ms": round(self.max_latency * 1000, 2)
+        }
+
+
+# One shared broadcast for the whole process
+broadcast = Broadcast(make_backend())
@@ -0,0 +1,292 @@
+"""
+digest_service.py - Precomputed AI market summaries
+====================================================
+
+What this file does:
+- A background loop on the event loop looks at every active asset every
+  DIGEST_CHECK_INTERVAL seconds and decides if its AI summary is due
+- Due summaries are generated (build_summary_prompt over 30 days of candles
+  and the cached ticks + calculate_risk / risk engine + analyze_trend,
+  then the AI) and stored in memory and in
+  the ai_digests table with the time they were generated
+- /ai/market-summary/{asset} just reads the stored summary - O(1),
+  no AI call on the request path
+- The loop runs in one worker only (job_runner.py); the other workers are
+  told through services/broadcast.py and read the new summary from ai_digests
+- A summary older than DIGEST_MAX_AGE is not served (no leader, generation
+  failing, ...): the request falls back to the on-demand AI path (ai_cache)
+
+When is a summary regenerated? (adaptive schedule)
+- Right away when the regime changes (risk level or trend is different),
+  but never more often than DIGEST_MIN_INTERVAL
+- Otherwise after an interval that shrinks when the asset is volatile:
+    interval = DIGEST_INTERVAL * DIGEST_REFERENCE_VOL / annualized volatility
+  clamped to [DIGEST_MIN_INTERVAL, DIGEST_MAX_INTERVAL]
+- When due but the price moved less than DIGEST_MIN_MOVE since the last
+  summary, nothing material changed: the AI is not called
+
+Settings (environment variables):
+- DIGEST_CHECK_INTERVAL  seconds between checks            (default 5)
+- DIGEST_INTERVAL        regeneration interval at the
+                         reference volatility, seconds      (default 300)
+- DIGEST_MIN_INTERVAL    fastest regeneration, seconds      (default 30)
+- DIGEST_MAX_INTERVAL    slowest regeneration, seconds      (default 1800)
+- DIGEST_REFERENCE_VOL   annualized volatility for DIGEST_INTERVAL (default 0.5)
+- DIGEST_MIN_MOVE        relative price move that counts as material (default 0.002)
+- DIGEST_MAX_AGE         oldest summary still served, seconds (default 2 x DIGEST_MAX_INTERVAL)
+"""
+
+import asyncio
+import math
+import os
+import time
+from datetime import datetime
+
+from sqlalchemy import select
+
+from ..database import AsyncSessionLocal
+from ..models.digest_model import AIDigest
+from ..utils.forecast_utils import analyze_trend
+from ..utils.risk_utils import calculate_risk
+from .ai_cache import ERROR_SOURCES
+from .ai_service import generate_ai_response, history_series
+from .broadcast import broadcast
+from .price_cache import price_cache
+from .risk_engine import risk_engine
+
+
+# ============ SETTINGS ============
+CHECK_INTERVAL = float(os.getenv("DIGEST_CHECK_INTERVAL", "5"))
+BASE_INTERVAL = float(os.getenv("DIGEST_INTERVAL", "300"))
+MIN_INTERVAL = float(os.getenv("DIGEST_MIN_INTERVAL", "30"))
+MAX_INTERVAL = float(os.getenv("DIGEST_MAX_INTERVAL", "1800"))
+REFERENCE_VOL = float(os.getenv("DIGEST_REFERENCE_VOL", "0.5"))
+MIN_MOVE = float(os.getenv("DIGEST_MIN_MOVE", "0.002"))
+MAX_AGE = float(os.getenv("DIGEST_MAX_AGE", str(2 * MAX_INTERVAL)))
+
+# Prices shown to the AI
+PROMPT_PRICES = 10
+
+
+def regime(risk: str, trend: str):
+    """the part of the inputs that forces a new summary when it changes"""
+    return risk.split(" (")[0], trend
+
+
+def refresh_interval(annual_volatility) -> float:
+    """seconds between summaries for an asset this volatile"""
+    if not annual_volatility or annual_volatility <= 0:
+        return MAX_INTERVAL
+    interval = BASE_INTERVAL * REFERENCE_VOL / annual_volatility
+    return min(MAX_INTERVAL, max(MIN_INTERVAL, interval))
+
+
+class DigestService:
+    """
+    Stored summaries + the background loop that keeps them fresh.
+    Only used from the event loop, so no lock is needed (apply_remote,
+    called from the broadcast thread, just schedules work on the loop).
+    """
+
+    def __init__(self):
+        self.digests = {}        # asset_name -> digest dict (what the API returns)
+        self.checked_at = {}     # asset_name -> monotonic time of the last due check
+        self.generated_at = {}   # asset_name -> monotonic time of the last summary
+        self.wanted = set()      # known assets someone asked for that have no summary yet
+        self.loop = None
+        self.task = None
+        self.generated = 0
+        self.skipped = 0
+        self.failures = 0
+        self.expired = 0
+
+    # ============ READ ============
+    def get(self, asset_name: str):
+        """
+        Stored summary for an asset, or None if there is none or it is
+        older than MAX_AGE. Assets with live prices are then queued.
+        """
+        digest = self.digests.get(asset_name)
+        if digest is not None:
+            age = (datetime.utcnow() - digest["generated_at"]).total_seconds()
+            if age <= MAX_AGE:
+                return digest
+            self.expired += 1
+        # only real assets, so arbitrary names in URLs can't grow the set
+        if asset_name in price_cache.assets():
+            self.wanted.add(asset_name)
+        return None
+
+    # ============ INPUTS ============
+    def inputs(self, asset_name: str):
+        """(prices, risk, trend, annualized volatility) from the in-memory caches"""
+        prices = price_cache.latest(asset_name, PROMPT_PRICES)
+        if not prices:
+            return None
+        risk_metrics = risk_engine.asset_risk(asset_name)
+        if risk_metrics is not None:
+            risk, volatility = risk_metrics["label"], risk_metrics["annualized_volatility"]
+        else:
+            risk, volatility = calculate_risk(prices), None
+        return prices, risk, analyze_trend(prices), volatility
+
+    def is_due(self, asset_name, prices, risk, trend, volatility) -> bool:
+        """regime change, or interval passed and the price moved materially"""
+        digest = self.digests.get(asset_name)
+        if digest is None:
+            return True
+
+        # never faster than MIN_INTERVAL, even if the regime flips back and forth
+        if time.monotonic() - self.generated_at.get(asset_name, 0.0) < MIN_INTERVAL:
+            return False
+        if regime(risk, trend) != regime(digest["risk"], digest["trend"]):
+            return True
+
+        last_check = self.checked_at.get(asset_name, 0.0)
+        if time.monotonic() - last_check < refresh_interval(volatility):
+            return False
+
+        self.checked_at[asset_name] = time.monotonic()
+        move = abs(math.log(prices[0].price / digest["price"])) if digest["price"] > 0 else 1.0
+        if move < MIN_MOVE:
+            self.skipped += 1
+            return False
+        return True
+
+    # ============ GENERATE ============
+    async def refresh(self, asset_name: str, force: bool = False):
+        """regenerate one asset's summary if it is due (or force=True)"""
+        inputs = self.inputs(asset_name)
+        if inputs is None:
+            # unknown asset - forget it until someone asks again
+            self.wanted.discard(asset_name)
+            return None
+        prices, risk, trend, volatility = inputs
+
+        if not force and not self.is_due(asset_name, prices, risk, trend, volatility):
+            return self.digests.get(asset_name)
+
+        # the prompt summarizes the last 30 days, not just the last prices
+        async with AsyncSessionLocal() as db:
+            series = await history_series(db, asset_name)
+        result = await generate_ai_response(asset_name, prices, risk, series)
+        if result.get("source") in ERROR_SOURCES:
+            # keep the old summary, try again at the next check
+            self.failures += 1
+            return self.digests.get(asset_name)
+
+        digest = {
+            "asset": asset_name,
+            "price": prices[0].price,
+            "risk": risk,
+            "trend": trend,
+            "analysis": result.get("analysis", ""),
+            "source": result.get("source", ""),
+            "generated_at": datetime.utcnow()
+        }
+        self.digests[asset_name] = digest
+        self.checked_at[asset_name] = self.generated_at[asset_name] = time.monotonic()
+        self.wanted.discard(asset_name)
+        self.generated += 1
+        await self.save(digest)
+        # only the name: the analysis text may not fit in one NOTIFY
+        broadcast.publish("digest", {"asset": asset_name})
+        return digest
+
+    def apply_remote(self, data: dict):
+        """
+        The leader worker stored a new summary (called on the broadcast
+        thread): read it from ai_digests on the event loop.
+        """
+        if self.loop is not None and not self.loop.is_closed():
+            asyncio.run_coroutine_threadsafe(self.reload(data["asset"]), self.loop)
+
+    async def refresh_all(self):
+        """one pass over every active asset"""
+        for asset_name in set(price_cache.assets()) | self.wanted:
+            try:
+                await self.refresh(asset_name)
+            except Exception as error:
+                self.failures += 1
+                print(f"Digest for {asset_name} failed: {error}")
+
+    # ============ STORAGE ============
+    async def save(self, digest: dict):
+        async with AsyncSessionLocal() as db:
+            await db.merge(AIDigest(
+                asset_name=digest["asset"],
+                price=digest["price"],
+                risk=digest["risk"],
+                trend=digest["trend"],
+                analysis=digest["analysis"],
+                source=digest["source"],
+                generated_at=digest["generated_at"]
+            ))
+            await db.commit()
+
+    def _remember(self, row: AIDigest):
+        self.digests[row.asset_name] = {
+            "asset": row.asset_name,
+            "price": row.price,
+            "risk": row.risk,
+            "trend": row.trend,
+            "analysis": row.analysis,
+            "source": row.source,
+            "generated_at": row.generated_at
+        }
+
+    async def load(self):
+        """read stored summaries (called at startup, on the event loop)"""
+        self.loop = asyncio.get_running_loop()
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(select(AIDigest))).scalars().all()
+
+        for row in rows:
+            self._remember(row)
+        print(f"AI digests loaded: {len(rows)} assets")
+
+    async def reload(self, asset_name: str):
+        """read one asset's stored summary (another worker generated it)"""
+        try:
+            async with AsyncSessionLocal() as db:
+                row = await db.get(AIDigest, asset_name)
+        except Exception as error:
+            print(f"Reading digest for {asset_name} failed: {error}")
+            return
+        if row is not None:
+            self._remember(row)
+            self.wanted.discard(asset_name)
+
+    # ============ BACKGROUND LOOP ============
+    async def run(self):
+        while True:
+            await self.refresh_all()
+            await asyncio.sleep(CHECK_INTERVAL)
+
+    def start(self):
+        """start the loop on the running event loop"""
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def stats(self) -> dict:
+        return {
+            "running": self.task is not None and not self.task.done(),
+            "assets": len(self.digests),
+            "generated": self.generated,
+            "skipped": self.skipped,
+            "expired": self.expired,
+            "failures": self.failures
+        }
+
+
+# One shared service for the whole process
+digest_service = DigestService()
@@ -0,0 +1,133 @@
+"""
+export_service.py - Streams raw price history out of the database
+==================================================================
+
+What this file does:
+- Reads ticks with a server-side cursor (async stream + yield_per), a chunk at a time
+- Turns each chunk into NDJSON, CSV or Arrow IPC bytes and yields it
+- Memory stays constant no matter how many rows are exported,
+  and the first bytes go out before the query has finished
+
+Used by: GET /market/history/{asset_name}/export
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+
+from sqlalchemy import select
+
+from ..database import ReadAsyncSessionLocal
+from ..models.market_model import MarketPrice
+
+
+# ============ TRY TO IMPORT PYARROW ============
+# Arrow export is optional - only available if pyarrow is installed
+try:
+    import pyarrow as pa
+    arrow_available = True
+except ImportError:
+    pa = None
+    arrow_available = False
+
+
+# ============ SETTINGS ============
+# Rows fetched from the server-side cursor per round-trip
+CHUNK_SIZE = 5000
+
+# format name -> HTTP media type
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+
+async def stream_price_chunks(asset_name: str, start_time: datetime):
+    """
+    Yields lists of (id, price, timestamp) rows, oldest first.
+    Opens its own session, because the stream outlives the request handler.
+    """
+    async with ReadAsyncSessionLocal() as db:
+        query = (
+            select(MarketPrice.id, MarketPrice.price, MarketPrice.timestamp)
+            .where(MarketPrice.asset_name == asset_name)
+            .where(MarketPrice.timestamp >= start_time)
+            .order_by(MarketPrice.timestamp.asc())
+            .execution_options(yield_per=CHUNK_SIZE)   # server-side cursor
+        )
+        result = await db.stream(query)
+
+        async for chunk in result.partitions():
+            yield chunk
+
+
+# ============ FORMATS ============
+async def export_ndjson(asset_name: str, start_time: datetime):
+    """one JSON object per line"""
+    async for chunk in stream_price_chunks(asset_name, start_time):
+        lines = [
+            json.dumps({
+                "id": row.id,
+                "asset_name": asset_name,
+                "price": row.price,
+                "timestamp": row.timestamp.isoformat()
+            })
+            for row in chunk
+        ]
+        yield ("\n".join(lines) + "\n").encode()
+
+
+async def export_csv(asset_name: str, start_time: datetime):
+    """header line, then id,asset_name,price,timestamp rows"""
+    yield b"id,asset_name,price,timestamp\n"
+
+    async for chunk in stream_price_chunks(asset_name, start_time):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerows(
+            (row.id, asset_name, row.price, row.timestamp.isoformat()) for row in chunk
+        )
+        yield buffer.getvalue().encode()
+
+
+async def export_arrow(asset_name: str, start_time: datetime):
+    """Arrow IPC stream: schema first, then one record batch per chunk"""
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("price", pa.float64()),
+        ("timestamp", pa.timestamp("us")),
+    ])
+
+    sink = io.BytesIO()
+    writer = pa.ipc.new_stream(sink, schema)
+
+    def take_bytes():
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    async for chunk in stream_price_chunks(asset_name, start_time):
+        ids, prices, timestamps = zip(*chunk)
+        writer.write_batch(pa.record_batch(
+            [pa.array(ids, pa.int64()), pa.array(prices, pa.float64()),
+             pa.array(timestamps, pa.timestamp("us"))],
+            schema=schema
+        ))
+        yield take_bytes()
+
+    writer.close()
+    yield take_bytes()
+
+
+def export_prices(asset_name: str, start_time: datetime, export_format: str):
+    """pick the byte generator for a format name"""
+    if export_format == "ndjson":
+        return export_ndjson(asset_name, start_time)
+    if export_format == "csv":
+        return export_csv(asset_name, start_time)
+    if export_format == "arrow":
+        return export_arrow(asset_name, start_time)
+    raise ValueError(f"Unknown export format: {export_format}")
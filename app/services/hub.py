@@ -0,0 +1,227 @@
+"""
+hub.py - In-process publish/subscribe hub
+==========================================
+
+What this file does:
+- Keeps a list of subscribers (websocket clients) for each topic (asset name)
+- When a new price is saved, it is published ONCE to the hub
+- The hub copies the message into every subscriber's queue
+
+Why:
+- Before, every websocket asked the database for the latest price every 5 seconds
+- Now the database is only written to, and readers get the tick pushed to them
+- 1 dashboard or 1000 dashboards = same database load
+
+Queues are bounded: if a client is too slow, its oldest message is dropped
+so one slow client can never use up all the server memory.
+
+Websockets subscribe with a LatestValues mailbox instead of a queue: it
+keeps only the newest message per asset (conflation), so a slow client
+skips to the current price instead of working through a backlog.
+
+One queue may be subscribed to many topics (multiplexed websocket).
+publish_batch() then hands each queue ONE list with the messages of all its
+topics, instead of one queue item per message.
+"""
+
+import asyncio
+import threading
+import time
+
+
+# Max messages waiting for one client before we start dropping old ones
+DEFAULT_QUEUE_SIZE = 100
+
+
+class LatestValues:
+    """
+    Queue-like mailbox that keeps only the newest message per key.
+    Never holds more than one message per key, however slow the reader is.
+    Used (and filled) only on the event loop.
+    """
+
+    def __init__(self, key):
+        self.key = key              # message -> key, e.g. the asset name
+        self.values = {}
+        self.event = asyncio.Event()
+        self.received = 0
+        self.conflated = 0          # messages replaced before they were read
+        self.oldest = None          # when the oldest unread message arrived (monotonic)
+
+    def full(self) -> bool:
+        return False
+
+    def qsize(self) -> int:
+        return len(self.values)
+
+    def put_nowait(self, message):
+        """a message, or a list of them (Hub.publish_batch)"""
+        if not self.values:
+            self.oldest = time.monotonic()
+        for item in message if isinstance(message, list) else (message,):
+            key = self.key(item)
+            if key in self.values:
+                self.conflated += 1
+            self.values[key] = item
+            self.received += 1
+        self.event.set()
+
+    async def get(self) -> list:
+        """wait for messages, return the newest one per key"""
+        while not self.values:
+            self.event.clear()
+            await self.event.wait()
+        values = list(self.values.values())
+        self.values.clear()
+        self.oldest = None
+        return values
+
+    def age(self) -> float:
+        """seconds the oldest unread message has been waiting (0 if none)"""
+        if self.oldest is None:
+            return 0.0
+        return time.monotonic() - self.oldest
+
+
+class Hub:
+    """
+    Fans out messages to all subscribers of a topic.
+
+    publish() can be called from any thread (background generator,
+    sync routes running in the threadpool). Delivery always happens
+    on the event loop thread, so the queues are only touched there.
+    """
+
+    def __init__(self, queue_size: int = DEFAULT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.loop = None
+        self.subscribers = {}   # topic -> set of asyncio.Queue
+        self.lock = threading.Lock()   # subscribers and the counters below
+        self.published = 0
+        self.dropped = 0
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """remember which event loop owns the subscriber queues"""
+        self.loop = loop
+
+    def subscribe(self, topic, queue=None):
+        """
+        create a new queue that will receive every message for this topic
+        (or add the topic to an existing queue / LatestValues mailbox)
+        """
+        if queue is None:
+            queue = asyncio.Queue(maxsize=self.queue_size)
+        with self.lock:
+            self.subscribers.setdefault(topic, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, topic, queue):
+        """stop sending messages to this queue"""
+        with self.lock:
+            queues = self.subscribers.get(topic)
+            if queues is None:
+                return
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[topic]
+
+    def publish(self, topic, message):
+        """send a message to every subscriber of the topic (thread-safe)"""
+        with self.lock:
+            self.published += 1
+
+        # Nobody listening and no loop yet (e.g. during startup) - nothing to do
+        if self.loop is None or self.loop.is_closed():
+            return
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is self.loop:
+            self._deliver(topic, message)
+        else:
+            self.loop.call_soon_threadsafe(self._deliver, topic, message)
+
+    def publish_batch(self, messages: dict):
+        """
+        {topic: message} from one tick cycle (thread-safe).
+        Each subscriber queue gets one list with the messages of its topics.
+        """
+        with self.lock:
+            self.published += len(messages)
+
+        if self.loop is None or self.loop.is_closed() or not messages:
+            return
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is self.loop:
+            self._deliver_batch(messages)
+        else:
+            self.loop.call_soon_threadsafe(self._deliver_batch, messages)
+
+    def _deliver(self, topic, message):
+        """runs on the event loop: put the message in each subscriber queue"""
+        with self.lock:
+            queues = list(self.subscribers.get(topic, ()))
+
+        dropped = 0
+        for queue in queues:
+            # Queue full = slow client, drop its oldest message to make room
+            if queue.full():
+                queue.get_nowait()
+                dropped += 1
+            queue.put_nowait(message)
+        self._count_dropped(dropped)
+
+    def _deliver_batch(self, messages: dict):
+        """runs on the event loop: one list per subscriber queue"""
+        batches = {}
+        with self.lock:
+            for topic, message in messages.items():
+                for queue in self.subscribers.get(topic, ()):
+                    batches.setdefault(queue, []).append(message)
+
+        dropped = 0
+        for queue, batch in batches.items():
+            if queue.full():
+                queue.get_nowait()
+                dropped += 1
+            queue.put_nowait(batch)
+        self._count_dropped(dropped)
+
+    def _count_dropped(self, dropped: int):
+        if dropped:
+            with self.lock:
+                self.dropped += dropped
+
+    def topics(self):
+        """topics that have at least one subscriber right now"""
+        with self.lock:
+            return list(self.subscribers)
+
+    def subscriber_count(self, topic=None) -> int:
+        """how many queues are subscribed (to one topic, or in total)"""
+        with self.lock:
+            if topic is not None:
+                return len(self.subscribers.get(topic, ()))
+            return sum(len(queues) for queues in self.subscribers.values())
+
+
+# One shared hub for live market prices (topic = asset name)
+price_hub = Hub()
+
+# One shared hub for the multiplexed market socket
+# (topic = asset name, one batch per tick cycle, see services/market_feed.py)
+market_hub = Hub()
+
+# One shared hub for triggered alerts (topic = user id)
+alert_hub = Hub()
+
+# One shared hub for live portfolio valuations (topic = user id)
+portfolio_hub = Hub()
@@ -0,0 +1,381 @@
+"""
+job_runner.py - Background jobs that must run in exactly one worker
+===================================================================
+
+What this file does:
+- With "uvicorn --workers 8" every process runs the startup code. Jobs like
+  the price generator must not run 8 times (8x duplicate ticks)
+- Workers elect a leader with a Postgres advisory lock: the worker that holds
+  the lock runs the jobs, the others check every JOBS_CHECK_INTERVAL seconds
+  and take over when the leader's connection (and so its lock) goes away
+- Jobs have start/stop hooks; on shutdown they are stopped in reverse order
+  and the lock is released, so another worker takes over right away
+- GET /jobs/status shows who leads and how every job is doing
+
+Kinds of jobs:
+- ThreadJob    long-running function in its own thread, given a stop event
+               (price generator)
+- PeriodicJob  function(db) every N seconds in a thread, with a NEW session
+               for every run - a dropped connection only fails one run
+               (candle repair, partition maintenance)
+- TaskJob      async start/stop hooks on the event loop (AI digests)
+
+Leader election (JOBS_LEADER_ELECTION):
+- postgres  pg_try_advisory_lock on a dedicated connection (default)
+- local     this process is always the leader (single process, tests)
+- off       never run jobs here (e.g. API-only instances)
+
+Settings (environment variables):
+- JOBS_LEADER_ELECTION  postgres | local | off         (default postgres)
+- JOBS_LOCK_KEY         advisory lock number            (default 7310024)
+- JOBS_CHECK_INTERVAL   seconds between leader checks   (default 5)
+"""
+
+import asyncio
+import os
+import threading
+import time
+import traceback
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+import asyncpg
+
+from ..database import DATABASE_URL, SessionLocal
+
+
+# ============ SETTINGS ============
+ELECTION = os.getenv("JOBS_LEADER_ELECTION", "postgres")
+LOCK_KEY = int(os.getenv("JOBS_LOCK_KEY", "7310024"))
+CHECK_INTERVAL = float(os.getenv("JOBS_CHECK_INTERVAL", "5"))
+
+CONNECT_TIMEOUT = 5.0
+
+# Seconds a thread gets to finish after being asked to stop
+STOP_TIMEOUT = 10.0
+
+
+# ============ JOBS ============
+class Job(ABC):
+    """a named background job with start/stop hooks and counters"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = None
+        self.runs = 0
+        self.failures = 0
+        self.last_run = None
+        self.last_error = None
+        self.last_duration_ms = None
+
+    @abstractmethod
+    async def start(self):
+        """begin running (returns once started)"""
+
+    @abstractmethod
+    async def stop(self):
+        """stop and wait for the job to finish"""
+
+    @abstractmethod
+    def running(self) -> bool:
+        """still running right now"""
+
+    def _record(self, started: float, error: Exception = None):
+        self.runs += 1
+        self.last_run = datetime.utcnow()
+        self.last_duration_ms = round((time.perf_counter() - started) * 1000, 1)
+        if error is not None:
+            self.failures += 1
+            self.last_error = f"{type(error).__name__}: {error}"
+
+    def status(self) -> dict:
+        return {
+            "name": self.name,
+            "running": self.running(),
+            "started_at": self.started_at,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_run": self.last_run,
+            "last_duration_ms": self.last_duration_ms,
+            "last_error": self.last_error
+        }
+
+
+class ThreadJob(Job):
+    """target(stop_event) in a daemon thread, until stop_event is set"""
+
+    def __init__(self, name: str, target):
+        super().__init__(name)
+        self.target = target
+        self.thread = None
+        self.stop_event = None
+
+    async def start(self):
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self.thread.start()
+        self.started_at = datetime.utcnow()
+
+    def _run(self):
+        started = time.perf_counter()
+        try:
+            self.target(self.stop_event)
+            self._record(started)
+        except Exception as error:
+            self._record(started, error)
+            traceback.print_exc()
+
+    async def stop(self):
+        if self.thread is None:
+            return
+        self.stop_event.set()
+        await asyncio.to_thread(self.thread.join, STOP_TIMEOUT)
+        self.thread = None
+
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+
+class PeriodicJob(Job):
+    """function(db) every `interval` seconds, each run with its own session"""
+
+    def __init__(self, name: str, function, interval: float):
+        super().__init__(name)
+        self.function = function
+        self.interval = interval
+        self.task = None
+
+    async def start(self):
+        self.task = asyncio.get_running_loop().create_task(self._loop())
+        self.started_at = datetime.utcnow()
+
+    async def _loop(self):
+        while True:
+            await asyncio.to_thread(self.run_once)
+            await asyncio.sleep(self.interval)
+
+    def run_once(self):
+        """one run on a fresh session (rolled back and closed on error)"""
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            self.function(db)
+            self._record(started)
+        except Exception as error:
+            db.rollback()
+            self._record(started, error)
+            print(f"Job {self.name} failed: {error}")
+        finally:
+            db.close()
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def status(self) -> dict:
+        return {**super().status(), "interval": self.interval}
+
+
+class TaskJob(Job):
+    """start/stop hooks of a service that runs on the event loop"""
+
+    def __init__(self, name: str, start, stop, is_running):
+        super().__init__(name)
+        self.start_hook = start
+        self.stop_hook = stop
+        self.is_running = is_running
+
+    async def start(self):
+        result = self.start_hook()
+        if asyncio.iscoroutine(result):
+            await result
+        self.started_at = datetime.utcnow()
+
+    async def stop(self):
+        result = self.stop_hook()
+        if asyncio.iscoroutine(result):
+            await result
+
+    def running(self) -> bool:
+        return self.is_running()
+
+
+# ============ LEADER ELECTION ============
+class AdvisoryLock:
+    """
+    Postgres session advisory lock on a dedicated connection.
+    The lock lives as long as the connection - if this worker dies, Postgres
+    releases it and another worker can take it.
+    """
+
+    def __init__(self, dsn: str = DATABASE_URL, key: int = LOCK_KEY):
+        self.dsn = dsn
+        self.key = key
+        self.connection = None
+
+    async def try_acquire(self) -> bool:
+        if self.connection is None or self.connection.is_closed():
+            self.connection = await asyncpg.connect(self.dsn, timeout=CONNECT_TIMEOUT)
+        return await self.connection.fetchval("SELECT pg_try_advisory_lock($1)", self.key)
+
+    async def still_held(self) -> bool:
+        """the connection (and therefore the lock) is still alive"""
+        if self.connection is None or self.connection.is_closed():
+            return False
+        try:
+            await asyncio.wait_for(self.connection.fetchval("SELECT 1"), CONNECT_TIMEOUT)
+            return True
+        except (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError):
+            return False
+
+    async def release(self):
+        if self.connection is None or self.connection.is_closed():
+            return
+        try:
+            await self.connection.fetchval("SELECT pg_advisory_unlock($1)", self.key)
+        finally:
+            await self.connection.close()
+            self.connection = None
+
+
+class LocalLock:
+    """single process: always the leader"""
+
+    async def try_acquire(self) -> bool:
+        return True
+
+    async def still_held(self) -> bool:
+        return True
+
+    async def release(self):
+        pass
+
+
+def make_lock(election: str = ELECTION):
+    if election == "postgres":
+        return AdvisoryLock()
+    if election == "local":
+        return LocalLock()
+    if election == "off":
+        return None
+    raise ValueError(f"Unknown JOBS_LEADER_ELECTION: {election}")
+
+
+# ============ RUNNER ============
+class JobRunner:
+    """runs the registered jobs while this worker holds the leader lock"""
+
+    def __init__(self, lock=None, check_interval: float = CHECK_INTERVAL):
+        self.lock = lock
+        self.check_interval = check_interval
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.jobs = []
+        self.leader = False
+        self.leader_since = None
+        self.elections_won = 0
+        self.last_check_error = None
+        self.task = None
+
+    def add(self, job: Job):
+        self.jobs.append(job)
+
+    # ============ START / STOP ============
+    async def start(self):
+        """try to become leader now, then keep checking in the background"""
+        if self.lock is None:
+            return
+        await self.check()
+        self.task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await self.check()
+
+    async def check(self):
+        """follower: try to take the lock. leader: make sure we still hold it"""
+        try:
+            if self.leader:
+                if not await self.lock.still_held():
+                    print("Job runner lost the leader lock, stopping jobs")
+                    await self._lose_leadership()
+            elif await self.lock.try_acquire():
+                await self._start_jobs()
+            self.last_check_error = None
+        except Exception as error:
+            # database unreachable - as a leader our lock may be gone too
+            self.last_check_error = f"{type(error).__name__}: {error}"
+            if self.leader:
+                await self._lose_leadership()
+
+    async def _start_jobs(self):
+        self.leader = True
+        self.leader_since = datetime.utcnow()
+        self.elections_won += 1
+        print(f"Job runner: worker {self.worker_id} is the leader, starting {len(self.jobs)} jobs")
+        for job in self.jobs:
+            try:
+                await job.start()
+            except Exception as error:
+                job.failures += 1
+                job.last_error = f"{type(error).__name__}: {error}"
+                print(f"Job {job.name} failed to start: {error}")
+
+    async def _stop_jobs(self):
+        self.leader = False
+        self.leader_since = None
+        for job in reversed(self.jobs):
+            try:
+                await job.stop()
+            except Exception as error:
+                print(f"Job {job.name} failed to stop: {error}")
+
+    async def _lose_leadership(self):
+        """stop the jobs and drop the (probably broken) lock connection"""
+        await self._stop_jobs()
+        try:
+            await self.lock.release()
+        except Exception:
+            pass
+
+    async def stop(self):
+        """stop checking, stop the jobs, let another worker take over"""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        if self.leader:
+            await self._stop_jobs()
+        if self.lock is not None:
+            try:
+                await self.lock.release()
+            except Exception as error:
+                print(f"Releasing the job lock failed: {error}")
+
+    def status(self) -> dict:
+        return {
+            "worker_id": self.worker_id,
+            "election": type(self.lock).__name__ if self.lock is not None else "off",
+            "leader": self.leader,
+            "leader_since": self.leader_since,
+            "elections_won": self.elections_won,
+            "last_check_error": self.last_check_error,
+            "jobs": [job.status() for job in self.jobs]
+        }
+
+
+# One shared runner for the whole process
+job_runner = JobRunner(make_lock())
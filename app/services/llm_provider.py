@@ -0,0 +1,274 @@
+"""
+llm_provider.py - Async, rate-limited access to the language model
+===================================================================
+
+What this file does:
+- One small interface for "send a prompt, get text back" (LLMProvider)
+- Two backends:
+    gemini  Google Gemini through its async SDK call (no thread blocked)
+    local   deterministic stub, no network - for offline tests and benchmarks
+- LLMClient wraps a backend with everything a remote API needs:
+    timeout per call         (LLM_TIMEOUT)
+    max calls at once        (LLM_MAX_CONCURRENCY, a semaphore)
+    calls per minute         (LLM_RATE_PER_MINUTE, a token bucket)
+    retry with backoff       (LLM_RETRIES, random "jitter" so retries don't line up)
+
+Errors:
+- LLMRateLimited  the provider (or our own token bucket) said "too many requests"
+- LLMTimeout      no answer within LLM_TIMEOUT
+- LLMError        anything else
+
+Settings (environment variables):
+- LLM_BACKEND          gemini | local  (default gemini if the SDK is installed
+                                         and GEMINI_API_KEY is set, else local)
+- GEMINI_API_KEY       key for Gemini (no default - never commit a key)
+- LLM_TIMEOUT          seconds per call                  (default 20)
+- LLM_MAX_CONCURRENCY  calls in flight at once           (default 4)
+- LLM_RATE_PER_MINUTE  calls started per minute, 0 = off (default 15 for gemini, 0 for local)
+- LLM_RETRIES          extra attempts after a failure    (default 2)
+- LLM_LOCAL_DELAY      fake latency of the local backend (default 0 s)
+"""
+
+import asyncio
+import hashlib
+from abc import ABC, abstractmethod
+import os
+import random
+import time
+
+
+# ============ TRY TO IMPORT GEMINI ============
+# Gemini is optional - without it the local backend is used
+try:
+    import google.generativeai as genai
+    from google.api_core import exceptions as google_exceptions
+    gemini_installed = True
+except ImportError:
+    genai = None
+    google_exceptions = None
+    gemini_installed = False
+
+
+# ============ SETTINGS ============
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini" if gemini_installed and GEMINI_API_KEY else "local")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "20"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+LLM_BACKOFF = 0.5   # seconds, doubled every retry
+LLM_LOCAL_DELAY = float(os.getenv("LLM_LOCAL_DELAY", "0"))
+
+# Gemini free tier allows 15 requests per minute
+DEFAULT_RATE_PER_MINUTE = {"gemini": 15.0, "local": 0.0}
+LLM_RATE_PER_MINUTE = float(
+    os.getenv("LLM_RATE_PER_MINUTE", str(DEFAULT_RATE_PER_MINUTE.get(LLM_BACKEND, 0.0)))
+)
+
+
+# ============ ERRORS ============
+class LLMError(Exception):
+    """the model could not answer"""
+
+
+class LLMRateLimited(LLMError):
+    """too many requests (provider quota or our own token bucket)"""
+
+
+class LLMTimeout(LLMError):
+    """no answer in time"""
+
+
+# ============ BACKENDS ============
+class LLMProvider(ABC):
+    """a backend: turns a prompt into text"""
+
+    name = "base"
+
+    @abstractmethod
+    async def complete(self, prompt: str) -> str:
+        """the model's answer to one prompt"""
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini, called through the SDK's async method"""
+
+    name = "gemini"
+
+    def __init__(self, api_key: str = GEMINI_API_KEY, model_name: str = GEMINI_MODEL):
+        if not gemini_installed:
+            raise LLMError("google-generativeai is not installed")
+        if not api_key:
+            raise LLMError("GEMINI_API_KEY is not set")
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name)
+
+    async def complete(self, prompt: str) -> str:
+        try:
+            response = await self.model.generate_content_async(prompt)
+        except google_exceptions.ResourceExhausted as error:   # HTTP 429
+            raise LLMRateLimited(str(error)) from error
+        except google_exceptions.DeadlineExceeded as error:
+            raise LLMTimeout(str(error)) from error
+        except google_exceptions.GoogleAPIError as error:
+            raise LLMError(str(error)) from error
+        return response.text
+
+
+class LocalProvider(LLMProvider):
+    """
+    Deterministic stand-in: same prompt -> same answer, no network.
+    Optional fake latency to benchmark the AI path.
+    """
+
+    name = "local"
+
+    def __init__(self, delay: float = LLM_LOCAL_DELAY):
+        self.delay = delay
+
+    async def complete(self, prompt: str) -> str:
+        if self.delay > 0:
+            await asyncio.sleep(self.delay)
+
+        # pick out the lines that carry the facts
+        facts = [
+            line.strip() for line in prompt.splitlines()
+            if line.strip().startswith(("Asset:", "Risk level:", "Price:", "Last price:"))
+        ]
+        fingerprint = hashlib.sha256(prompt.encode()).hexdigest()[:8]
+        summary = "; ".join(facts[:3] + facts[-1:]) if facts else "no market data"
+        return f"[local model {fingerprint}] Summary of the provided data: {summary}."
+
+
+def make_provider(backend: str = LLM_BACKEND) -> LLMProvider:
+    if backend == "gemini":
+        return GeminiProvider()
+    if backend == "local":
+        return LocalProvider()
+    raise ValueError(f"Unknown LLM_BACKEND: {backend}")
+
+
+# ============ RATE LIMIT ============
+class TokenBucket:
+    """
+    Allows `rate` calls per second on average, bursts of up to `capacity`.
+    rate = 0 turns it off.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, max_wait: float):
+        """take one token, waiting for it at most max_wait seconds"""
+        if self.rate <= 0:
+            return
+
+        async with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+            wait = (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0
+            if wait > max_wait:
+                raise LLMRateLimited(f"local rate limit, next call possible in {wait:.1f}s")
+
+            # reserve the token now, sleep until it exists (holding the lock
+            # keeps the waiting callers in order)
+            self.tokens -= 1
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+
+# ============ CLIENT ============
+class LLMClient:
+    """a backend plus timeout, concurrency cap, rate limit and retries"""
+
+    def __init__(
+        self,
+        provider: LLMProvider,
+        timeout: float = LLM_TIMEOUT,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        rate_per_minute: float = LLM_RATE_PER_MINUTE,
+        retries: int = LLM_RETRIES,
+        backoff: float = LLM_BACKOFF
+    ):
+        self.provider = provider
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_concurrency = max_concurrency
+        self.semaphore = None   # created on first use, inside the event loop
+        self.bucket = TokenBucket(rate_per_minute / 60, capacity=max(1.0, rate_per_minute / 12))
+
+        self.calls = 0
+        self.attempts = 0
+        self.in_flight = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.rate_limited = 0
+        self.retried = 0
+        self.total_latency = 0.0
+
+    async def _attempt(self, prompt: str) -> str:
+        if self.semaphore is None:
+            self.semaphore = asyncio.BoundedSemaphore(self.max_concurrency)
+
+        async with self.semaphore:
+            await self.bucket.acquire(max_wait=self.timeout)
+            self.attempts += 1
+            self.in_flight += 1
+            started = time.perf_counter()
+            try:
+                return await asyncio.wait_for(self.provider.complete(prompt), self.timeout)
+            except asyncio.TimeoutError as error:
+                raise LLMTimeout(f"no answer within {self.timeout}s") from error
+            finally:
+                self.in_flight -= 1
+                self.total_latency += time.perf_counter() - started
+
+    async def generate(self, prompt: str) -> str:
+        """answer for a prompt; raises LLMError subclasses after the last retry"""
+        self.calls += 1
+
+        for attempt in range(self.retries + 1):
+            try:
+                return await self._attempt(prompt)
+
+            except LLMError as error:
+                if isinstance(error, LLMTimeout):
+                    self.timeouts += 1
+                elif isinstance(error, LLMRateLimited):
+                    self.rate_limited += 1
+
+                if attempt == self.retries:
+                    self.failures += 1
+                    raise
+
+                # exponential backoff with full jitter: 0..0.5s, 0..1s, 0..2s ...
+                self.retried += 1
+                await asyncio.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.provider.name,
+            "calls": self.calls,
+            "in_flight": self.in_flight,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "rate_limited": self.rate_limited,
+            "retried": self.retried,
+            "avg_latency_ms": round(self.total_latency / self.attempts * 1000, 1) if self.attempts else 0.0
+        }
+
+
+# One shared client for the whole process
+try:
+    llm_client = LLMClient(make_provider())
+except LLMError as error:
+    print(f"LLM backend {LLM_BACKEND} unavailable ({error}), using the local backend")
+    llm_client = LLMClient(LocalProvider(), rate_per_minute=0)
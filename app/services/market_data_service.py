@@ -3,58 +3,40 @@
 
 What this file does:
 - Runs in background when server starts
-- Generates fake BTC prices every 5 seconds
-- Saves them to database
+- Drives the market simulator (BTC, ETH, AAPL every 5 seconds by default,
+  see market_simulator.py for the SIM_* settings)
+- Publishes every saved price to the live price hub (for websockets)
 
 """
 
-import time
-import random
-from sqlalchemy.orm import Session
+import threading
 
-from ..models.market_model import MarketPrice
+from .hub import price_hub
+from .market_simulator import build_simulator_from_env
 
 
-
-def generate_fake_price(asset_name):
-  
-    return random.uniform(40000, 45000)
-
-
-#Save The Price To the Database
-def save_price_to_db(db: Session, asset_name: str):
+def publish_ticks(ticks):
     """
-    Creates a price entry and saves to database.
+    Sends saved ticks to everyone watching their asset.
+    Uses the same message format the websocket always sent.
+    Registered as a tick_ingestor listener.
     """
-    
-    # Step 1: Generate a price
-    price = generate_fake_price(asset_name)
-
-    # Step 2: Create price object
-    new_price = MarketPrice(
-        asset_name=asset_name,
-        price=price
-    )
-
-    # Step 3: Save to database
-    db.add(new_price)
-    db.commit()
-    db.refresh(new_price)
-    
-    print(f"Saved price: {asset_name} = ${price:.2f}")
+    for tick in ticks:
+        price_hub.publish(tick["asset_name"], {
+            "asset": tick["asset_name"],
+            "price": tick["price"],
+            "time": str(tick["timestamp"])
+        })
 
 
-def start_price_generator(db: Session):
+def start_price_generator(stop_event: threading.Event = None):
     """
-    Runs forever, saving a BTC price every 5 seconds.
+    Runs forever, feeding simulated prices into the configured sink.
     This is called when server starts.
     """
     
-    print("Price generator started!")
-    
-    while True:
-        # Save a BTC price
-        save_price_to_db(db, "BTC")
+    simulator = build_simulator_from_env()
+
+    print(f"Price generator started! {len(simulator.assets)} assets, sink: {type(simulator.sink).__name__}")
 
-        # Wait 5 seconds
-        time.sleep(5)
+    simulator.run(stop_event)
@@ -0,0 +1,205 @@
+"""
+market_feed.py - Messages for the multiplexed market websocket
+==============================================================
+
+What this file does:
+- One socket (/ws/market) can watch many assets; the client sends
+    {"action": "subscribe",   "assets": ["BTC", "ETH"]}
+    {"action": "unsubscribe", "assets": ["ETH"]}
+- After every tick flush the socket gets ONE frame with the new ticks of all
+  its assets (market_hub.publish_batch), not one frame per tick
+- Each asset's part of the frame is built once per flush, on the ingest
+  thread, and shared by every client watching that asset
+- A client that falls behind gets only the newest update per asset, and can
+  ask for fewer frames: ?max_rate=N or {"action": "rate", "max_rate": N}
+  (services/backpressure.py)
+
+Frame formats (chosen with ?format= when connecting):
+
+json (default), text frames:
+    {"type": "ticks", "ticks": [{"asset": "BTC", "price": 42000.5, "time": 1700000000123}, ...]}
+    time = epoch milliseconds (UTC)
+
+msgpack, binary frames - for many assets / slow links:
+    ["t", base_ms, [id, dt_ms, dprice, id, dt_ms, dprice, ...]]
+    id      small number per asset, sent in the "subscribed" message
+    dt_ms   milliseconds after base_ms
+    dprice  price change since the previous price sent for that asset,
+            in units of 10**-decimals (first price after subscribing = full price)
+    client: price_int[id] += dprice; price = price_int[id] / 10**decimals
+
+Control messages ("hello", "subscribed", "unsubscribed", "error") are
+dicts in the same encoding as the ticks.
+
+Settings (environment variables):
+- WS_PRICE_DECIMALS  price precision of msgpack frames (default 4)
+- WS_MAX_ASSETS      assets one socket may watch        (default 200)
+"""
+
+import json
+import os
+from typing import NamedTuple
+
+from .hub import market_hub
+from .price_cache import price_cache, to_epoch
+
+
+# ============ TRY TO IMPORT MSGPACK ============
+# MessagePack is optional - without it clients get JSON
+try:
+    import msgpack
+    msgpack_installed = True
+except ImportError:
+    msgpack = None
+    msgpack_installed = False
+
+
+# ============ SETTINGS ============
+PRICE_DECIMALS = int(os.getenv("WS_PRICE_DECIMALS", "4"))
+MAX_ASSETS = int(os.getenv("WS_MAX_ASSETS", "200"))
+
+
+class AssetUpdate(NamedTuple):
+    """new ticks of one asset from one flush"""
+    asset: str
+    times: list      # epoch ms
+    prices: list
+    json: str        # the ticks as JSON objects, comma separated
+
+
+def epoch_ms(timestamp) -> int:
+    return int(round(to_epoch(timestamp) * 1000))
+
+
+def build_update(asset: str, times: list, prices: list) -> AssetUpdate:
+    fragment = ",".join(
+        f'{{"asset":{json.dumps(asset)},"price":{float(price)!r},"time":{time}}}'
+        for time, price in zip(times, prices)
+    )
+    return AssetUpdate(asset, times, prices, fragment)
+
+
+def snapshot(assets) -> list:
+    """latest cached price of each asset, as updates (sent after subscribing)"""
+    updates = []
+    for asset in assets:
+        latest = price_cache.latest_price(asset)
+        if latest is not None:
+            updates.append(build_update(asset, [epoch_ms(latest.timestamp)], [latest.price]))
+    return updates
+
+
+# ============ ENCODERS (one per socket) ============
+class JsonEncoder:
+    format = "json"
+    binary = False
+
+    def ticks(self, updates) -> str:
+        return '{"type":"ticks","ticks":[' + ",".join(update.json for update in updates) + "]}"
+
+    def control(self, message: dict) -> str:
+        return json.dumps(message)
+
+    def subscribed(self, assets) -> dict:
+        return {"type": "subscribed", "assets": list(assets)}
+
+    def forget(self, asset: str):
+        pass
+
+
+class MsgpackEncoder:
+    """keeps the last price sent per asset, to send only the change"""
+
+    format = "msgpack"
+    binary = True
+
+    def __init__(self, decimals: int = PRICE_DECIMALS):
+        self.decimals = decimals
+        self.scale = 10 ** decimals
+        self.ids = {}        # asset -> small id (never reused on this socket)
+        self.last = {}       # asset -> last price sent, as an integer
+
+    def ticks(self, updates) -> bytes:
+        base = min(update.times[0] for update in updates)
+        flat = []
+        for update in updates:
+            asset_id = self.ids[update.asset]
+            last = self.last.get(update.asset, 0)
+            for time, price in zip(update.times, update.prices):
+                value = round(price * self.scale)
+                flat += (asset_id, time - base, value - last)
+                last = value
+            self.last[update.asset] = last
+        return msgpack.packb(["t", base, flat])
+
+    def control(self, message: dict) -> bytes:
+        return msgpack.packb(message)
+
+    def subscribed(self, assets) -> dict:
+        for asset in assets:
+            self.ids.setdefault(asset, len(self.ids))
+        return {
+            "type": "subscribed",
+            "assets": {asset: self.ids[asset] for asset in assets},
+            "decimals": self.decimals
+        }
+
+    def forget(self, asset: str):
+        # next price after a new subscribe is sent in full
+        self.last.pop(asset, None)
+
+
+# ============ FEED ============
+class MarketFeed:
+    """builds the per-flush updates and counts what the sockets send"""
+
+    def __init__(self):
+        self.connections = 0
+        self.frames = 0
+        self.bytes = {"json": 0, "msgpack": 0}
+
+    def encoder(self, format: str):
+        """encoder for ?format=..., or None if that format isn't available"""
+        if format == "json":
+            return JsonEncoder()
+        if format == "msgpack" and msgpack_installed:
+            return MsgpackEncoder()
+        return None
+
+    def publish_ticks(self, ticks):
+        """
+        tick_ingestor listener (writer thread): group the flush per watched
+        asset, build each asset's update once, hand them to market_hub
+        """
+        watched = set(market_hub.topics())
+        if not watched:
+            return
+
+        grouped = {}
+        for tick in ticks:
+            if tick["asset_name"] in watched:
+                times, prices = grouped.setdefault(tick["asset_name"], ([], []))
+                times.append(epoch_ms(tick["timestamp"]))
+                prices.append(tick["price"])
+
+        market_hub.publish_batch({
+            asset: build_update(asset, times, prices)
+            for asset, (times, prices) in grouped.items()
+        })
+
+    def sent(self, format: str, frame):
+        self.frames += 1
+        self.bytes[format] += len(frame)
+
+    def stats(self) -> dict:
+        return {
+            "connections": self.connections,
+            "subscriptions": market_hub.subscriber_count(),
+            "frames": self.frames,
+            "bytes": dict(self.bytes),
+            "msgpack_available": msgpack_installed
+        }
+
+
+# One shared feed for the whole process
+market_feed = MarketFeed()
@@ -0,0 +1,257 @@
+"""
+market_simulator.py - Fake market for demos and load tests
+===========================================================
+
+What this file does:
+- Simulates prices for many assets at once (BTC, ETH, ... or hundreds of symbols)
+- Each asset follows geometric Brownian motion (GBM) with its own drift and volatility
+- Each asset has its own tick rate (ticks per second)
+- All assets are generated together with NumPy arrays (no per-symbol Python loop)
+- Generated ticks go to a "sink": the database, straight to the tick
+  listeners (live hubs, cache, alerts - no database), or a file
+
+GBM in one line:
+    next_price = price * exp((drift - vol^2 / 2) * dt + vol * sqrt(dt) * random_normal)
+(drift and vol are per year, dt is in years)
+
+Settings (environment variables):
+- SIM_ASSETS       comma separated symbols        (default "BTC,ETH,AAPL")
+                   "BTC:50" gives one asset its own tick rate
+- SIM_EXTRA_ASSETS number of extra SYM0000.. assets (default 0)
+- SIM_TICK_RATE    ticks per second per asset     (default 0.2 = every 5 s)
+- SIM_SINK         "db", "hub" or "file"          (default "db")
+- SIM_FILE         output file for the file sink  (default "simulated_ticks.csv")
+- SIM_SEED         random seed (optional, for reproducible runs)
+"""
+
+import itertools
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from .tick_ingestor import tick_ingestor
+
+
+# ============ SETTINGS ============
+SECONDS_PER_YEAR = 365 * 24 * 60 * 60
+
+# How often the simulator wakes up to emit the ticks that are due
+STEP_INTERVAL = 0.05
+
+# (start price, yearly drift, yearly volatility) for well known symbols
+KNOWN_ASSETS = {
+    "BTC": (42000.0, 0.05, 0.80),
+    "ETH": (2500.0, 0.05, 0.90),
+    "SOL": (100.0, 0.05, 1.10),
+    "AAPL": (190.0, 0.08, 0.25),
+}
+
+
+# ============ SINKS ============
+class DbSink:
+    """writes ticks through the batched tick ingestor (saved + published)"""
+
+    def write(self, assets, prices, timestamps):
+        tick_ingestor.submit_many(
+            (asset, price, datetime.utcfromtimestamp(ts))
+            for asset, price, ts in zip(assets, prices.tolist(), timestamps.tolist())
+        )
+
+    def close(self):
+        pass
+
+
+class HubSink:
+    """
+    Skips the database: ticks go straight to the tick listeners (price
+    cache, hubs, market feed, alerts, valuations, ...) as if just saved.
+    Ids are local sequence numbers, not database ids.
+    """
+
+    def __init__(self):
+        self.ids = itertools.count(1)
+
+    def write(self, assets, prices, timestamps):
+        tick_ingestor.notify_listeners([
+            {"id": next(self.ids), "asset_name": asset, "price": price,
+             "timestamp": datetime.utcfromtimestamp(ts)}
+            for asset, price, ts in zip(assets, prices.tolist(), timestamps.tolist())
+        ])
+
+    def close(self):
+        pass
+
+
+class FileSink:
+    """appends ticks to a CSV file: asset_name,price,timestamp"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "a", buffering=1024 * 1024)
+        if self.file.tell() == 0:
+            self.file.write("asset_name,price,timestamp\n")
+
+    def write(self, assets, prices, timestamps):
+        lines = [
+            f"{asset},{price:.6f},{datetime.utcfromtimestamp(ts).isoformat()}\n"
+            for asset, price, ts in zip(assets, prices.tolist(), timestamps.tolist())
+        ]
+        self.file.writelines(lines)
+        self.file.flush()
+
+    def close(self):
+        """flush what is buffered and release the file"""
+        self.file.flush()
+        self.file.close()
+
+
+# ============ SIMULATOR ============
+class MarketSimulator:
+    """
+    Vectorized GBM simulator.
+
+    Every step, each asset emits the number of ticks that became due
+    since the last step (rate * elapsed time). All prices for all assets
+    are drawn in one NumPy call.
+    """
+
+    def __init__(self, assets, start_prices, drift, volatility, tick_rate, sink,
+                 step_interval=STEP_INTERVAL, seed=None):
+        self.assets = np.asarray(assets, dtype=object)
+        n = len(self.assets)
+
+        self.prices = np.broadcast_to(np.asarray(start_prices, dtype=np.float64), (n,)).copy()
+        self.drift = np.broadcast_to(np.asarray(drift, dtype=np.float64), (n,)).copy()
+        self.volatility = np.broadcast_to(np.asarray(volatility, dtype=np.float64), (n,)).copy()
+        self.tick_rate = np.broadcast_to(np.asarray(tick_rate, dtype=np.float64), (n,)).copy()
+
+        if np.any(self.tick_rate <= 0):
+            raise ValueError("tick_rate must be > 0 for every asset")
+
+        self.sink = sink
+        self.step_interval = step_interval
+        self.rng = np.random.default_rng(seed)
+
+        # GBM constants per asset (time between two ticks, in years)
+        dt = (1.0 / self.tick_rate) / SECONDS_PER_YEAR
+        self.log_drift = (self.drift - 0.5 * self.volatility ** 2) * dt
+        self.log_vol = self.volatility * np.sqrt(dt)
+
+        # fractional ticks carried over between steps
+        self.pending = np.ones(n)
+        self.ticks_emitted = 0
+
+    def step(self, elapsed: float, now: float = None):
+        """
+        Emit every tick that became due in the last `elapsed` seconds.
+        Returns the number of ticks sent to the sink.
+        """
+        now = time.time() if now is None else now
+
+        # Step 1: how many ticks each asset owes
+        self.pending += self.tick_rate * elapsed
+        counts = np.floor(self.pending).astype(np.int64)
+        self.pending -= counts
+
+        max_count = int(counts.max()) if len(counts) else 0
+        if max_count == 0:
+            return 0
+
+        # Step 2: draw all random moves at once, shape (ticks, assets)
+        shocks = self.rng.standard_normal((max_count, len(self.assets)))
+        steps = self.log_drift + self.log_vol * shocks
+
+        # assets that owe fewer ticks just stop moving after their last one
+        row = np.arange(max_count)[:, None]
+        mask = row < counts[None, :]
+        steps[~mask] = 0.0
+
+        paths = self.prices * np.exp(np.cumsum(steps, axis=0))
+
+        # Step 3: remember each asset's last price for the next step
+        self.prices = paths[-1]
+
+        # Step 4: flatten to one list of ticks, spaced 1/rate apart, ending now
+        rows, cols = np.nonzero(mask)
+        tick_prices = paths[rows, cols]
+        tick_times = now - (counts[cols] - 1 - rows) / self.tick_rate[cols]
+
+        self.sink.write(self.assets[cols], tick_prices, tick_times)
+        self.ticks_emitted += len(tick_prices)
+        return len(tick_prices)
+
+    def run(self, stop_event: threading.Event = None):
+        """keep stepping until stop_event is set, then close the sink"""
+        stop_event = stop_event or threading.Event()
+        last = time.monotonic()
+
+        try:
+            while not stop_event.is_set():
+                stop_event.wait(self.step_interval)
+                current = time.monotonic()
+                try:
+                    self.step(current - last)
+                except Exception as e:
+                    print(f"Simulator step failed: {e}")
+                last = current
+        finally:
+            self.sink.close()
+
+
+# ============ BUILD FROM SETTINGS ============
+def make_sink(kind: str):
+    """pick a sink by name: "db", "hub" or "file" """
+    if kind == "db":
+        return DbSink()
+    if kind == "hub":
+        return HubSink()
+    if kind == "file":
+        return FileSink(os.getenv("SIM_FILE", "simulated_ticks.csv"))
+    raise ValueError(f"Unknown SIM_SINK: {kind}")
+
+
+def build_simulator_from_env() -> MarketSimulator:
+    """create a simulator using the SIM_* environment variables"""
+
+    default_rate = float(os.getenv("SIM_TICK_RATE", "0.2"))
+
+    # Step 1: which assets (and their tick rates)
+    assets, tick_rate = [], []
+    for entry in os.getenv("SIM_ASSETS", "BTC,ETH,AAPL").split(","):
+        if not entry.strip():
+            continue
+        name, _, rate = entry.strip().partition(":")
+        assets.append(name)
+        tick_rate.append(float(rate) if rate else default_rate)
+
+    extra = int(os.getenv("SIM_EXTRA_ASSETS", "0"))
+    assets += [f"SYM{i:04d}" for i in range(extra)]
+    tick_rate += [default_rate] * extra
+
+    seed = os.getenv("SIM_SEED")
+    rng = np.random.default_rng(int(seed) if seed else None)
+
+    # Step 2: start price / drift / volatility per asset
+    start_prices, drift, volatility = [], [], []
+    for asset in assets:
+        if asset in KNOWN_ASSETS:
+            price, mu, sigma = KNOWN_ASSETS[asset]
+        else:
+            # unknown symbols get a random but sensible profile
+            price = float(rng.uniform(10, 1000))
+            mu = float(rng.uniform(-0.1, 0.2))
+            sigma = float(rng.uniform(0.15, 1.0))
+        start_prices.append(price)
+        drift.append(mu)
+        volatility.append(sigma)
+
+    # Step 3: where the ticks go
+    sink = make_sink(os.getenv("SIM_SINK", "db"))
+
+    return MarketSimulator(
+        assets, start_prices, drift, volatility, tick_rate, sink,
+        seed=int(seed) if seed else None
+    )
@@ -0,0 +1,327 @@
+"""
+partition_service.py - Creates and retires market_prices partitions
+===================================================================
+
+What this file does:
+- market_prices is partitioned by "timestamp" (models/market_model.py);
+  every day (or week) has its own partition table:
+      market_prices_p20261018  FOR VALUES FROM ('2026-10-18') TO ('2026-10-19')
+- ensure_partitions(): creates the current partition and the next
+  MARKET_PARTITIONS_AHEAD ones, so inserts never wait for DDL. Runs at
+  startup and then as a background job (one worker, see job_runner.py).
+  It takes a transaction-level advisory lock, so workers starting at the
+  same time create each partition once
+- market_prices_default catches ticks outside every partition (very old or
+  far-future timestamps) so a batch is never rejected. When a partition is
+  created for a range, matching rows are moved out of the default first
+- apply_retention(): partitions that ended more than MARKET_RETENTION_DAYS
+  ago are dropped (instant, no DELETE) or detached into standalone tables
+  to be archived (MARKET_RETENTION_ACTION). Candles in market_candles are
+  kept, so charts over old ranges still work
+- convert_to_partitioned(): one-off migration of an existing plain
+  market_prices table (run fix_db.py). Only the last
+  MARKET_PARTITION_HISTORY_DAYS get daily (weekly) partitions, older data
+  goes into one partition per month - a years-old table doesn't turn into
+  thousands of tables
+
+Settings (environment variables):
+- MARKET_PARTITION_INTERVAL      day | week                      (default day)
+- MARKET_PARTITIONS_AHEAD        future partitions kept ready     (default 3)
+- MARKET_RETENTION_DAYS          keep raw ticks this long, 0 = forever (default 0)
+- MARKET_RETENTION_ACTION        drop | detach                    (default drop)
+- PARTITION_CHECK_INTERVAL       seconds between maintenance runs (default 3600)
+- MARKET_PARTITION_HISTORY_DAYS  migration: days of old data kept in daily
+                                 (weekly) partitions, monthly before (default 31)
+"""
+
+import os
+import re
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+
+# ============ SETTINGS ============
+INTERVAL = os.getenv("MARKET_PARTITION_INTERVAL", "day")
+PARTITIONS_AHEAD = int(os.getenv("MARKET_PARTITIONS_AHEAD", "3"))
+RETENTION_DAYS = int(os.getenv("MARKET_RETENTION_DAYS", "0"))
+RETENTION_ACTION = os.getenv("MARKET_RETENTION_ACTION", "drop")
+CHECK_INTERVAL = float(os.getenv("PARTITION_CHECK_INTERVAL", "3600"))
+HISTORY_DAYS = int(os.getenv("MARKET_PARTITION_HISTORY_DAYS", "31"))
+
+# pg_advisory_xact_lock key held while partitions are created / removed
+LOCK_KEY = 7310025
+
+TABLE = "market_prices"
+DEFAULT_PARTITION = f"{TABLE}_default"
+
+# "FOR VALUES FROM ('2026-10-18 00:00:00') TO ('2026-10-19 00:00:00')"
+BOUND_PATTERN = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+# ============ RANGES ============
+def interval_length() -> timedelta:
+    if INTERVAL == "day":
+        return timedelta(days=1)
+    if INTERVAL == "week":
+        return timedelta(weeks=1)
+    raise ValueError(f"Unknown MARKET_PARTITION_INTERVAL: {INTERVAL}")
+
+
+def period_start(moment: datetime) -> datetime:
+    """start of the day (or the Monday of the week) containing moment"""
+    start = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if INTERVAL == "week":
+        start -= timedelta(days=start.weekday())
+    return start
+
+
+def partition_name(start: datetime) -> str:
+    return f"{TABLE}_p{start:%Y%m%d}"
+
+
+def month_start(moment: datetime) -> datetime:
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(start: datetime) -> datetime:
+    return month_start(start + timedelta(days=32))
+
+
+# ============ INSPECT ============
+def is_partitioned(db: Session) -> bool:
+    """True if market_prices is a partitioned table ("p"), False if plain or missing"""
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    kind = db.execute(
+        text("SELECT relkind FROM pg_class WHERE relname = :table AND relkind IN ('r', 'p')"),
+        {"table": TABLE}
+    ).scalar()
+    return kind == "p"
+
+
+def existing_partitions(db: Session):
+    """[(name, start, end)] of the attached range partitions, oldest first"""
+    rows = db.execute(text("""
+        SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = :table
+    """), {"table": TABLE}).all()
+
+    partitions = []
+    for name, bound in rows:
+        match = BOUND_PATTERN.search(bound or "")
+        if match:
+            start, end = (datetime.fromisoformat(value) for value in match.groups())
+            partitions.append((name, start, end))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+# ============ CREATE ============
+def ensure_default_partition(db: Session):
+    db.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT"))
+
+
+def lock_partitions(db: Session):
+    """
+    Serialize partition DDL between workers until this transaction ends
+    (two workers creating the same partition would fail with
+    "relation already exists").
+    """
+    db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": LOCK_KEY})
+
+
+def create_partition(db: Session, start: datetime, end: datetime, name: str = None) -> str:
+    """
+    Create the partition for [start, end) (call with the partition lock held).
+    Rows already sitting in the default partition for that range are moved
+    into it (Postgres refuses to attach a range the default still holds).
+    """
+    name = name or partition_name(start)
+    bounds = {"start": start, "end": end}
+
+    stray = db.execute(
+        text(f"SELECT 1 FROM {DEFAULT_PARTITION} WHERE timestamp >= :start AND timestamp < :end LIMIT 1"),
+        bounds
+    ).first()
+
+    if stray is None:
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {TABLE} "
+            f"FOR VALUES FROM ('{start.isoformat(sep=' ')}') TO ('{end.isoformat(sep=' ')}')"
+        ))
+        return name
+
+    # Step 1: standalone table with the same columns
+    db.execute(text(f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS)"))
+
+    # Step 2: move the rows out of the default partition
+    db.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION}
+            WHERE timestamp >= :start AND timestamp < :end
+            RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """), bounds)
+
+    # Step 3: attach it (indexes are created to match the parent's)
+    db.execute(text(
+        f"ALTER TABLE {TABLE} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{start.isoformat(sep=' ')}') TO ('{end.isoformat(sep=' ')}')"
+    ))
+    return name
+
+
+def ensure_partitions(db: Session, now: datetime = None, since: datetime = None) -> list:
+    """
+    Make sure partitions exist from `since` (default: the current period)
+    up to PARTITIONS_AHEAD periods after now. Does not commit (the
+    partition lock is held until the caller commits or rolls back).
+    Returns the names of the partitions created.
+    """
+    now = now or datetime.utcnow()
+    step = interval_length()
+
+    # read what exists only once we hold the lock
+    lock_partitions(db)
+    ensure_default_partition(db)
+    existing = existing_partitions(db)
+
+    created = []
+    start = period_start(since or now)
+    last_start = period_start(now) + PARTITIONS_AHEAD * step
+    while start <= last_start:
+        end = start + step
+        overlaps = any(other_start < end and start < other_end for _, other_start, other_end in existing)
+        if not overlaps:
+            created.append(create_partition(db, start, end))
+        start = end
+    return created
+
+
+# ============ RETENTION ============
+def apply_retention(db: Session, now: datetime = None) -> list:
+    """
+    Drop (or detach) partitions whose whole range is older than
+    RETENTION_DAYS. Does not commit. Returns the partitions removed.
+    """
+    if RETENTION_DAYS <= 0:
+        return []
+
+    cutoff = (now or datetime.utcnow()) - timedelta(days=RETENTION_DAYS)
+    lock_partitions(db)
+    removed = []
+    for name, _, end in existing_partitions(db):
+        if end > cutoff:
+            break
+        if RETENTION_ACTION == "detach":
+            # stays as a normal table (e.g. to pg_dump it), no longer queried
+            db.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {name}"))
+        else:
+            db.execute(text(f"DROP TABLE {name}"))
+        removed.append(name)
+    return removed
+
+
+def maintain_partitions(db: Session):
+    """background job: create upcoming partitions, retire old ones"""
+    if not is_partitioned(db):
+        print(f"{TABLE} is not partitioned yet - run fix_db.py")
+        return
+    created = ensure_partitions(db)
+    removed = apply_retention(db)
+    db.commit()
+    if created or removed:
+        print(f"Partitions created: {created}, removed: {removed}")
+
+
+# ============ MIGRATION ============
+def ensure_history_partitions(db: Session, oldest: datetime, until: datetime) -> list:
+    """
+    One partition per calendar month from `oldest` up to `until`
+    (the last one is cut short at `until`). Used for old data only.
+    """
+    lock_partitions(db)
+    ensure_default_partition(db)
+    created = []
+    start = month_start(oldest)
+    while start < until:
+        end = min(next_month(start), until)
+        created.append(create_partition(db, start, end, f"{TABLE}_m{start:%Y%m}"))
+        start = end
+    return created
+
+
+def convert_to_partitioned(db: Session, now: datetime = None) -> int:
+    """
+    Turn an existing plain market_prices table into the partitioned one.
+    Copies every row, keeps ids (and the id sequence), then drops the old
+    table. Commits. Returns the number of rows copied.
+    """
+    from ..models.market_model import MarketPrice
+
+    if is_partitioned(db):
+        return 0
+
+    now = now or datetime.utcnow()
+    legacy = f"{TABLE}_legacy"
+    exists = db.execute(
+        text("SELECT 1 FROM pg_class WHERE relname = :table AND relkind = 'r'"), {"table": TABLE}
+    ).first()
+    if exists is None:
+        # nothing to copy - just create the new table
+        MarketPrice.__table__.create(bind=db.connection())
+        ensure_partitions(db, now)
+        db.commit()
+        return 0
+
+    # Step 1: move the old table aside, and free the names the new table
+    # needs (its primary key, id sequence and indexes keep their old names)
+    db.execute(text(f"ALTER TABLE {TABLE} RENAME TO {legacy}"))
+
+    primary_key = db.execute(text(
+        "SELECT conname FROM pg_constraint WHERE conrelid = CAST(:table AS regclass) AND contype = 'p'"
+    ), {"table": legacy}).scalar()
+    if primary_key is not None:
+        db.execute(text(f'ALTER TABLE {legacy} RENAME CONSTRAINT "{primary_key}" TO {legacy}_pkey'))
+
+    sequence = db.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": legacy}).scalar()
+    if sequence is not None:
+        db.execute(text(f"ALTER SEQUENCE {sequence} RENAME TO {legacy}_id_seq"))
+
+    # the other indexes go away with the old table anyway
+    indexes = db.execute(text(
+        "SELECT CAST(indexrelid AS regclass) FROM pg_index "
+        "WHERE indrelid = CAST(:table AS regclass) AND NOT indisprimary"
+    ), {"table": legacy}).scalars().all()
+    for index in indexes:
+        db.execute(text(f"DROP INDEX {index}"))
+
+    # Step 2: the new partitioned table - monthly partitions for old data,
+    # daily (weekly) ones for the last HISTORY_DAYS and the days ahead
+    MarketPrice.__table__.create(bind=db.connection())
+    oldest = db.execute(text(f"SELECT MIN(timestamp) FROM {legacy}")).scalar()
+    history_start = period_start(now - timedelta(days=HISTORY_DAYS))
+    if oldest is not None and oldest < history_start:
+        ensure_history_partitions(db, oldest, history_start)
+    ensure_partitions(db, now, since=max(oldest, history_start) if oldest is not None else None)
+
+    # Step 3: copy rows (rows without a timestamp can't be placed - they get "now")
+    copied = db.execute(text(f"""
+        INSERT INTO {TABLE} (id, asset_name, price, timestamp)
+        SELECT id, asset_name, price, COALESCE(timestamp, now() AT TIME ZONE 'utc')
+        FROM {legacy}
+    """)).rowcount
+
+    # Step 4: continue numbering after the highest old id, drop the old table
+    db.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), "
+        f"(SELECT COALESCE(MAX(id), 0) + 1 FROM {TABLE}), false)"
+    ))
+    db.execute(text(f"DROP TABLE {legacy}"))
+    db.commit()
+    return copied
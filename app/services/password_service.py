@@ -0,0 +1,124 @@
+"""
+password_service.py - Password hashing off the event loop
+==========================================================
+
+What this file does:
+- bcrypt is slow on purpose (~0.25 s of CPU at cost 12). Run on the event
+  loop it would freeze every request; run on FastAPI's shared threadpool a
+  burst of logins would take all of its threads from the market endpoints
+- So hashing gets its own small thread pool (bcrypt releases the GIL while
+  it works, so threads run in parallel on separate cores)
+- At most PASSWORD_MAX_PENDING hash jobs may be queued or running. More than that and the
+  login is refused right away (PasswordBusy -> HTTP 503) instead of queueing
+  for seconds
+- verify() also upgrades old hashes: legacy SHA-256 or a different bcrypt
+  cost comes back with a new hash to store
+
+Benchmark: bench_login.py (repo root) prints logins/second per cost setting.
+
+Settings (environment variables):
+- PASSWORD_HASH_ROUNDS  bcrypt cost (default 12, see utils/password_util.py)
+- PASSWORD_WORKERS      hashing threads (default: half the CPUs, at least 1)
+- PASSWORD_MAX_PENDING  hash jobs queued or running (default 8 per worker)
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ..utils.password_util import HASH_ROUNDS, hash_password, needs_rehash, verify_password
+
+
+# ============ SETTINGS ============
+# leave half the cores for the API, the ingestor and the simulator
+WORKERS = int(os.getenv("PASSWORD_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", str(WORKERS * 8)))
+
+
+class PasswordBusy(Exception):
+    """too many password checks waiting already"""
+
+
+class PasswordService:
+    """
+    Bounded hashing pool.
+    pending is only changed on the event loop, so no lock is needed.
+    """
+
+    def __init__(self, workers: int = WORKERS, max_pending: int = MAX_PENDING, rounds: int = HASH_ROUNDS):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password")
+
+        self.pending = 0
+        self.hashed = 0
+        self.verified = 0
+        self.failed = 0
+        self.rehashed = 0
+        self.refused = 0
+        self.total_seconds = 0.0
+
+    async def _run(self, function, *args):
+        """run a hashing job in the pool, or refuse it if the queue is full"""
+        if self.pending >= self.max_pending:
+            self.refused += 1
+            raise PasswordBusy(f"{self.pending} password checks already waiting")
+
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+        finally:
+            self.pending -= 1
+            self.total_seconds += time.perf_counter() - started
+
+    # ============ HASH ============
+    async def hash(self, password: str) -> str:
+        hashed_password = await self._run(hash_password, password, self.rounds)
+        self.hashed += 1
+        return hashed_password
+
+    # ============ VERIFY ============
+    def _verify_and_upgrade(self, plain_password: str, hashed_password: str):
+        """(matches, new hash or None) - one pool job, so a rehash doesn't queue twice"""
+        if not verify_password(plain_password, hashed_password):
+            return False, None
+        if needs_rehash(hashed_password, self.rounds):
+            return True, hash_password(plain_password, self.rounds)
+        return True, None
+
+    async def verify(self, plain_password: str, hashed_password: str):
+        """
+        Returns (matches, new_hash).
+        new_hash is set when the stored hash is outdated and should be replaced.
+        """
+        matches, new_hash = await self._run(self._verify_and_upgrade, plain_password, hashed_password)
+        self.verified += 1
+        if not matches:
+            self.failed += 1
+        elif new_hash is not None:
+            self.rehashed += 1
+        return matches, new_hash
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        jobs = self.hashed + self.verified
+        return {
+            "rounds": self.rounds,
+            "workers": self.workers,
+            "pending": self.pending,
+            "hashed": self.hashed,
+            "verified": self.verified,
+            "failed": self.failed,
+            "rehashed": self.rehashed,
+            "refused": self.refused,
+            "avg_ms": round(self.total_seconds / jobs * 1000, 1) if jobs else 0.0
+        }
+
+
+# One shared pool for the whole process
+password_service = PasswordService()
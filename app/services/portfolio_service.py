@@ -0,0 +1,73 @@
+"""
+portfolio_service.py - Writes portfolio positions
+==================================================
+
+What this file does:
+- upsert_positions(): applies any number of position changes for one user
+  with ONE "INSERT ... ON CONFLICT (user_id, asset_name) DO UPDATE" statement
+- Atomic: two requests adding to the same asset at the same time can't
+  both read the old quantity (the old SELECT-then-UPDATE could)
+
+Modes:
+- "add": quantity is added to what the user already has (default, same as /portfolio/add)
+- "set": quantity replaces what the user already has (e.g. importing a portfolio)
+"""
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.portfolio_model import Portfolio
+from .broadcast import broadcast
+from .valuation_engine import valuation_engine
+
+
+def merge_changes(changes, mode: str = "add") -> dict:
+    """
+    {asset_name: quantity} with duplicates combined first -
+    ON CONFLICT can't touch the same row twice in one statement.
+    "add" sums duplicates, "set" keeps the last one.
+    """
+    merged = {}
+    for change in changes:
+        if mode == "add":
+            merged[change.asset_name] = merged.get(change.asset_name, 0.0) + change.quantity
+        else:
+            merged[change.asset_name] = change.quantity
+    return merged
+
+
+async def upsert_positions(db: AsyncSession, user_id: int, changes, mode: str = "add"):
+    """
+    Apply position changes (objects with asset_name and quantity) in one
+    round-trip and commit. Returns the resulting Portfolio rows.
+    """
+    merged = merge_changes(changes, mode)
+    if not merged:
+        return []
+
+    statement = insert(Portfolio).values([
+        {"user_id": user_id, "asset_name": asset_name, "quantity": quantity}
+        for asset_name, quantity in merged.items()
+    ])
+
+    if mode == "add":
+        new_quantity = Portfolio.quantity + statement.excluded.quantity
+    else:
+        new_quantity = statement.excluded.quantity
+
+    statement = statement.on_conflict_do_update(
+        index_elements=[Portfolio.user_id, Portfolio.asset_name],
+        set_={"quantity": new_quantity}
+    ).returning(Portfolio)
+
+    # populate_existing: rows already loaded in this session get the new quantity
+    result = await db.execute(statement, execution_options={"populate_existing": True})
+    rows = result.scalars().all()
+    await db.commit()
+
+    # keep live valuations in step with the database (on every worker)
+    for row in rows:
+        valuation_engine.set_holding(user_id, row.asset_name, row.quantity)
+        broadcast.publish("holding", [user_id, row.asset_name, row.quantity])
+
+    return rows
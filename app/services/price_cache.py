@@ -0,0 +1,266 @@
+"""
+price_cache.py - Recent prices kept in memory
+==============================================
+
+What this file does:
+- Keeps the last N ticks of every asset in a fixed-size ring buffer
+- Buffers are NumPy arrays (ids, timestamps, prices), not ORM objects
+- Filled by the tick ingestor after every flush, warmed from the DB at startup
+- Hot read paths (/market/latest, /ai, /alerts/check, websockets) read from here
+  instead of running "ORDER BY timestamp DESC LIMIT n" on every call
+
+Ring buffer:
+- Array of fixed size, "head" points to the next slot to write
+- When full, the oldest tick is simply overwritten
+- Reading the newest n ticks is a couple of array slices
+
+Settings (environment variables):
+- PRICE_CACHE_DEPTH      ticks kept per asset (default 1024)
+- PRICE_CACHE_WARM_DAYS  how far back startup looks for ticks (default 7,
+                         older assets are loaded on their first request)
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+import numpy as np
+from sqlalchemy import select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..models.candle_model import MarketCandle
+from ..models.market_model import MarketPrice
+
+
+# ============ SETTINGS ============
+DEFAULT_DEPTH = int(os.getenv("PRICE_CACHE_DEPTH", "1024"))
+WARM_DAYS = int(os.getenv("PRICE_CACHE_WARM_DAYS", "7"))
+
+
+class CachedPrice(NamedTuple):
+    """
+    One tick read back from the cache.
+    Has the same attributes as a MarketPrice row, so it works with
+    MarketOutput, calculate_risk, analyze_trend and the prompt builder.
+    """
+    id: int
+    asset_name: str
+    price: float
+    timestamp: datetime
+
+
+def to_epoch(timestamp: datetime) -> float:
+    """naive UTC datetime -> seconds since 1970"""
+    return timestamp.replace(tzinfo=timezone.utc).timestamp()
+
+
+def from_epoch(seconds: float) -> datetime:
+    """seconds since 1970 -> naive UTC datetime (same as the DB column)"""
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).replace(tzinfo=None)
+
+
+# ============ ONE ASSET ============
+class TickRing:
+    """fixed-size ring buffer of (id, timestamp, price) for one asset"""
+
+    def __init__(self, depth: int):
+        self.depth = depth
+        self.ids = np.zeros(depth, dtype=np.int64)
+        self.timestamps = np.zeros(depth, dtype=np.float64)
+        self.prices = np.zeros(depth, dtype=np.float64)
+        self.head = 0    # next slot to write
+        self.count = 0   # how many slots are filled
+
+    def append(self, tick_id: int, timestamp: float, price: float):
+        self.ids[self.head] = tick_id
+        self.timestamps[self.head] = timestamp
+        self.prices[self.head] = price
+        self.head = (self.head + 1) % self.depth
+        self.count = min(self.count + 1, self.depth)
+
+    def newest_indexes(self, n: int):
+        """slot indexes of the newest n ticks, newest first"""
+        n = min(n, self.count)
+        return (self.head - 1 - np.arange(n)) % self.depth
+
+    def ordered(self):
+        """all cached ticks, oldest first, as array copies"""
+        indexes = self.newest_indexes(self.count)[::-1]
+        return self.ids[indexes], self.timestamps[indexes], self.prices[indexes]
+
+
+# ============ ALL ASSETS ============
+class PriceCache:
+    """
+    Per-asset ring buffers + hit/miss counters.
+    Writes come from the ingestor thread, reads from request handlers,
+    so everything goes through one lock (operations are tiny).
+    """
+
+    def __init__(self, depth: int = DEFAULT_DEPTH):
+        self.depth = depth
+        self.rings = {}   # asset_name -> TickRing
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # ============ WRITE ============
+    def add_ticks(self, ticks):
+        """
+        Append saved ticks (dicts from the ingestor).
+        Registered as a tick_ingestor listener.
+        """
+        with self.lock:
+            for tick in ticks:
+                ring = self.rings.get(tick["asset_name"])
+                if ring is None:
+                    ring = self.rings[tick["asset_name"]] = TickRing(self.depth)
+                ring.append(tick["id"], to_epoch(tick["timestamp"]), tick["price"])
+
+    def fill(self, asset_name: str, rows):
+        """
+        Load rows (newest first, like the DB query) for an asset that
+        is not cached yet. Does nothing if ticks arrived meanwhile.
+        """
+        with self.lock:
+            if asset_name in self.rings:
+                return
+            ring = self.rings[asset_name] = TickRing(self.depth)
+            for row in reversed(rows[:self.depth]):
+                ring.append(row.id, to_epoch(row.timestamp), row.price)
+
+    def warm(self, db: Session, days: int = WARM_DAYS):
+        """
+        Load the newest `depth` ticks of every asset in ONE query.
+        Called once at startup.
+
+        Assets come from the (small) 1d candles table; per asset a LATERAL
+        "ORDER BY timestamp DESC LIMIT depth" walks idx_asset_timestamp
+        backwards. Only the last `days` are read, so old partitions are
+        skipped and nothing sorts the whole tick history.
+        """
+        since = datetime.utcnow() - timedelta(days=days)
+
+        assets = (
+            select(MarketCandle.asset_name)
+            .where(MarketCandle.resolution == "1d")
+            .where(MarketCandle.bucket_start >= since - timedelta(days=1))
+            .distinct()
+            .subquery()
+        )
+        recent = (
+            select(MarketPrice.id, MarketPrice.price, MarketPrice.timestamp)
+            .where(MarketPrice.asset_name == assets.c.asset_name)
+            .where(MarketPrice.timestamp >= since)
+            .order_by(MarketPrice.timestamp.desc())
+            .limit(self.depth)
+            .lateral()
+        )
+        rows = db.execute(
+            select(recent.c.id, assets.c.asset_name, recent.c.price, recent.c.timestamp)
+            .select_from(assets)
+            .join(recent, true())
+            .order_by(assets.c.asset_name, recent.c.timestamp.desc())
+        ).all()
+
+        by_asset = {}
+        for row in rows:
+            by_asset.setdefault(row.asset_name, []).append(row)
+
+        for asset_name, asset_rows in by_asset.items():
+            self.fill(asset_name, asset_rows)
+
+        print(f"Price cache warmed: {len(by_asset)} assets, {len(rows)} ticks")
+
+    # ============ READ ============
+    def latest(self, asset_name: str, n: int = 10):
+        """
+        Newest n ticks for an asset (newest first), or None if the
+        asset is not cached.
+        """
+        with self.lock:
+            ring = self.rings.get(asset_name)
+            if ring is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            indexes = ring.newest_indexes(n)
+            ids = ring.ids[indexes].tolist()
+            timestamps = ring.timestamps[indexes].tolist()
+            prices = ring.prices[indexes].tolist()
+
+        return [
+            CachedPrice(tick_id, asset_name, price, from_epoch(ts))
+            for tick_id, ts, price in zip(ids, timestamps, prices)
+        ]
+
+    def latest_price(self, asset_name: str):
+        """newest tick for an asset, or None"""
+        ticks = self.latest(asset_name, 1)
+        return ticks[0] if ticks else None
+
+    def series(self, asset_name: str):
+        """
+        All cached (timestamps, prices) for an asset as NumPy arrays,
+        oldest first. Returns None if the asset is not cached.
+        """
+        with self.lock:
+            ring = self.rings.get(asset_name)
+            if ring is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            _, timestamps, prices = ring.ordered()
+        return timestamps, prices
+
+    def assets(self):
+        """names of all cached assets"""
+        with self.lock:
+            return list(self.rings)
+
+    # ============ METRICS ============
+    def stats(self) -> dict:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "depth": self.depth,
+                "assets": len(self.rings),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0
+            }
+
+
+# One shared cache for the whole process
+price_cache = PriceCache()
+
+
+# ============ CACHE-FIRST READ HELPER ============
+async def get_recent_prices(db: AsyncSession, asset_name: str, limit: int = 10):
+    """
+    Newest `limit` prices for an asset, newest first.
+    Served from the cache; falls back to the database on a miss
+    (and fills the cache from that result).
+    """
+
+    # Step 1: try the cache
+    cached = price_cache.latest(asset_name, limit)
+    if cached is not None:
+        return cached
+
+    # Step 2: cache miss - ask the database
+    result = await db.execute(
+        select(MarketPrice)
+        .where(MarketPrice.asset_name == asset_name)
+        .order_by(MarketPrice.timestamp.desc())
+        .limit(max(limit, price_cache.depth))
+    )
+    rows = result.scalars().all()
+
+    # Step 3: remember them for next time (unknown assets stay uncached)
+    if rows:
+        price_cache.fill(asset_name, rows)
+
+    return rows[:limit]
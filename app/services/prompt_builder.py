@@ -6,6 +6,14 @@ What this file does:
 - Converts it into a text prompt for AI
 - AI reads this prompt and generates analysis
 
+Two builders:
+- build_market_prompt: one line per price object (fine for ~10 prices)
+- build_summary_prompt: any amount of history (NumPy arrays, e.g. from
+  ai_service.history_series: 30 days of candles + recent ticks) squeezed into
+  a fixed-size summary - OHLC per time bucket, volatility, drawdown,
+  trend slope and a small downsampled series. 30 days of ticks give the
+  same prompt size as 5 minutes, so token cost and latency stay flat.
+
 Input:
     - asset_name: "BTC", "ETH", etc.
     - prices: list of price objects
@@ -14,6 +22,16 @@ Input:
     Output: A text prompt for AI
 """
 
+import numpy as np
+
+from ..utils.indicators import SECONDS_PER_YEAR, max_drawdown
+from .price_cache import from_epoch
+
+
+# ============ SETTINGS ============
+SUMMARY_BUCKETS = 8     # OHLC rows in the prompt
+SUMMARY_POINTS = 16     # prices in the downsampled series
+
 
 
 def build_market_prompt(asset_name, prices, risk_level):
@@ -48,3 +66,109 @@ Task:
 """
 
     return prompt
+
+
+
+# ============ COMPACT SUMMARY ============
+def summarize_series(timestamps, prices, buckets: int = SUMMARY_BUCKETS, points: int = SUMMARY_POINTS) -> dict:
+    """
+    Fixed-size numeric summary of a price series.
+    timestamps: epoch seconds, prices: floats, both oldest first.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    prices = np.asarray(prices, dtype=np.float64)
+    n = len(prices)
+
+    # OHLC per equal-time bucket (reduceat works on the bucket start indexes)
+    edges = np.linspace(timestamps[0], timestamps[-1], buckets + 1)
+    starts = np.unique(np.searchsorted(timestamps, edges[:-1], side="left"))
+    starts = starts[starts < n]
+    ends = np.append(starts[1:], n) - 1
+    ohlc = np.column_stack([
+        timestamps[starts],
+        prices[starts],
+        np.maximum.reduceat(prices, starts),
+        np.minimum.reduceat(prices, starts),
+        prices[ends],
+    ])
+
+    # Trend: least-squares slope of log price, in % per hour
+    hours = (timestamps - timestamps[0]) / 3600
+    if n > 1 and hours[-1] > 0:
+        slope, _ = np.polyfit(hours, np.log(prices), 1)
+        slope_pct_per_hour = float(np.expm1(slope) * 100)
+    else:
+        slope_pct_per_hour = 0.0
+
+    # Volatility: every return scaled by its own time step, so a series of
+    # hourly candle closes followed by ticks seconds apart is still one scale
+    steps = np.diff(timestamps)
+    spaced = steps > 0
+    scaled = np.diff(np.log(prices))[spaced] / np.sqrt(steps[spaced])
+    volatility = float(scaled.std(ddof=1)) * np.sqrt(SECONDS_PER_YEAR) if len(scaled) > 1 else 0.0
+
+    # Downsampled series: evenly spaced samples, always including the last price
+    sample = np.unique(np.linspace(0, n - 1, min(points, n)).round().astype(int))
+
+    return {
+        "start": from_epoch(timestamps[0]),
+        "end": from_epoch(timestamps[-1]),
+        "count": n,
+        "last": float(prices[-1]),
+        "change_pct": float((prices[-1] / prices[0] - 1) * 100),
+        "high": float(prices.max()),
+        "low": float(prices.min()),
+        "volatility": volatility,
+        "max_drawdown": max_drawdown(prices),
+        "slope_pct_per_hour": slope_pct_per_hour,
+        "ohlc": ohlc,
+        "sample": prices[sample],
+    }
+
+
+def build_summary_prompt(asset_name, timestamps, prices, risk_level,
+                         buckets: int = SUMMARY_BUCKETS, points: int = SUMMARY_POINTS):
+    """
+    Same task as build_market_prompt, but from NumPy arrays of any length.
+    The prompt size depends only on `buckets` and `points`.
+    """
+
+    # Step 1: Numbers that describe the whole history
+    summary = summarize_series(timestamps, prices, buckets, points)
+
+    # Step 2: One short line per bucket
+    ohlc_lines = [
+        f"{from_epoch(start):%Y-%m-%d %H:%M}  O {open_:.2f}  H {high:.2f}  L {low:.2f}  C {close:.2f}"
+        for start, open_, high, low, close in summary["ohlc"].tolist()
+    ]
+    sample_text = ", ".join(f"{price:.2f}" for price in summary["sample"].tolist())
+
+    # Step 3: Build the final prompt
+    prompt = f"""
+You are a financial market analyst.
+
+Asset: {asset_name}
+
+History: {summary["count"]} prices from {summary["start"]:%Y-%m-%d %H:%M} to {summary["end"]:%Y-%m-%d %H:%M} UTC
+Last price: ${summary["last"]:.2f} ({summary["change_pct"]:+.2f}% over the period)
+Range: low ${summary["low"]:.2f}, high ${summary["high"]:.2f}
+Annualized volatility: {summary["volatility"] * 100:.1f}%
+Max drawdown: {summary["max_drawdown"] * 100:.2f}%
+Trend slope: {summary["slope_pct_per_hour"]:+.3f}% per hour
+
+Open/High/Low/Close by period:
+{chr(10).join(ohlc_lines)}
+
+Price path (evenly sampled, oldest first): {sample_text}
+
+Risk level: {risk_level}
+
+Task:
+- Explain current market situation
+- Mention risk clearly
+- Keep explanation simple and grounded
+- Do not make unrealistic predictions
+"""
+
+    return prompt
+
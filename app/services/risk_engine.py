@@ -0,0 +1,205 @@
+"""
+risk_engine.py - Cached risk numbers per asset and per portfolio
+================================================================
+
+What this file does:
+- Asset risk: volatility, VaR / CVaR (historical + parametric) and
+  max drawdown over the last `window` ticks in the price cache
+- Portfolio risk: the same for a user's holdings, weighted by value,
+  using a returns matrix (one column per held asset)
+- Results are cached per (asset, window); every new tick of an asset
+  bumps its version, which invalidates its cached results
+  (nothing is recomputed until someone asks again)
+
+Used by: /ai/market-summary, /analytics/{asset}/risk, /portfolio/risk
+
+Settings (environment variables):
+- RISK_WINDOW  ticks used per calculation (default 256)
+"""
+
+import os
+import threading
+
+import numpy as np
+
+from ..utils.indicators import annualization, max_drawdown
+from ..utils.risk_utils import DEFAULT_CONFIDENCE, portfolio_metrics, risk_label, risk_metrics
+from .price_cache import price_cache
+from .valuation_engine import valuation_engine
+
+
+# ============ SETTINGS ============
+DEFAULT_WINDOW = int(os.getenv("RISK_WINDOW", "256"))
+
+
+def rounded(metrics: dict, digits: int = 6) -> dict:
+    return {name: round(float(value), digits) for name, value in metrics.items()}
+
+
+class RiskEngine:
+    """
+    Lazily computed, tick-invalidated risk numbers.
+    Ticks come from the ingestor thread, reads from request handlers.
+    """
+
+    def __init__(self, window: int = DEFAULT_WINDOW, confidence: float = DEFAULT_CONFIDENCE):
+        self.window = window
+        self.confidence = confidence
+        self.lock = threading.Lock()
+        self.versions = {}          # asset_name -> tick counter
+        self.asset_cache = {}       # (asset_name, window) -> (version, result)
+        self.portfolio_cache = {}   # user_id -> (signature, result)
+        self.hits = 0
+        self.misses = 0
+
+    # ============ INVALIDATE ============
+    def add_ticks(self, ticks):
+        """
+        New ticks make cached results of their assets stale.
+        Registered as a tick_ingestor listener.
+        """
+        with self.lock:
+            for tick in ticks:
+                asset_name = tick["asset_name"]
+                self.versions[asset_name] = self.versions.get(asset_name, 0) + 1
+
+    def _cached(self, cache, key, signature):
+        with self.lock:
+            entry = cache.get(key)
+            if entry is not None and entry[0] == signature:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def _store(self, cache, key, signature, result):
+        with self.lock:
+            cache[key] = (signature, result)
+
+    # ============ ASSET ============
+    def asset_risk(self, asset_name: str, window: int = None):
+        """risk of one asset over its last `window` ticks, or None if not cached"""
+        window = window or self.window
+        key = (asset_name, window)
+        version = self.versions.get(asset_name, 0)
+
+        result = self._cached(self.asset_cache, key, version)
+        if result is not None:
+            return result
+
+        series = price_cache.series(asset_name)
+        if series is None or len(series[1]) < 3:
+            return None
+        timestamps, prices = series[0][-(window + 1):], series[1][-(window + 1):]
+
+        returns = np.diff(np.log(prices))
+        metrics = {name: values[0] for name, values in risk_metrics(returns, self.confidence).items()}
+        annual_volatility = float(metrics["volatility"]) * annualization(timestamps)
+
+        result = {
+            "asset": asset_name,
+            "window": window,
+            "observations": len(returns),
+            "confidence": self.confidence,
+            **rounded(metrics),
+            "annualized_volatility": round(annual_volatility, 6),
+            "max_drawdown": round(max_drawdown(prices), 6),
+            "label": risk_label(annual_volatility),
+        }
+        self._store(self.asset_cache, key, version, result)
+        return result
+
+    # ============ PORTFOLIO ============
+    def returns_matrix(self, asset_names, window: int):
+        """
+        Log returns of several assets on one shared time grid
+        (window + 1 evenly spaced points over the time all of them cover).
+        Assets tick at different moments, so each series is interpolated
+        onto the grid. Returns (matrix, names kept, grid step in seconds).
+        """
+        series = {}
+        for asset_name in asset_names:
+            data = price_cache.series(asset_name)
+            if data is not None and len(data[1]) >= 3:
+                series[asset_name] = data
+        if not series:
+            return None, [], 0.0
+
+        start = max(timestamps[0] for timestamps, _ in series.values())
+        end = min(timestamps[-1] for timestamps, _ in series.values())
+        if end <= start:
+            return None, [], 0.0
+
+        grid = np.linspace(start, end, window + 1)
+        names = list(series)
+        prices = np.column_stack([np.interp(grid, *series[name]) for name in names])
+        return np.diff(np.log(prices), axis=0), names, (end - start) / window
+
+    def portfolio_risk(self, user_id: int, window: int = None):
+        """risk of a user's holdings (weights = current value share)"""
+        window = window or self.window
+        valuation = valuation_engine.valuation(user_id)
+        total = valuation["total_value"]
+        values = {p["asset_name"]: p["value"] for p in valuation["positions"] if p["value"] > 0}
+        if not values or total <= 0:
+            return None
+
+        names = sorted(values)
+        signature = (
+            window,
+            tuple((name, round(values[name] / total, 4)) for name in names),
+            tuple(self.versions.get(name, 0) for name in names),
+        )
+        result = self._cached(self.portfolio_cache, user_id, signature)
+        if result is not None:
+            return result
+
+        returns, kept, step = self.returns_matrix(names, window)
+        if returns is None:
+            return None
+        weights = np.array([values[name] for name in kept])
+        weights = weights / weights.sum()
+
+        metrics = portfolio_metrics(returns, weights, self.confidence)
+        per_asset = risk_metrics(returns, self.confidence)
+        scale = annualization(np.array([0.0, step]))
+        annual_volatility = metrics["volatility"] * scale
+
+        result = {
+            "window": window,
+            "confidence": self.confidence,
+            "total_value": total,
+            **rounded(metrics),
+            "annualized_volatility": round(annual_volatility, 6),
+            # same losses in money
+            "var_amount": round(metrics["var_historical"] * total, 2),
+            "cvar_amount": round(metrics["cvar_historical"] * total, 2),
+            "label": risk_label(annual_volatility),
+            "assets": [
+                {
+                    "asset": name,
+                    "weight": round(float(weights[i]), 6),
+                    "annualized_volatility": round(float(per_asset["volatility"][i]) * scale, 6),
+                    "var_historical": round(float(per_asset["var_historical"][i]), 6),
+                }
+                for i, name in enumerate(kept)
+            ],
+        }
+        self._store(self.portfolio_cache, user_id, signature, result)
+        return result
+
+    def stats(self) -> dict:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "window": self.window,
+                "cached_assets": len(self.asset_cache),
+                "cached_portfolios": len(self.portfolio_cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0
+            }
+
+
+# One shared engine for the whole process
+risk_engine = RiskEngine()
@@ -0,0 +1,254 @@
+"""
+rollup_service.py - OHLCV candles for charts
+=============================================
+
+What this file does:
+- Turns raw ticks into candles (open/high/low/close/volume per time bucket)
+- update_rollups(): called by the tick ingestor inside the same transaction
+  as the tick INSERT, merges each batch into market_candles (upsert)
+- get_candles(): reads candles for /market/history?resolution=...
+  Ranges older than the first stored candle (data from before rollups existed)
+  are computed on read from the raw ticks instead
+- rebuild_candles(): recomputes stored candles from raw ticks (backfill)
+- repair_recent_candles(): background job (one worker, see job_runner.py)
+  that rebuilds the recently closed candles, so a candle left wrong by a
+  failed or partial flush is corrected within ROLLUP_REPAIR_INTERVAL
+
+Why:
+- 24 h of 1 tick/s = 86,400 rows, a chart only needs a few hundred points
+- Reading 288 five-minute candles is orders of magnitude less work
+"""
+
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import Float, case, extract, func, literal, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by, array_agg, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..models.candle_model import MarketCandle
+from ..models.market_model import MarketPrice
+
+
+# ============ SETTINGS ============
+# resolution name -> bucket size in seconds
+RESOLUTIONS = {
+    "1m": 60,
+    "5m": 5 * 60,
+    "1h": 60 * 60,
+    "1d": 24 * 60 * 60,
+}
+
+EPOCH = datetime(1970, 1, 1)
+
+# Repair job: how often, how far back, which resolutions
+# (1d is left out - rebuilding it means reading a whole day of ticks)
+REPAIR_INTERVAL = float(os.getenv("ROLLUP_REPAIR_INTERVAL", "900"))
+REPAIR_WINDOW = timedelta(seconds=float(os.getenv("ROLLUP_REPAIR_WINDOW", "3600")))
+REPAIR_RESOLUTIONS = ("1m", "5m", "1h")
+
+
+def bucket_floor(timestamp: datetime, seconds: int) -> datetime:
+    """start of the bucket this timestamp falls into"""
+    offset = (timestamp - EPOCH).total_seconds()
+    return EPOCH + timedelta(seconds=(offset // seconds) * seconds)
+
+
+# ============ WRITE: INCREMENTAL ============
+def aggregate_ticks(ticks):
+    """
+    Group a batch of ticks into partial candles, one per
+    (asset, resolution, bucket). Ticks come from the ingestor as dicts.
+    """
+    candles = {}
+
+    for tick in ticks:
+        price = tick["price"]
+        timestamp = tick["timestamp"]
+
+        for resolution, seconds in RESOLUTIONS.items():
+            key = (tick["asset_name"], resolution, bucket_floor(timestamp, seconds))
+            candle = candles.get(key)
+
+            if candle is None:
+                candles[key] = {
+                    "asset_name": key[0],
+                    "resolution": resolution,
+                    "bucket_start": key[2],
+                    "open": price, "high": price, "low": price, "close": price,
+                    "volume": 1,
+                    "first_tick_at": timestamp,
+                    "last_tick_at": timestamp,
+                }
+                continue
+
+            candle["high"] = max(candle["high"], price)
+            candle["low"] = min(candle["low"], price)
+            candle["volume"] += 1
+            if timestamp < candle["first_tick_at"]:
+                candle["open"] = price
+                candle["first_tick_at"] = timestamp
+            if timestamp >= candle["last_tick_at"]:
+                candle["close"] = price
+                candle["last_tick_at"] = timestamp
+
+    return list(candles.values())
+
+
+def update_rollups(db: Session, ticks):
+    """
+    Merge a batch of ticks into market_candles with one
+    INSERT ... ON CONFLICT DO UPDATE. Does not commit.
+    """
+    candles = aggregate_ticks(ticks)
+    if not candles:
+        return
+
+    statement = insert(MarketCandle)
+    new = statement.excluded
+    table = MarketCandle.__table__.c
+
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.asset_name, table.resolution, table.bucket_start],
+        set_={
+            # keep the earliest open and the latest close
+            "open": case((new.first_tick_at < table.first_tick_at, new.open), else_=table.open),
+            "close": case((new.last_tick_at >= table.last_tick_at, new.close), else_=table.close),
+            "high": func.greatest(table.high, new.high),
+            "low": func.least(table.low, new.low),
+            "volume": table.volume + new.volume,
+            "first_tick_at": func.least(table.first_tick_at, new.first_tick_at),
+            "last_tick_at": func.greatest(table.last_tick_at, new.last_tick_at),
+        }
+    )
+
+    db.execute(statement, candles)
+
+
+# ============ READ ============
+def candles_from_ticks_query(asset_name: str, resolution: str, start_time: datetime,
+                             end_time: datetime = None):
+    """
+    SELECT that builds candles straight from raw ticks (compute on read).
+    Bucket = floor(epoch / size) * size, open/close from array_agg ordered by time.
+    """
+    seconds = RESOLUTIONS[resolution]
+    epoch = extract("epoch", MarketPrice.timestamp)
+    bucket = func.timezone(
+        "UTC", func.to_timestamp(func.floor(epoch / seconds) * seconds)
+    ).label("bucket_start")
+
+    query = (
+        select(
+            literal(asset_name).label("asset_name"),
+            literal(resolution).label("resolution"),
+            bucket,
+            array_agg(aggregate_order_by(MarketPrice.price, MarketPrice.timestamp.asc()))[1]
+            .cast(Float).label("open"),
+            func.max(MarketPrice.price).label("high"),
+            func.min(MarketPrice.price).label("low"),
+            array_agg(aggregate_order_by(MarketPrice.price, MarketPrice.timestamp.desc()))[1]
+            .cast(Float).label("close"),
+            func.count().label("volume"),
+            func.min(MarketPrice.timestamp).label("first_tick_at"),
+            func.max(MarketPrice.timestamp).label("last_tick_at"),
+        )
+        .where(MarketPrice.asset_name == asset_name)
+        .where(MarketPrice.timestamp >= start_time)
+        .group_by(bucket)
+        .order_by(bucket)
+    )
+
+    if end_time is not None:
+        query = query.where(MarketPrice.timestamp < end_time)
+
+    return query
+
+
+async def get_candles(db: AsyncSession, asset_name: str, resolution: str, start_time: datetime):
+    """
+    Candles for an asset from start_time until now, oldest first.
+
+    Step 1: read stored candles from market_candles
+    Step 2: for the part of the range before the first stored candle,
+            compute candles from raw ticks (data older than the rollups)
+    """
+
+    seconds = RESOLUTIONS[resolution]
+    range_start = bucket_floor(start_time, seconds)
+
+    # Step 1: stored candles (primary key index covers this range scan)
+    result = await db.execute(
+        select(MarketCandle)
+        .where(MarketCandle.asset_name == asset_name)
+        .where(MarketCandle.resolution == resolution)
+        .where(MarketCandle.bucket_start >= range_start)
+        .order_by(MarketCandle.bucket_start.asc())
+    )
+    stored = result.scalars().all()
+
+    # Step 2: is anything in the range older than the first stored candle?
+    first_stored = stored[0].bucket_start if stored else None
+
+    if first_stored is not None and first_stored <= range_start:
+        return stored
+
+    computed = (await db.execute(
+        candles_from_ticks_query(asset_name, resolution, range_start, first_stored)
+    )).all()
+
+    return list(computed) + stored
+
+
+def rebuild_candles(db: Session, asset_name: str, resolution: str, start_time: datetime,
+                    end_time: datetime = None):
+    """
+    Recompute stored candles from raw ticks and overwrite them
+    (backfill for data written before rollups existed). Commits.
+    Returns the number of candles written.
+    """
+    # whole buckets only, a half bucket would overwrite a good candle
+    seconds = RESOLUTIONS[resolution]
+    if end_time is not None:
+        end_time = bucket_floor(end_time, seconds)
+
+    rows = db.execute(
+        candles_from_ticks_query(asset_name, resolution, bucket_floor(start_time, seconds), end_time)
+    ).mappings().all()
+
+    if not rows:
+        return 0
+
+    statement = insert(MarketCandle)
+    new = statement.excluded
+    statement = statement.on_conflict_do_update(
+        index_elements=["asset_name", "resolution", "bucket_start"],
+        set_={
+            column: getattr(new, column)
+            for column in ("open", "high", "low", "close", "volume", "first_tick_at", "last_tick_at")
+        }
+    )
+
+    db.execute(statement, [dict(row) for row in rows])
+    db.commit()
+    return len(rows)
+
+
+def repair_recent_candles(db: Session):
+    """
+    Rebuild the closed candles of the last REPAIR_WINDOW from raw ticks.
+    Runs as a periodic background job. Returns the number of candles written.
+    """
+    end_time = datetime.utcnow()
+    start_time = end_time - REPAIR_WINDOW
+
+    assets = db.execute(
+        select(MarketPrice.asset_name).where(MarketPrice.timestamp >= start_time).distinct()
+    ).scalars().all()
+
+    written = 0
+    for asset_name in assets:
+        for resolution in REPAIR_RESOLUTIONS:
+            written += rebuild_candles(db, asset_name, resolution, start_time, end_time)
+    return written
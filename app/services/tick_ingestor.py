@@ -0,0 +1,291 @@
+"""
+tick_ingestor.py - Batched writer for market prices
+====================================================
+
+What this file does:
+- Collects incoming price ticks in a queue (no database work on the caller)
+- A background thread writes them in bulk: one multi-row INSERT + one commit
+- Flushes when the batch is big enough OR when enough time has passed
+- Updates the OHLCV candles (rollup_service) in the same transaction
+- After each flush, hands the saved ticks to listeners (price hub, etc.)
+- Ticks with a client timestamp older than the asset's newest tick
+  (back-filled history) are saved and rolled into the candles, but NOT
+  handed to listeners: the price cache, valuations and alerts treat every
+  tick as "the latest price" and would move backwards / re-fire old crossings
+
+Why:
+- Before, every price was its own add + commit + refresh (1 transaction each)
+- Now hundreds/thousands of ticks share one transaction and one round-trip
+
+A tick is a plain dict:
+    {"id": 1, "asset_name": "BTC", "price": 42000.0, "timestamp": datetime}
+("id" is filled in after the flush)
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from ..database import SessionLocal
+from ..models.market_model import MarketPrice
+from .rollup_service import update_rollups
+
+
+# ============ SETTINGS ============
+# Flush as soon as this many ticks are waiting
+BATCH_SIZE = 1000
+
+# ...or when the oldest waiting tick is this old (seconds)
+FLUSH_INTERVAL = 0.1
+
+# Refuse new ticks once this many are waiting (protects memory)
+MAX_QUEUE_SIZE = 100_000
+
+
+class IngestQueueFull(Exception):
+    """raised when the ingest queue can't take more ticks right now"""
+
+
+class TickIngestor:
+    """
+    Queues ticks and flushes them to the database in batches.
+
+    submit() / submit_many() are safe to call from any thread and
+    never touch the database themselves.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 max_queue_size=MAX_QUEUE_SIZE):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+
+        # items are (tick dict, Future or None)
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        # held while checking for room and queueing, so submit_many's
+        # "all or nothing" holds with several producers (only the writer
+        # thread takes ticks out, which can only make more room)
+        self.submit_lock = threading.Lock()
+        self.listeners = []
+        self.latest = {}   # asset_name -> newest timestamp handed to listeners
+        self.latest_lock = threading.Lock()
+        self.thread = None
+        self.stopping = threading.Event()
+
+        # metrics
+        self.submitted = 0
+        self.written = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.late = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+        self.last_batch_size = 0
+
+    # ============ LIFECYCLE ============
+    def add_listener(self, listener):
+        """listener(ticks) is called with every flushed batch (on the writer thread)"""
+        self.listeners.append(listener)
+
+    def mark_seen(self, asset_name: str, timestamp: datetime):
+        """listeners already know a price this new (e.g. loaded at startup)"""
+        with self.latest_lock:
+            latest = self.latest.get(asset_name)
+            if latest is None or timestamp > latest:
+                self.latest[asset_name] = timestamp
+
+    def observe(self, ticks):
+        """ticks saved by other workers count as seen too (broadcast tick listener)"""
+        for tick in ticks:
+            self.mark_seen(tick["asset_name"], tick["timestamp"])
+
+    def start(self):
+        """start the background writer thread"""
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self._run, name="tick-ingestor", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=5.0):
+        """write whatever is still queued, then stop the thread"""
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+
+    # ============ SUBMIT TICKS ============
+    def submit(self, asset_name: str, price: float, timestamp: datetime = None) -> Future:
+        """
+        Queue one tick. Returns a Future that resolves to the saved
+        tick (with its id) once the batch containing it is committed.
+        """
+        future = Future()
+        tick = self._make_tick(asset_name, price, timestamp)
+
+        with self.submit_lock:
+            try:
+                self.queue.put_nowait((tick, future))
+            except queue.Full:
+                raise IngestQueueFull("ingest queue is full")
+            self.submitted += 1
+        return future
+
+    def submit_many(self, ticks) -> int:
+        """
+        Queue many ticks at once (fire and forget).
+        ticks: iterable of (asset_name, price, timestamp or None)
+        Returns how many were queued.
+
+        All or nothing: if there is no room for every tick, none is queued
+        and IngestQueueFull is raised, so a client never has to guess which
+        ones got in.
+        """
+        ticks = [self._make_tick(*tick) for tick in ticks]
+
+        with self.submit_lock:
+            if self.queue.qsize() + len(ticks) > self.max_queue_size:
+                raise IngestQueueFull("ingest queue is full")
+            for tick in ticks:
+                self.queue.put_nowait((tick, None))
+            self.submitted += len(ticks)
+        return len(ticks)
+
+    def _make_tick(self, asset_name, price, timestamp=None):
+        return {
+            "asset_name": asset_name,
+            "price": float(price),
+            "timestamp": timestamp or datetime.utcnow()
+        }
+
+    # ============ WRITER THREAD ============
+    def _run(self):
+        """keep collecting and flushing batches until stopped and drained"""
+        while not (self.stopping.is_set() and self.queue.empty()):
+            batch = self._collect_batch()
+            if batch:
+                self._flush(batch)
+
+    def _collect_batch(self):
+        """wait for the first tick, then gather more until size or time limit"""
+        try:
+            first = self.queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _flush(self, batch):
+        """write one batch with a single multi-row INSERT and commit"""
+        ticks = [tick for tick, _ in batch]
+        started = time.perf_counter()
+
+        db = SessionLocal()
+        try:
+            # Step 1: multi-row INSERT ... RETURNING id (one round-trip per batch)
+            statement = insert(MarketPrice).returning(
+                MarketPrice.id, sort_by_parameter_order=True
+            )
+            ids = db.execute(statement, ticks).scalars().all()
+
+            # Step 2: merge the batch into the OHLCV candles
+            update_rollups(db, ticks)
+
+            # Step 3: one commit for the whole batch
+            db.commit()
+
+        except Exception as e:
+            db.rollback()
+            self.failed_flushes += 1
+            print(f"Tick flush failed ({len(ticks)} ticks): {e}")
+            for _, future in batch:
+                if future is not None:
+                    future.set_exception(e)
+            return
+
+        finally:
+            db.close()
+
+        # Step 4: record metrics
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.flushes += 1
+        self.written += len(ticks)
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self.total_flush_ms += elapsed_ms
+        self.last_batch_size = len(ticks)
+
+        # Step 5: wake up callers waiting for their tick
+        for tick_id, (tick, future) in zip(ids, batch):
+            tick["id"] = tick_id
+            if future is not None:
+                future.set_result(tick)
+
+        # Step 6: tell listeners about the new ticks (late ones are only saved)
+        self.notify_listeners(ticks)
+
+    def notify_listeners(self, ticks):
+        """
+        Hand ticks (dicts with ids) to every listener, leaving out late ones.
+        Called after each flush, and by the simulator's hub sink, which
+        skips the database but feeds the same hubs, cache and engines.
+        """
+        live = self._live_ticks(ticks)
+        if not live:
+            return
+        for listener in self.listeners:
+            try:
+                listener(live)
+            except Exception as e:
+                print(f"Tick listener error: {e}")
+
+    def _live_ticks(self, ticks):
+        """ticks not older than the newest one listeners have seen, in order"""
+        live = []
+        with self.latest_lock:
+            for tick in ticks:
+                latest = self.latest.get(tick["asset_name"])
+                if latest is not None and tick["timestamp"] < latest:
+                    continue
+                self.latest[tick["asset_name"]] = tick["timestamp"]
+                live.append(tick)
+        self.late += len(ticks) - len(live)
+        return live
+
+    # ============ METRICS ============
+    def stats(self) -> dict:
+        """numbers for the /metrics endpoint"""
+        return {
+            "queue_depth": self.queue.qsize(),
+            "max_queue_size": self.max_queue_size,
+            "submitted": self.submitted,
+            "written": self.written,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "late": self.late,
+            "last_batch_size": self.last_batch_size,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "max_flush_ms": round(self.max_flush_ms, 3),
+            "avg_flush_ms": round(self.total_flush_ms / self.flushes, 3) if self.flushes else 0.0
+        }
+
+
+# One shared ingestor for the whole process
+tick_ingestor = TickIngestor()
@@ -0,0 +1,302 @@
+"""
+valuation_engine.py - Live mark-to-market of every portfolio
+=============================================================
+
+What this file does:
+- Keeps every holding in memory as one NumPy matrix:
+  quantities[user_row, asset_col]
+- Keeps the latest price and the day's open price of every asset as arrays
+- Keeps each user's total value and total value at the open
+- GET /portfolio/valuation reads from here - no price query per asset
+
+How ticks update it (incremental, no full recompute):
+- Price of asset `col` moves by `delta`
+- Every user's total changes by quantity * delta, which is one
+  column operation for all users:  values += quantities[:, col] * delta
+- Users watching /portfolio/valuation/stream who hold that asset get
+  their new valuation pushed through portfolio_hub (topic = user id)
+
+"Change since open" = value now vs. value at the first price of the UTC day
+(open of the 1d candle).
+"""
+
+import asyncio
+import json
+import threading
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..models.candle_model import MarketCandle
+from ..models.portfolio_model import Portfolio
+from .hub import portfolio_hub
+from .price_cache import price_cache
+from .rollup_service import RESOLUTIONS, bucket_floor
+
+
+# ============ SETTINGS ============
+# Start size of the holdings matrix (doubles when full)
+INITIAL_USERS = 64
+INITIAL_ASSETS = 16
+
+# Recompute all totals from scratch every N batches (clears float drift)
+RESYNC_EVERY = 1000
+
+# Send a comment line this often so proxies don't close an idle stream
+KEEPALIVE_SECONDS = 15
+
+DAY_SECONDS = RESOLUTIONS["1d"]
+
+
+def grow(array, rows=None, cols=None, fill=0.0):
+    """copy of array with more rows and/or columns, new cells set to fill"""
+    shape = list(array.shape)
+    if rows is not None:
+        shape[0] = rows
+    if cols is not None:
+        shape[1] = cols
+    bigger = np.full(shape, fill, dtype=array.dtype)
+    bigger[tuple(slice(0, n) for n in array.shape)] = array
+    return bigger
+
+
+class ValuationEngine:
+    """
+    Holdings x prices for all users.
+    Ticks come from the ingestor thread, reads and holding changes
+    from API routes, so everything goes through one lock.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+        self.user_rows = {}    # user_id -> row
+        self.asset_cols = {}   # asset_name -> column
+        self.asset_names = []  # column -> asset_name
+
+        self.quantities = np.zeros((INITIAL_USERS, INITIAL_ASSETS))
+        self.values = np.zeros(INITIAL_USERS)        # total value now, per user
+        self.open_values = np.zeros(INITIAL_USERS)   # total value at the open, per user
+
+        # per asset; NaN = no price seen yet
+        self.prices = np.full(INITIAL_ASSETS, np.nan)
+        self.open_prices = np.full(INITIAL_ASSETS, np.nan)
+        self.open_days = [None] * INITIAL_ASSETS      # which day open_prices belongs to
+
+        self.batches = 0
+        self.ticks_applied = 0
+        self.pushed = 0
+
+    # ============ ROWS / COLUMNS ============
+    def _row(self, user_id):
+        row = self.user_rows.get(user_id)
+        if row is None:
+            row = self.user_rows[user_id] = len(self.user_rows)
+            if row >= self.quantities.shape[0]:
+                size = self.quantities.shape[0] * 2
+                self.quantities = grow(self.quantities, rows=size)
+                self.values = grow(self.values, rows=size)
+                self.open_values = grow(self.open_values, rows=size)
+        return row
+
+    def _col(self, asset_name):
+        col = self.asset_cols.get(asset_name)
+        if col is None:
+            col = self.asset_cols[asset_name] = len(self.asset_names)
+            self.asset_names.append(asset_name)
+            if col >= self.quantities.shape[1]:
+                size = self.quantities.shape[1] * 2
+                self.quantities = grow(self.quantities, cols=size)
+                self.prices = grow(self.prices, rows=size, fill=np.nan)
+                self.open_prices = grow(self.open_prices, rows=size, fill=np.nan)
+                self.open_days.extend([None] * (size - len(self.open_days)))
+
+            # a new asset starts from whatever the price cache knows
+            cached = price_cache.latest_price(asset_name)
+            if cached is not None:
+                self._set_price(col, cached.price, cached.timestamp)
+        return col
+
+    # ============ PRICES ============
+    def _set_price(self, col, price, timestamp):
+        """move one asset to a new price and shift every holder's totals"""
+        old_price = self.prices[col]
+        delta = price - (0.0 if np.isnan(old_price) else old_price)
+        holders = self.quantities[:, col]
+        self.values += holders * delta
+        self.prices[col] = price
+
+        # first price of a new UTC day becomes the open
+        day = bucket_floor(timestamp, DAY_SECONDS)
+        if self.open_days[col] != day:
+            self._set_open(col, price, day)
+
+    def _set_open(self, col, open_price, day):
+        old_open = self.open_prices[col]
+        delta = open_price - (0.0 if np.isnan(old_open) else old_open)
+        self.open_values += self.quantities[:, col] * delta
+        self.open_prices[col] = open_price
+        self.open_days[col] = day
+
+    def _resync(self):
+        """recompute all totals with one matrix-vector product"""
+        self.values = self.quantities @ np.nan_to_num(self.prices)
+        self.open_values = self.quantities @ np.nan_to_num(self.open_prices)
+
+    # ============ LOAD / HOLDINGS ============
+    def load(self, db: Session):
+        """
+        Build the holdings matrix with one query, prices from the price cache,
+        and today's open prices from the 1d candles. Called once at startup.
+        """
+        holdings = db.execute(
+            select(Portfolio.user_id, Portfolio.asset_name, func.sum(Portfolio.quantity))
+            .group_by(Portfolio.user_id, Portfolio.asset_name)
+        ).all()
+
+        today = bucket_floor(datetime.utcnow(), DAY_SECONDS)
+        opens = db.execute(
+            select(MarketCandle.asset_name, MarketCandle.open)
+            .where(MarketCandle.resolution == "1d")
+            .where(MarketCandle.bucket_start == today)
+        ).all()
+
+        with self.lock:
+            for user_id, asset_name, quantity in holdings:
+                self.quantities[self._row(user_id), self._col(asset_name)] = quantity or 0.0
+
+            for asset_name, open_price in opens:
+                col = self._col(asset_name)
+                self.open_prices[col] = open_price
+                self.open_days[col] = today
+
+            self._resync()
+
+        print(f"Valuation engine loaded: {len(self.user_rows)} portfolios, {len(self.asset_names)} assets")
+
+    def set_holding(self, user_id: int, asset_name: str, quantity: float):
+        """a user's quantity of an asset changed (after the DB commit)"""
+        with self.lock:
+            row, col = self._row(user_id), self._col(asset_name)
+            delta = quantity - self.quantities[row, col]
+            self.quantities[row, col] = quantity
+            self.values[row] += delta * np.nan_to_num(self.prices[col])
+            self.open_values[row] += delta * np.nan_to_num(self.open_prices[col])
+
+        self._push([user_id])
+
+    # ============ TICKS ============
+    def add_ticks(self, ticks):
+        """
+        Apply saved ticks (dicts from the ingestor), then push new
+        valuations to streaming users who hold a moved asset.
+        Registered as a tick_ingestor listener.
+        """
+        with self.lock:
+            moved = set()
+            for tick in ticks:
+                col = self._col(tick["asset_name"])
+                self._set_price(col, tick["price"], tick["timestamp"])
+                moved.add(col)
+
+            self.ticks_applied += len(ticks)
+            self.batches += 1
+            if self.batches % RESYNC_EVERY == 0:
+                self._resync()
+
+            # only users with an open stream are checked
+            moved = list(moved)
+            affected = [
+                user_id for user_id in portfolio_hub.topics()
+                if user_id in self.user_rows
+                and self.quantities[self.user_rows[user_id], moved].any()
+            ]
+
+        self._push(affected)
+
+    def _push(self, user_ids):
+        for user_id in user_ids:
+            if portfolio_hub.subscriber_count(user_id):
+                portfolio_hub.publish(user_id, self.valuation(user_id))
+                self.pushed += 1
+
+    # ============ READ ============
+    def valuation(self, user_id: int) -> dict:
+        """per-position and total value of one user's portfolio"""
+        with self.lock:
+            row = self.user_rows.get(user_id)
+            if row is None:
+                cols = np.zeros(0, dtype=np.int64)
+                total, total_open = 0.0, 0.0
+            else:
+                cols = np.flatnonzero(self.quantities[row, :len(self.asset_names)])
+                total, total_open = float(self.values[row]), float(self.open_values[row])
+                quantities = self.quantities[row, cols]
+                prices = self.prices[cols]
+                open_prices = self.open_prices[cols]
+            names = [self.asset_names[col] for col in cols]
+
+        positions = []
+        if len(cols):
+            # vectorized over the user's positions
+            values = quantities * np.nan_to_num(prices)
+            changes = values - quantities * np.nan_to_num(open_prices)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                change_pcts = np.where(open_prices > 0, (prices / open_prices - 1) * 100, 0.0)
+
+            for i, asset_name in enumerate(names):
+                positions.append({
+                    "asset_name": asset_name,
+                    "quantity": float(quantities[i]),
+                    "price": None if np.isnan(prices[i]) else float(prices[i]),
+                    "open_price": None if np.isnan(open_prices[i]) else float(open_prices[i]),
+                    "value": round(float(values[i]), 2),
+                    "change": round(float(changes[i]), 2),
+                    "change_pct": round(float(np.nan_to_num(change_pcts[i])), 2)
+                })
+
+        return {
+            "positions": positions,
+            "total_value": round(total, 2),
+            "change": round(total - total_open, 2),
+            "change_pct": round((total / total_open - 1) * 100, 2) if total_open > 0 else 0.0,
+            "time": str(datetime.utcnow())
+        }
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "portfolios": len(self.user_rows),
+                "assets": len(self.asset_names),
+                "ticks_applied": self.ticks_applied,
+                "pushed": self.pushed
+            }
+
+
+# One shared engine for the whole process
+valuation_engine = ValuationEngine()
+
+
+# ============ STREAM ============
+async def stream_valuation(user_id: int):
+    """
+    Yields SSE bytes: the current valuation, then a new one every time
+    a held asset moves, until the client disconnects.
+    """
+    queue = portfolio_hub.subscribe(user_id)
+
+    try:
+        yield f"event: valuation\ndata: {json.dumps(valuation_engine.valuation(user_id))}\n\n".encode()
+
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            yield f"event: valuation\ndata: {json.dumps(message)}\n\n".encode()
+
+    finally:
+        portfolio_hub.unsubscribe(user_id, queue)
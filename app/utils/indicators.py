@@ -0,0 +1,313 @@
+"""
+indicators.py - Technical indicators over price arrays
+=======================================================
+
+What this file does:
+- Works on plain NumPy arrays (oldest first), e.g. from price_cache.series()
+- Whole-series functions: sma, ema, volatility, rsi, drawdown, zscore
+  (no Python loop per point - thousands of points take microseconds)
+- Streaming classes with the same math, updated one tick at a time in O(1):
+  RollingMean, EMA, RollingVolatility, RSI, Drawdown, ZScore
+
+Every result has the same length as the input.
+Points where the window isn't full yet are NaN.
+"""
+
+import math
+from collections import deque
+
+import numpy as np
+
+
+SECONDS_PER_YEAR = 365 * 24 * 60 * 60
+
+
+# ============ HELPERS ============
+def _window_sums(values, window):
+    """sum of every `window` consecutive values, aligned to the last one"""
+    sums = np.full(len(values), np.nan)
+    if window <= len(values):
+        cumulative = np.cumsum(np.concatenate(([0.0], values)))
+        sums[window - 1:] = cumulative[window:] - cumulative[:-window]
+    return sums
+
+
+def log_returns(prices):
+    """log(p[i] / p[i-1]), first point NaN"""
+    prices = np.asarray(prices, dtype=np.float64)
+    returns = np.full(len(prices), np.nan)
+    if len(prices) > 1:
+        returns[1:] = np.diff(np.log(prices))
+    return returns
+
+
+def annualization(timestamps):
+    """
+    sqrt(periods per year) for a series sampled like `timestamps`
+    (epoch seconds), so per-tick volatility can be read as yearly volatility.
+    """
+    if timestamps is None or len(timestamps) < 2:
+        return 1.0
+    step = float(np.median(np.diff(timestamps)))
+    return math.sqrt(SECONDS_PER_YEAR / step) if step > 0 else 1.0
+
+
+# ============ WHOLE SERIES ============
+def sma(prices, window: int):
+    """simple moving average"""
+    prices = np.asarray(prices, dtype=np.float64)
+    return _window_sums(prices, window) / window
+
+
+def rolling_std(values, window: int):
+    """rolling (population) standard deviation"""
+    values = np.asarray(values, dtype=np.float64)
+    # subtract the overall mean first, so sum of squares doesn't lose precision
+    centered = values - np.nanmean(values) if len(values) else values
+    mean = _window_sums(centered, window) / window
+    mean_of_squares = _window_sums(centered * centered, window) / window
+    return np.sqrt(np.maximum(mean_of_squares - mean * mean, 0.0))
+
+
+def ema(values, window: int = None, alpha: float = None, initial: float = None):
+    """
+    Exponential moving average: y[i] = y[i-1] + alpha * (x[i] - y[i-1]).
+    alpha defaults to 2 / (window + 1); starts from `initial` (or the first value).
+
+    Vectorized in blocks: inside a block y is a weighted cumulative sum,
+    blocks are short enough that the weights can't overflow.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if alpha is None:
+        alpha = 2.0 / (window + 1)
+    result = np.empty(len(values))
+    if len(values) == 0:
+        return result
+
+    if alpha >= 1.0:
+        result[:] = values
+        return result
+
+    decay = 1.0 - alpha
+    block = max(1, int(30 / -math.log(decay)))   # decay ** -block stays below e**30
+    powers = decay ** np.arange(1, block + 1)     # decay^1 .. decay^block
+
+    previous = values[0] if initial is None else initial
+    for start in range(0, len(values), block):
+        chunk = values[start:start + block]
+        n = len(chunk)
+        weights = powers[:n]
+        # y[i] = decay^(i+1) * previous + alpha * sum_k decay^(i-k) * x[k]
+        sums = np.cumsum(chunk / weights) * weights
+        result[start:start + n] = weights * previous + alpha * sums
+        previous = result[start + n - 1]
+
+    return result
+
+
+def volatility(prices, window: int, timestamps=None):
+    """
+    Realized volatility: rolling std of log returns.
+    With timestamps it is annualized (e.g. 0.6 = 60% a year).
+    """
+    returns = log_returns(prices)
+    result = np.full(len(returns), np.nan)
+    result[1:] = rolling_std(returns[1:], window) * annualization(timestamps)
+    return result
+
+
+def rsi(prices, window: int = 14):
+    """Relative Strength Index (Wilder smoothing), 0-100"""
+    prices = np.asarray(prices, dtype=np.float64)
+    result = np.full(len(prices), np.nan)
+    if len(prices) <= window:
+        return result
+
+    changes = np.diff(prices)
+    gains = np.maximum(changes, 0.0)
+    losses = np.maximum(-changes, 0.0)
+
+    # first average is a plain mean, then Wilder's EMA (alpha = 1 / window)
+    avg_gain = ema(gains[window:], alpha=1.0 / window, initial=gains[:window].mean())
+    avg_loss = ema(losses[window:], alpha=1.0 / window, initial=losses[:window].mean())
+    avg_gain = np.concatenate(([gains[:window].mean()], avg_gain))
+    avg_loss = np.concatenate(([losses[:window].mean()], avg_loss))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        strength = avg_gain / avg_loss
+        values = 100.0 - 100.0 / (1.0 + strength)
+    values = np.where(avg_loss == 0, np.where(avg_gain == 0, 50.0, 100.0), values)
+
+    result[window:] = values
+    return result
+
+
+def drawdown(prices):
+    """how far below its running peak the price is (0 = at the peak, -0.2 = 20% down)"""
+    prices = np.asarray(prices, dtype=np.float64)
+    if len(prices) == 0:
+        return prices
+    return prices / np.maximum.accumulate(prices) - 1.0
+
+
+def max_drawdown(prices) -> float:
+    """worst drawdown over the whole series (negative number)"""
+    return float(drawdown(prices).min()) if len(prices) else 0.0
+
+
+def zscore(prices, window: int):
+    """how many rolling standard deviations the price is from its rolling mean"""
+    prices = np.asarray(prices, dtype=np.float64)
+    deviation = rolling_std(prices, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = (prices - sma(prices, window)) / deviation
+    return np.where(deviation == 0, 0.0, scores)
+
+
+# name -> function(timestamps, prices, window), used by GET /analytics/{asset}
+INDICATORS = {
+    "sma": lambda timestamps, prices, window: sma(prices, window),
+    "ema": lambda timestamps, prices, window: ema(prices, window),
+    "volatility": lambda timestamps, prices, window: volatility(prices, window, timestamps),
+    "rsi": lambda timestamps, prices, window: rsi(prices, window),
+    "drawdown": lambda timestamps, prices, window: drawdown(prices),
+    "zscore": lambda timestamps, prices, window: zscore(prices, window),
+}
+
+
+# ============ STREAMING (O(1) PER TICK) ============
+class RollingMean:
+    """mean of the last `window` values"""
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.total = 0.0
+
+    def update(self, value: float) -> float:
+        if len(self.values) == self.window:
+            self.total -= self.values[0]
+        self.values.append(value)
+        self.total += value
+        if len(self.values) < self.window:
+            return math.nan
+        return self.total / self.window
+
+
+class RollingStd:
+    """standard deviation of the last `window` values"""
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.shift = None     # first value seen, keeps the sums small
+        self.total = 0.0
+        self.total_squares = 0.0
+
+    def update(self, value: float) -> float:
+        if self.shift is None:
+            self.shift = value
+        if len(self.values) == self.window:
+            old = self.values[0] - self.shift
+            self.total -= old
+            self.total_squares -= old * old
+        self.values.append(value)
+        centered = value - self.shift
+        self.total += centered
+        self.total_squares += centered * centered
+        if len(self.values) < self.window:
+            return math.nan
+        mean = self.total / self.window
+        return math.sqrt(max(self.total_squares / self.window - mean * mean, 0.0))
+
+
+class EMA:
+    """exponential moving average, same as ema()"""
+
+    def __init__(self, window: int = None, alpha: float = None):
+        self.alpha = alpha if alpha is not None else 2.0 / (window + 1)
+        self.value = None
+
+    def update(self, value: float) -> float:
+        if self.value is None:
+            self.value = value
+        else:
+            self.value += self.alpha * (value - self.value)
+        return self.value
+
+
+class RollingVolatility:
+    """rolling std of log returns, same as volatility() (times `scale` to annualize)"""
+
+    def __init__(self, window: int, scale: float = 1.0):
+        self.std = RollingStd(window)
+        self.scale = scale
+        self.previous = None
+
+    def update(self, price: float) -> float:
+        previous, self.previous = self.previous, price
+        if previous is None:
+            return math.nan
+        return self.std.update(math.log(price / previous)) * self.scale
+
+
+class RSI:
+    """Relative Strength Index, same as rsi()"""
+
+    def __init__(self, window: int = 14):
+        self.window = window
+        self.previous = None
+        self.seen = 0
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+
+    def update(self, price: float) -> float:
+        previous, self.previous = self.previous, price
+        if previous is None:
+            return math.nan
+
+        change = price - previous
+        gain, loss = max(change, 0.0), max(-change, 0.0)
+        self.seen += 1
+
+        if self.seen <= self.window:
+            # plain mean of the first `window` changes
+            self.avg_gain += (gain - self.avg_gain) / self.seen
+            self.avg_loss += (loss - self.avg_loss) / self.seen
+            if self.seen < self.window:
+                return math.nan
+        else:
+            self.avg_gain += (gain - self.avg_gain) / self.window
+            self.avg_loss += (loss - self.avg_loss) / self.window
+
+        if self.avg_loss == 0:
+            return 50.0 if self.avg_gain == 0 else 100.0
+        return 100.0 - 100.0 / (1.0 + self.avg_gain / self.avg_loss)
+
+
+class Drawdown:
+    """distance below the running peak, same as drawdown()"""
+
+    def __init__(self):
+        self.peak = -math.inf
+        self.worst = 0.0
+
+    def update(self, price: float) -> float:
+        self.peak = max(self.peak, price)
+        current = price / self.peak - 1.0
+        self.worst = min(self.worst, current)
+        return current
+
+
+class ZScore:
+    """rolling z-score, same as zscore()"""
+
+    def __init__(self, window: int):
+        self.mean = RollingMean(window)
+        self.std = RollingStd(window)
+
+    def update(self, price: float) -> float:
+        mean, deviation = self.mean.update(price), self.std.update(price)
+        if math.isnan(deviation):
+            return math.nan
+        return (price - mean) / deviation if deviation > 0 else 0.0
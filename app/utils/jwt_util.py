@@ -6,9 +6,17 @@ What this file does:
 - Creates JWT tokens (for login)
 - Decodes JWT tokens (to check if user is logged in)
 
-W
+Every token gets:
+- "jti": a random id, so one token can be revoked (logout)
+- "iat": when it was issued (epoch seconds with a fraction), so all of a
+  user's older tokens can be revoked
+
+Verified tokens are cached in auth/token_cache.py, so the signature is
+checked once per token instead of once per request.
 """
 
+import time
+import uuid
 from datetime import datetime, timedelta
 from jose import jwt, JWTError
 
@@ -39,8 +47,10 @@ def create_jwt_token(data: dict):
     # Step 2: Calculate expiry time (now + 60 minutes)
     expiry_time = datetime.utcnow() + timedelta(minutes=TOKEN_EXPIRY_MINUTES)
     
-    # Step 3: Add expiry to payload
+    # Step 3: Add expiry, issue time and a unique id to payload
     payload["exp"] = expiry_time
+    payload["iat"] = time.time()
+    payload["jti"] = uuid.uuid4().hex
 
     # Step 4: Generate the token string
     token = jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
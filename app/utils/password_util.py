@@ -5,28 +5,82 @@ What this file does:
 - Hashes passwords before saving (never store plain passwords!)
 - Verifies passwords when user logs in
 
-Note: In production, use bcrypt instead of SHA256
+Hashes are bcrypt ("$2b$<rounds>$<salt+hash>"): salted, and deliberately slow.
+Every +1 of PASSWORD_HASH_ROUNDS doubles the work, so the cost can follow
+the hardware. These functions are CPU-heavy - the API calls them through
+services/password_service.py, never directly on the event loop.
+
+Older accounts still have unsalted SHA-256 hex hashes. They keep working:
+verify_password accepts them, and needs_rehash says they should be replaced
+(done on the next successful login).
+
+Settings (environment variables):
+- PASSWORD_HASH_ROUNDS  bcrypt cost, 4..31 (default 12)
 """
 
 import hashlib
+import hmac
+import os
+
+import bcrypt
+
+
+# ============ SETTINGS ============
+HASH_ROUNDS = int(os.getenv("PASSWORD_HASH_ROUNDS", "12"))
+
+# bcrypt only looks at the first 72 bytes of a password
+BCRYPT_MAX_BYTES = 72
+
+
+def _secret(password: str) -> bytes:
+    return password.encode()[:BCRYPT_MAX_BYTES]
+
+
+def _is_legacy(hashed_password: str) -> bool:
+    """old unsalted SHA-256 hex digest?"""
+    return len(hashed_password) == 64 and not hashed_password.startswith("$")
+
+
+def _rounds(hashed_password: str) -> int:
+    """cost stored in a bcrypt hash: "$2b$12$..." -> 12"""
+    return int(hashed_password.split("$")[2])
 
 
 #HASH PASSWORD
-def hash_password(password: str) -> str:
- 
-    
-    # Convert password to bytes, then hash it
-    return hashlib.sha256(password.encode()).hexdigest()
+def hash_password(password: str, rounds: int = HASH_ROUNDS) -> str:
+    """
+    Input: "password123"
+    Output: "$2b$12$N9qo8uLOickgx2ZMRZoMye..."
+    """
+    return bcrypt.hashpw(_secret(password), bcrypt.gensalt(rounds)).decode()
 
 
-# VERIFY PASSWORD 
+# VERIFY PASSWORD
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Checks if a password matches the stored hash.
-    
-    Input: "password123", "ef92b778bafe..."
+
+    Input: "password123", "$2b$12$N9qo8..." (or an old "ef92b778bafe..." hash)
     Output: True or False
     """
-    
-    # Hash the plain password and compare
-    return hash_password(plain_password) == hashed_password
+
+    if _is_legacy(hashed_password):
+        legacy = hashlib.sha256(plain_password.encode()).hexdigest()
+        return hmac.compare_digest(legacy, hashed_password)
+
+    try:
+        return bcrypt.checkpw(_secret(plain_password), hashed_password.encode())
+    except ValueError:
+        # not a hash we understand
+        return False
+
+
+# NEEDS REHASH
+def needs_rehash(hashed_password: str, rounds: int = HASH_ROUNDS) -> bool:
+    """True for legacy SHA-256 hashes and bcrypt hashes with a different cost"""
+    if _is_legacy(hashed_password):
+        return True
+    try:
+        return _rounds(hashed_password) != rounds
+    except (IndexError, ValueError):
+        return True
@@ -3,40 +3,125 @@ risk_utils.py - Calculates Market Risk Level
 =============================================
 
 What this file does:
-- Looks at price changes
+- Turns prices into log returns and measures how much they move
 - Decides if it's Low, Medium, or High risk
 
 How it works:
-- Big price change = High Risk
-- Medium price change = Medium Risk
-- Small price change = Low Risk
+- Risk is based on volatility (how big the % moves are, per year),
+  not on dollar amounts - so a $100 asset and a $40,000 asset are
+  judged the same way
+- Value at Risk (VaR): the loss that is only exceeded in the worst 5% of moves
+- CVaR: the average loss in those worst 5% of moves
+- Both are computed two ways: from the actual returns (historical)
+  and from a normal distribution with the same mean/std (parametric)
+
+Every function works on a returns MATRIX (one column per asset),
+so many assets are measured with the same few NumPy calls.
 """
 
+from statistics import NormalDist
+
+import numpy as np
+
+from .indicators import annualization
+
+
+# ============ SETTINGS ============
+# Annualized volatility thresholds for the risk label
+LOW_VOLATILITY = 0.30    # below 30% a year = Low Risk
+HIGH_VOLATILITY = 0.75   # above 75% a year = High Risk
+
+DEFAULT_CONFIDENCE = 0.95
+
+
+# ============ LABEL ============
+def risk_label(annual_volatility: float) -> str:
+    """Low / Medium / High risk for an annualized volatility"""
+    percent = f"{annual_volatility * 100:.0f}%"
+    if annual_volatility > HIGH_VOLATILITY:
+        return f"High Risk (annualized volatility {percent})"
+    elif annual_volatility > LOW_VOLATILITY:
+        return f"Medium Risk (annualized volatility {percent})"
+    else:
+        return f"Low Risk (annualized volatility {percent})"
+
+
+# ============ METRICS ============
+def risk_metrics(returns, confidence: float = DEFAULT_CONFIDENCE) -> dict:
+    """
+    Risk of every column of a returns matrix (rows = time, columns = assets).
+    Losses are positive fractions: var 0.02 = "lose 2% or more in 5% of steps".
+    Returns a dict of arrays, one value per column.
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    if returns.ndim == 1:
+        returns = returns[:, None]
+
+    mean = returns.mean(axis=0)
+    std = returns.std(axis=0, ddof=1) if len(returns) > 1 else np.zeros(returns.shape[1])
+
+    # Historical: the worst (1 - confidence) share of the actual returns
+    cutoff = np.quantile(returns, 1 - confidence, axis=0)
+    tail = returns <= cutoff
+    tail_mean = (returns * tail).sum(axis=0) / np.maximum(tail.sum(axis=0), 1)
+
+    # Parametric: same thing for a normal distribution with this mean and std
+    z = NormalDist().inv_cdf(confidence)
+    tail_density = NormalDist().pdf(z) / (1 - confidence)
+
+    return {
+        "volatility": std,
+        "var_historical": -cutoff,
+        "cvar_historical": -tail_mean,
+        "var_parametric": z * std - mean,
+        "cvar_parametric": tail_density * std - mean,
+    }
+
+
+def portfolio_metrics(returns, weights, confidence: float = DEFAULT_CONFIDENCE) -> dict:
+    """
+    Risk of a weighted portfolio of the columns.
+    Historical numbers use the portfolio's own return series,
+    parametric ones the covariance matrix: std = sqrt(w' C w).
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+
+    portfolio_returns = returns @ weights
+    metrics = {name: float(values[0]) for name, values in risk_metrics(portfolio_returns, confidence).items()}
+
+    if returns.shape[1] > 1 and len(returns) > 1:
+        covariance = np.cov(returns, rowvar=False)
+        std = float(np.sqrt(max(weights @ covariance @ weights, 0.0)))
+        mean = float(portfolio_returns.mean())
+        z = NormalDist().inv_cdf(confidence)
+        metrics["volatility"] = std
+        metrics["var_parametric"] = z * std - mean
+        metrics["cvar_parametric"] = NormalDist().pdf(z) / (1 - confidence) * std - mean
+
+    return metrics
+
 
 # ============ CALCULATE RISK ============
 def calculate_risk(prices):
     """
     Calculates risk level based on price movement.
-    
-    Input: list of price objects from database
-    Output: "Low Risk", "Medium Risk", or "High Risk"
+
+    Input: list of price objects from database (newest first)
+    Output: "Low Risk (...)", "Medium Risk (...)", or "High Risk (...)"
     """
-    
-    # Step 1: Need at least 2 prices to compare
-    if len(prices) < 2:
+
+    # Step 1: Need at least 3 prices (2 returns) to measure movement
+    if len(prices) < 3:
         return "Low Risk (Not enough data)"
-    
-    # Step 2: Get the newest and oldest prices
-    latest_price = prices[0].price    # First = newest
-    oldest_price = prices[-1].price   # Last = oldest
-
-    # Step 3: Calculate how much price changed
-    difference = abs(latest_price - oldest_price)
-
-    # Step 4: Decide risk level based on difference
-    if difference > 500:
-        return "High Risk (Large price movement)"
-    elif difference > 200:
-        return "Medium Risk (Moderate movement)"
-    else:
-        return "Low Risk (Stable price)"
+
+    # Step 2: Oldest first, as arrays
+    values = np.array([price.price for price in reversed(prices)], dtype=np.float64)
+    timestamps = np.array([price.timestamp.timestamp() for price in reversed(prices)])
+
+    # Step 3: Volatility of log returns, scaled to a year
+    returns = np.diff(np.log(values))
+    annual_volatility = float(returns.std(ddof=1)) * annualization(timestamps)
+
+    # Step 4: Decide risk level based on volatility
+    return risk_label(annual_volatility)
@@ -0,0 +1,88 @@
+"""
+bench_login.py - How many logins per second can this machine handle?
+=====================================================================
+
+For every bcrypt cost it runs a burst of password checks through the same
+pool the API uses (app/services/password_service.py) and prints:
+- ms per hash        one check on one thread
+- logins/s           throughput of the whole pool
+- loop lag p99/max   how late a 10 ms timer fired on the event loop during
+                     the burst - this is what the market endpoints would feel
+
+Pick the highest cost whose logins/s still covers the expected login burst.
+
+Usage:
+    python bench_login.py                       # costs 8, 10, 12
+    python bench_login.py --rounds 10 12 14 --workers 2 --logins 64
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from app.services.password_service import PasswordService, WORKERS
+from app.utils.password_util import hash_password
+
+
+PASSWORD = "correct horse battery staple"
+
+
+async def measure_lag(stop: asyncio.Event, lags: list):
+    """a 10 ms timer, recording how late each tick fires"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append(time.perf_counter() - started - 0.01)
+
+
+async def run_burst(rounds: int, workers: int, logins: int) -> dict:
+    service = PasswordService(workers=workers, max_pending=logins, rounds=rounds)
+    stored = hash_password(PASSWORD, rounds)
+
+    # single-thread cost first
+    started = time.perf_counter()
+    await service.verify(PASSWORD, stored)
+    single = time.perf_counter() - started
+
+    # then everyone at once
+    stop, lags = asyncio.Event(), []
+    lag_task = asyncio.create_task(measure_lag(stop, lags))
+    started = time.perf_counter()
+    results = await asyncio.gather(*(service.verify(PASSWORD, stored) for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await lag_task
+    service.shutdown()
+
+    assert all(matches for matches, _ in results)
+    lags.sort()
+    return {
+        "rounds": rounds,
+        "ms_per_hash": single * 1000,
+        "logins_per_s": logins / elapsed,
+        "lag_p99_ms": lags[min(len(lags) - 1, int(len(lags) * 0.99))] * 1000 if lags else 0.0,
+        "lag_max_ms": lags[-1] * 1000 if lags else 0.0
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="bcrypt login throughput per cost setting")
+    parser.add_argument("--rounds", type=int, nargs="+", default=[8, 10, 12])
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--logins", type=int, default=32)
+    args = parser.parse_args()
+
+    print(f"CPUs: {os.cpu_count()}, hashing workers: {args.workers}, burst: {args.logins} logins\n")
+    print(f"{'cost':>4}  {'ms/hash':>8}  {'logins/s':>9}  {'lag p99 ms':>10}  {'lag max ms':>10}")
+
+    for rounds in args.rounds:
+        result = await run_burst(rounds, args.workers, args.logins)
+        print(
+            f"{result['rounds']:>4}  {result['ms_per_hash']:>8.1f}  {result['logins_per_s']:>9.1f}"
+            f"  {result['lag_p99_ms']:>10.2f}  {result['lag_max_ms']:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,9 +1,105 @@
-"""Fix the users table - make hashed_password nullable"""
+"""
+fix_db.py - One-off fixes for databases created by older versions
+==================================================================
+
+Run with the server stopped:
+    python fix_db.py
+
+Every fix checks the catalog first and does nothing if it was already
+applied, so running the script again is safe.
+"""
+
 from sqlalchemy import text
-from app.database import engine
 
-# Run ALTER TABLE to make hashed_password nullable
-with engine.connect() as conn:
+from app.database import engine, SessionLocal
+from app.services.partition_service import convert_to_partitioned, is_partitioned
+
+
+def make_password_nullable(conn):
+    """users - make hashed_password nullable"""
+    nullable = conn.execute(text("""
+        SELECT is_nullable FROM information_schema.columns
+        WHERE table_name = 'users' AND column_name = 'hashed_password'
+    """)).scalar()
+    if nullable != "NO":
+        print("Skipped: hashed_password is already nullable.")
+        return
+
     conn.execute(text("ALTER TABLE users ALTER COLUMN hashed_password DROP NOT NULL;"))
     conn.commit()
     print("Fixed! hashed_password is now nullable.")
+
+
+def dedupe_portfolio(conn):
+    """portfolio - one row per (user_id, asset_name)"""
+    indexed = conn.execute(text(
+        "SELECT 1 FROM pg_indexes WHERE tablename = 'portfolio' AND indexname = 'uq_portfolio_user_asset'"
+    )).first()
+    if indexed is not None:
+        print("Skipped: portfolio already has one row per user and asset.")
+        return
+
+    # Merge duplicate rows into the oldest one, then add the unique index
+    # that POST /portfolio/add and /portfolio/batch upsert against
+    conn.execute(text("""
+        UPDATE portfolio p
+        SET quantity = d.total
+        FROM (
+            SELECT MIN(id) AS keep_id, SUM(quantity) AS total
+            FROM portfolio
+            GROUP BY user_id, asset_name
+            HAVING COUNT(*) > 1
+        ) d
+        WHERE p.id = d.keep_id;
+    """))
+    conn.execute(text("""
+        DELETE FROM portfolio p
+        USING portfolio keep
+        WHERE p.user_id = keep.user_id
+          AND p.asset_name = keep.asset_name
+          AND p.id > keep.id;
+    """))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_portfolio_user_asset ON portfolio (user_id, asset_name);"
+    ))
+    conn.commit()
+    print("Fixed! portfolio has one row per user and asset.")
+
+
+def add_alert_armed(conn):
+    """alerts - armed flag (fired alerts wait to re-arm, see services/alert_engine.py)"""
+    exists = conn.execute(text("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'alerts' AND column_name = 'armed'
+    """)).first()
+    if exists is not None:
+        print("Skipped: alerts already have the armed column.")
+        return
+
+    conn.execute(text("ALTER TABLE alerts ADD COLUMN armed BOOLEAN NOT NULL DEFAULT TRUE;"))
+    conn.commit()
+    print("Fixed! alerts have an armed column.")
+
+
+def partition_market_prices():
+    """market_prices - partition by time (see services/partition_service.py)"""
+    db = SessionLocal()
+    try:
+        if is_partitioned(db):
+            print("Skipped: market_prices is already partitioned.")
+            return
+
+        # Copy the plain table into a partitioned one (ticks written
+        # during the copy would be lost)
+        copied = convert_to_partitioned(db)
+        print(f"Fixed! market_prices is partitioned by time ({copied} rows copied).")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    with engine.connect() as conn:
+        make_password_nullable(conn)
+        dedupe_portfolio(conn)
+        add_alert_armed(conn)
+    partition_market_prices()
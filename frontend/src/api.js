@@ -84,6 +84,10 @@ export async function addToPortfolio(assetName, quantity) {
   })
 }
 
+export async function getPortfolioValuation() {
+  return request('/portfolio/valuation')
+}
+
 // === MARKET APIs ===
 
 export async function getLatestPrices(assetName) {
@@ -118,3 +122,45 @@ export function connectToMarketStream(assetName, onMessage) {
   // return the socket so caller can close it later
   return ws
 }
+
+export function connectToMarketFeed(assetNames, onTicks) {
+  // one socket for many assets: subscribe once, get one message per tick cycle
+  // ({"type": "ticks", "ticks": [{asset, price, time (epoch ms)}, ...]})
+  const ws = new WebSocket('ws://localhost:8000/ws/market')
+
+  ws.onopen = () => {
+    ws.send(JSON.stringify({ action: 'subscribe', assets: assetNames }))
+  }
+
+  ws.onmessage = (event) => {
+    const data = JSON.parse(event.data)
+    if (data.type === 'ticks') {
+      onTicks(data.ticks)
+    }
+  }
+
+  ws.onerror = (error) => {
+    console.log('WebSocket error:', error)
+  }
+
+  // return the socket so caller can close it (or send more subscribe/unsubscribe)
+  return ws
+}
+
+export function connectToAlertStream(onAlert) {
+  // server-sent events for my triggered alerts
+  // (EventSource can't send headers, so the token goes in the URL;
+  //  on reconnect the browser sends Last-Event-ID and missed alerts are replayed)
+  const source = new EventSource(`${API_URL}/alerts/stream?token=${getToken()}`)
+
+  source.addEventListener('alert', (event) => {
+    onAlert(JSON.parse(event.data))
+  })
+
+  source.onerror = (error) => {
+    console.log('Alert stream error:', error)
+  }
+
+  // return the source so caller can close it later
+  return source
+}
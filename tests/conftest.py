@@ -0,0 +1,13 @@
+"""
+Shared test setup.
+
+The services read their backends from the environment when they are
+imported, so pick the in-process ones before any test imports app code:
+no Gemini key, no Postgres LISTEN/NOTIFY, no advisory lock.
+"""
+
+import os
+
+os.environ.setdefault("LLM_BACKEND", "local")
+os.environ.setdefault("BROADCAST_BACKEND", "memory")
+os.environ.setdefault("JOBS_LEADER_ELECTION", "local")
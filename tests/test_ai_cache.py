@@ -0,0 +1,78 @@
+"""ai_cache.py - single-flight and stale-while-revalidate, with the local model"""
+
+import asyncio
+
+import pytest
+
+from app.services.ai_cache import AICache
+from app.services.llm_provider import LLMClient, LocalProvider
+
+
+def summarizer(client, asset_name, window):
+    async def compute():
+        text = await client.generate(f"Asset: {asset_name}\nWindow: {window}")
+        return {"summary": text, "source": "local"}
+    return compute
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_call():
+    cache = AICache(ttl=60, stale_ttl=600)
+    client = LLMClient(LocalProvider(delay=0.05), rate_per_minute=0)
+
+    results = await asyncio.gather(*[
+        cache.get("BTC", "w1", summarizer(client, "BTC", "w1")) for _ in range(10)
+    ])
+
+    assert client.calls == 1
+    assert {status for _, status in results} == {"miss"}
+    assert len({result["summary"] for result, _ in results}) == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["coalesced"] == 9
+    assert cache.inflight == {}
+
+    # same window again: served from memory
+    result, status = await cache.get("BTC", "w1", summarizer(client, "BTC", "w1"))
+    assert status == "hit"
+    assert client.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_answer_served_while_refreshing():
+    cache = AICache(ttl=0, stale_ttl=600)   # every answer is stale right away
+    client = LLMClient(LocalProvider(delay=0.05), rate_per_minute=0)
+
+    first, status = await cache.get("ETH", "w1", summarizer(client, "ETH", "w1"))
+    assert status == "miss"
+
+    # new price window: old answer now, one refresh in the background
+    stale, status = await cache.get("ETH", "w2", summarizer(client, "ETH", "w2"))
+    again, again_status = await cache.get("ETH", "w2", summarizer(client, "ETH", "w2"))
+    assert (status, again_status) == ("stale", "stale")
+    assert stale == again == first
+    assert len(cache.inflight) == 1
+
+    await cache.inflight["ETH"]
+    assert client.calls == 2
+    fresh, status = await cache.get("ETH", "w2", summarizer(client, "ETH", "w2"))
+    assert status == "hit"
+    assert fresh != first
+
+
+@pytest.mark.asyncio
+async def test_error_keeps_the_good_answer():
+    cache = AICache(ttl=0, stale_ttl=600)
+
+    async def good():
+        return {"summary": "ok", "source": "local"}
+
+    async def failing():
+        return {"summary": "busy", "source": "rate_limited"}
+
+    await cache.get("SOL", "w1", good)
+    result, status = await cache.get("SOL", "w2", failing)
+    assert (result["summary"], status) == ("ok", "stale")
+
+    await asyncio.sleep(0)   # let the background refresh finish
+    result, status = await cache.get("SOL", "w2", failing)
+    assert (result["summary"], status) == ("ok", "hit")
@@ -0,0 +1,135 @@
+"""alert_engine.py - bisect index checked against a brute-force oracle"""
+
+import random
+from datetime import datetime
+
+from app.models.alert_model import Alert
+from app.services.alert_engine import AlertEngine, SortedTargets, rearm_price
+
+
+def crosses(condition, target, old_price, new_price):
+    """the crossing rules from the module docstring, one alert at a time"""
+    if condition == "above":
+        if old_price is None:
+            return new_price > target
+        return old_price <= target < new_price
+    if old_price is None:
+        return new_price < target
+    return new_price < target <= old_price
+
+
+class Oracle:
+    """checks every alert on every tick"""
+
+    def __init__(self, alerts):
+        self.alerts = {alert.id: alert for alert in alerts}
+        self.armed = {alert.id: True for alert in alerts}
+        self.last_price = None
+
+    def tick(self, price):
+        fired, rearmed = set(), set()
+        for alert_id, alert in self.alerts.items():
+            if self.armed[alert_id]:
+                if crosses(alert.condition, alert.target_price, self.last_price, price):
+                    fired.add(alert_id)
+            else:
+                opposite = "below" if alert.condition == "above" else "above"
+                waiting_at = rearm_price(alert.condition, alert.target_price)
+                if crosses(opposite, waiting_at, self.last_price, price):
+                    rearmed.add(alert_id)
+
+        for alert_id in fired:
+            self.armed[alert_id] = False
+        for alert_id in rearmed:
+            self.armed[alert_id] = True
+        self.last_price = price
+        return fired, rearmed
+
+
+def make_alerts(rng, count, grid):
+    return [
+        Alert(
+            id=alert_id, user_id=alert_id % 7, asset_name="BTC",
+            condition=rng.choice(["above", "below"]), target_price=rng.choice(grid)
+        )
+        for alert_id in range(1, count + 1)
+    ]
+
+
+def test_sorted_targets_match_brute_force():
+    rng = random.Random(1)
+    grid = [float(price) for price in range(90, 111)]
+    alerts = make_alerts(rng, 200, grid)
+
+    targets = SortedTargets()
+    for alert in alerts:
+        targets.add(alert.id, alert.condition, alert.target_price)
+
+    old_price = None
+    for _ in range(500):
+        new_price = rng.choice(grid)   # same grid as the targets: equal prices happen
+        expected = {
+            alert.id for alert in alerts
+            if crosses(alert.condition, alert.target_price, old_price, new_price)
+        }
+        assert set(targets.crossed(old_price, new_price)) == expected
+        old_price = new_price
+
+
+def test_sorted_targets_remove():
+    targets = SortedTargets()
+    for alert_id in (1, 2, 3):
+        targets.add(alert_id, "above", 100.0)
+    targets.remove(2, "above", 100.0)
+    assert sorted(targets.crossed(99.0, 101.0)) == [1, 3]
+
+
+def test_engine_fires_and_rearms_like_oracle():
+    rng = random.Random(2)
+    grid = [100.0 + step * 0.25 for step in range(-40, 41)]
+    alerts = make_alerts(rng, 300, grid)
+
+    engine = AlertEngine()
+    for alert in alerts:
+        assert engine.add_alert(alert) is False   # no price yet
+    oracle = Oracle(alerts)
+
+    for _ in range(1000):
+        price = rng.choice(grid)
+        triggers, rearmed = engine.evaluate([
+            {"asset_name": "BTC", "price": price, "timestamp": datetime.utcnow()}
+        ])
+        fired, expected_rearmed = oracle.tick(price)
+
+        assert {trigger["alert_id"] for trigger in triggers} == fired
+        assert set(rearmed) == expected_rearmed
+        for trigger in triggers:
+            assert trigger["price"] == price
+
+    assert engine.stats()["triggered"] > 0
+    assert engine.stats()["rearmed"] > 0
+
+
+def test_hovering_price_fires_once():
+    engine = AlertEngine()
+    engine.add_alert(Alert(id=1, user_id=1, asset_name="ETH", condition="above", target_price=100.0))
+
+    prices = [99.9, 100.1, 99.95, 100.05, 99.9, 100.2]   # never back below 99.5
+    fired = []
+    for price in prices:
+        triggers, _ = engine.evaluate([{"asset_name": "ETH", "price": price, "timestamp": datetime.utcnow()}])
+        fired += triggers
+
+    assert len(fired) == 1
+
+
+def test_observe_moves_state_without_counting():
+    engine = AlertEngine()
+    engine.add_alert(Alert(id=1, user_id=1, asset_name="ETH", condition="below", target_price=50.0))
+
+    engine.observe([{"asset_name": "ETH", "price": 49.0, "timestamp": datetime.utcnow()}])
+    assert engine.stats()["triggered"] == 0
+
+    # disarmed by the observed tick, so it doesn't fire here again
+    triggers, _ = engine.evaluate([{"asset_name": "ETH", "price": 48.0, "timestamp": datetime.utcnow()}])
+    assert triggers == []
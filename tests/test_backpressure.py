@@ -0,0 +1,95 @@
+"""backpressure.py / hub.LatestValues - conflation and slow-consumer checks"""
+
+import asyncio
+
+import pytest
+
+from app.services import backpressure
+from app.services.backpressure import ClientStream, SlowConsumer
+from app.services.hub import LatestValues
+
+
+class FakeWebSocket:
+    """records frames; `during_send` runs while a frame is "on the wire" """
+
+    def __init__(self, delay: float = 0.0, during_send=None):
+        self.delay = delay
+        self.during_send = during_send
+        self.frames = []
+
+    async def send_text(self, frame):
+        if self.during_send is not None:
+            self.during_send()
+        await asyncio.sleep(self.delay)
+        self.frames.append(frame)
+
+    send_bytes = send_text
+
+
+def tick(asset, price):
+    return {"asset": asset, "price": price}
+
+
+@pytest.mark.asyncio
+async def test_mailbox_keeps_newest_per_asset():
+    mailbox = LatestValues(key=lambda message: message["asset"])
+    for price in range(100):
+        mailbox.put_nowait(tick("BTC", price))
+    mailbox.put_nowait([tick("ETH", 1), tick("ETH", 2)])
+
+    assert mailbox.qsize() == 2
+    assert await mailbox.get() == [tick("BTC", 99), tick("ETH", 2)]
+    assert mailbox.received == 102
+    assert mailbox.conflated == 100
+    assert mailbox.age() == 0.0
+
+
+@pytest.mark.asyncio
+async def test_fast_client_survives_a_burst():
+    mailbox = LatestValues(key=lambda message: message["asset"])
+
+    # one ingestor flush at 1000 ticks/s: ~100 ticks of one asset at once
+    def burst():
+        for price in range(100):
+            mailbox.put_nowait(tick("BTC", price))
+
+    stream = ClientStream(FakeWebSocket(during_send=burst), mailbox)
+    for _ in range(20):
+        await stream.send("frame")
+        assert await stream.next() == [tick("BTC", 99)]
+
+    assert len(stream.websocket.frames) == 20
+
+
+@pytest.mark.asyncio
+async def test_lagging_client_is_disconnected(monkeypatch):
+    monkeypatch.setattr(backpressure, "MAX_LAG", 0.05)
+    mailbox = LatestValues(key=lambda message: message["asset"])
+    stream = ClientStream(FakeWebSocket(delay=0.1, during_send=lambda: mailbox.put_nowait(tick("BTC", 1))), mailbox)
+
+    with pytest.raises(SlowConsumer):
+        await stream.send("frame")
+
+
+@pytest.mark.asyncio
+async def test_send_timeout_disconnects(monkeypatch):
+    monkeypatch.setattr(backpressure, "SEND_TIMEOUT", 0.01)
+    mailbox = LatestValues(key=lambda message: message["asset"])
+    stream = ClientStream(FakeWebSocket(delay=1.0), mailbox)
+
+    with pytest.raises(SlowConsumer):
+        await stream.send("frame")
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_conflates():
+    mailbox = LatestValues(key=lambda message: message["asset"])
+    stream = ClientStream(FakeWebSocket(), mailbox, max_rate=20)   # one frame per 50 ms
+
+    await stream.send("first")
+    started = asyncio.get_running_loop().time()
+    for price in range(10):
+        mailbox.put_nowait(tick("BTC", price))
+
+    assert await stream.next() == [tick("BTC", 9)]
+    assert asyncio.get_running_loop().time() - started >= 0.03
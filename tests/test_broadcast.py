@@ -0,0 +1,121 @@
+"""broadcast.py - two workers talking through the memory backend"""
+
+import asyncio
+import json
+import threading
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+
+from app.services import broadcast as module
+from app.services.broadcast import Broadcast, MemoryBackend
+
+
+async def wait_for(event: threading.Event, timeout: float = 2.0):
+    assert await asyncio.to_thread(event.wait, timeout)
+
+
+@pytest_asyncio.fixture
+async def workers():
+    a = Broadcast(MemoryBackend(bus="test"), worker_id="a")
+    b = Broadcast(MemoryBackend(bus="test"), worker_id="b")
+    await a.start()
+    await b.start()
+    yield a, b
+    await a.stop()
+    await b.stop()
+
+
+@pytest.mark.asyncio
+async def test_message_reaches_other_worker_only(workers):
+    a, b = workers
+    got = {"a": [], "b": []}
+    done = threading.Event()
+    a.on("alert", lambda data: got["a"].append(data))
+    b.on("alert", lambda data: (got["b"].append(data), done.set()))
+
+    a.publish("alert", {"id": 7, "asset_name": "BTC"})
+    await wait_for(done)
+
+    assert got == {"a": [], "b": [{"id": 7, "asset_name": "BTC"}]}
+    assert a.stats()["sent"] == 1
+    assert b.stats()["received"] == 1
+
+
+@pytest.mark.asyncio
+async def test_ticks_round_trip(workers):
+    a, b = workers
+    received = []
+    done = threading.Event()
+
+    def listener(ticks):
+        received.extend(ticks)
+        if len(received) == 3:
+            done.set()
+
+    b.add_tick_listener(listener)
+    ticks = [
+        {"id": i, "asset_name": "ETH", "price": 2500.0 + i, "timestamp": datetime(2024, 1, 2, 12, 0, i)}
+        for i in range(3)
+    ]
+
+    a.publish_ticks(ticks)
+    await wait_for(done)
+
+    assert received == ticks
+
+
+def test_tick_chunks_fit_in_one_notify(monkeypatch):
+    sender = Broadcast(MemoryBackend(bus="chunks"), worker_id="sender")
+    chunks = []
+    monkeypatch.setattr(sender, "publish", lambda message_type, data: chunks.append(data))
+
+    ticks = [
+        {"id": i, "asset_name": f"VERY_LONG_ASSET_NAME_{i:06d}" * 3, "price": 1.0 / (i + 3),
+         "timestamp": datetime(2024, 1, 2, 12, 0, 0, i)}
+        for i in range(2000)
+    ]
+    sender.publish_ticks(ticks)
+
+    assert len(chunks) > 1
+    assert sum(len(chunk) for chunk in chunks) == len(ticks)
+    for chunk in chunks:
+        envelope = {"type": "ticks", "origin": "x" * 12, "sent_at": 1e9 + 0.123456, "data": chunk}
+        assert len(json.dumps(envelope).encode()) <= module.MAX_BYTES
+
+
+@pytest.mark.asyncio
+async def test_oversized_message_is_dropped(workers):
+    a, b = workers
+    a.publish("alert", {"blob": "x" * module.MAX_BYTES})
+    await asyncio.sleep(0.05)
+
+    assert a.stats()["oversized"] == 1
+    assert b.stats()["received"] == 0
+
+
+@pytest.mark.asyncio
+async def test_many_alert_events_arrive_in_chunks(workers):
+    a, b = workers
+    received = []
+    done = threading.Event()
+
+    def handler(messages):
+        received.extend(messages)
+        if len(received) == 500:
+            done.set()
+
+    b.on("alert_events", handler)
+    messages = [
+        [i % 9, {"id": i, "alert_id": i, "asset": "BTC", "condition": "above",
+                 "target_price": 42000.5, "price": 42001.25, "time": "2024-01-02 12:00:00.123456"}]
+        for i in range(500)
+    ]
+
+    a.publish_chunked("alert_events", messages)
+    await wait_for(done)
+
+    assert received == messages
+    assert a.stats()["sent"] > 1
+    assert a.stats()["oversized"] == 0
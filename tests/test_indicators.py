@@ -0,0 +1,63 @@
+"""indicators.py - streaming classes give the same numbers as the whole-series functions"""
+
+import numpy as np
+import pytest
+
+from app.utils import indicators
+
+
+@pytest.fixture
+def prices():
+    rng = np.random.default_rng(3)
+    return 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 2000)))
+
+
+def stream(indicator, prices):
+    return np.array([indicator.update(float(price)) for price in prices])
+
+
+def assert_same(streamed, batch):
+    np.testing.assert_allclose(streamed, batch, rtol=1e-7, atol=1e-9, equal_nan=True)
+
+
+@pytest.mark.parametrize("window", [1, 5, 50])
+def test_rolling_mean(prices, window):
+    assert_same(stream(indicators.RollingMean(window), prices), indicators.sma(prices, window))
+
+
+@pytest.mark.parametrize("window", [3, 20, 200])
+def test_ema(prices, window):
+    assert_same(stream(indicators.EMA(window), prices), indicators.ema(prices, window))
+
+
+@pytest.mark.parametrize("window", [5, 30])
+def test_volatility(prices, window):
+    assert_same(stream(indicators.RollingVolatility(window), prices), indicators.volatility(prices, window))
+
+
+@pytest.mark.parametrize("window", [2, 14])
+def test_rsi(prices, window):
+    assert_same(stream(indicators.RSI(window), prices), indicators.rsi(prices, window))
+
+
+def test_drawdown(prices):
+    streaming = indicators.Drawdown()
+    assert_same(stream(streaming, prices), indicators.drawdown(prices))
+    assert streaming.worst == pytest.approx(indicators.max_drawdown(prices))
+
+
+@pytest.mark.parametrize("window", [5, 40])
+def test_zscore(prices, window):
+    assert_same(stream(indicators.ZScore(window), prices), indicators.zscore(prices, window))
+
+
+def test_flat_prices():
+    flat = np.full(30, 42.0)
+    assert_same(stream(indicators.ZScore(10), flat), indicators.zscore(flat, 10))
+    assert_same(stream(indicators.RSI(14), flat), indicators.rsi(flat, 14))
+
+
+def test_short_series_is_nan():
+    short = np.array([1.0, 2.0, 3.0])
+    assert np.isnan(indicators.sma(short, 5)).all()
+    assert np.isnan(indicators.rsi(short, 14)).all()
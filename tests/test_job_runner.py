@@ -0,0 +1,100 @@
+"""job_runner.py - jobs start with the leader lock and stop in reverse order"""
+
+import asyncio
+
+import pytest
+
+from app.services.job_runner import Job, JobRunner, LocalLock, TaskJob, ThreadJob
+
+
+class FlakyLock(LocalLock):
+    """a lock whose connection can be made to drop"""
+
+    def __init__(self):
+        self.held = True
+
+    async def still_held(self) -> bool:
+        return self.held
+
+
+def make_jobs(events):
+    def generator(stop_event):
+        events.append("thread started")
+        stop_event.wait()
+        events.append("thread stopped")
+
+    state = {"running": False}
+
+    def start_digests():
+        state["running"] = True
+        events.append("task started")
+
+    async def stop_digests():
+        state["running"] = False
+        events.append("task stopped")
+
+    return [
+        ThreadJob("generator", generator),
+        TaskJob("digests", start_digests, stop_digests, lambda: state["running"]),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_local_lock_runs_and_stops_jobs():
+    events = []
+    runner = JobRunner(LocalLock(), check_interval=0.01)
+    for job in make_jobs(events):
+        runner.add(job)
+
+    await runner.start()
+    await asyncio.sleep(0.05)
+    status = runner.status()
+    assert status["leader"] is True
+    assert status["election"] == "LocalLock"
+    assert [job["running"] for job in status["jobs"]] == [True, True]
+
+    await runner.stop()
+    assert runner.leader is False
+    assert [job.running() for job in runner.jobs] == [False, False]
+    assert events == ["thread started", "task started", "task stopped", "thread stopped"]
+
+
+@pytest.mark.asyncio
+async def test_lost_lock_stops_jobs():
+    events = []
+    lock = FlakyLock()
+    runner = JobRunner(lock, check_interval=0.01)
+    for job in make_jobs(events):
+        runner.add(job)
+
+    await runner.start()
+    lock.held = False
+    await runner.check()
+
+    assert runner.leader is False
+    assert [job.running() for job in runner.jobs] == [False, False]
+
+    # the lock comes back on the next check
+    lock.held = True
+    await runner.check()
+    assert runner.leader is True
+    assert runner.elections_won == 2
+    await runner.stop()
+
+
+@pytest.mark.asyncio
+async def test_no_lock_runs_nothing():
+    runner = JobRunner(None)
+    runner.add(TaskJob("digests", lambda: None, lambda: None, lambda: True))
+    await runner.start()
+    assert runner.leader is False
+    await runner.stop()
+
+
+def test_job_without_hooks_cannot_be_created():
+    class Incomplete(Job):
+        async def start(self):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete("incomplete")
@@ -0,0 +1,102 @@
+"""market_feed.py - JSON and msgpack delta frames decode to the prices sent"""
+
+import json
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.hub import market_hub
+from app.services.market_feed import JsonEncoder, MarketFeed, MsgpackEncoder, build_update, epoch_ms
+
+msgpack = pytest.importorskip("msgpack")
+
+
+class Client:
+    """what a msgpack client does with the frames"""
+
+    def __init__(self, subscribed: dict):
+        self.names = {asset_id: asset for asset, asset_id in subscribed["assets"].items()}
+        self.scale = 10 ** subscribed["decimals"]
+        self.values = {}
+
+    def read(self, frame: bytes):
+        kind, base, flat = msgpack.unpackb(frame)
+        assert kind == "t"
+        ticks = []
+        for i in range(0, len(flat), 3):
+            asset_id, dt_ms, delta = flat[i:i + 3]
+            self.values[asset_id] = self.values.get(asset_id, 0) + delta
+            ticks.append((self.names[asset_id], base + dt_ms, self.values[asset_id] / self.scale))
+        return ticks
+
+
+def test_msgpack_deltas_rebuild_prices():
+    rng = random.Random(10)
+    encoder = MsgpackEncoder(decimals=4)
+    client = Client(encoder.subscribed(["BTC", "ETH"]))
+    prices = {"BTC": 42000.0, "ETH": 2500.0}
+    start = 1_700_000_000_000
+
+    for frame_number in range(50):
+        updates, expected = [], []
+        for asset in prices:
+            times, values = [], []
+            for i in range(rng.randint(1, 5)):
+                prices[asset] *= 1 + rng.gauss(0, 0.001)
+                times.append(start + frame_number * 100 + i * 10)
+                values.append(prices[asset])
+            updates.append(build_update(asset, times, values))
+            expected += [(asset, time, round(value, 4)) for time, value in zip(times, values)]
+
+        received = client.read(encoder.ticks(updates))
+        assert [(asset, time) for asset, time, _ in received] == [(asset, time) for asset, time, _ in expected]
+        for (_, _, got), (_, _, want) in zip(received, expected):
+            assert got == pytest.approx(want, abs=1e-9)
+
+
+def test_first_price_after_resubscribe_is_full():
+    encoder = MsgpackEncoder(decimals=2)
+    subscribed = encoder.subscribed(["BTC"])
+    encoder.ticks([build_update("BTC", [1000], [10.0])])
+
+    encoder.forget("BTC")
+    _, _, flat = msgpack.unpackb(encoder.ticks([build_update("BTC", [2000], [11.0])]))
+    assert flat == [subscribed["assets"]["BTC"], 0, 1100]
+
+
+def test_ids_are_stable_per_socket():
+    encoder = MsgpackEncoder()
+    first = encoder.subscribed(["BTC", "ETH"])["assets"]
+    again = encoder.subscribed(["SOL", "BTC"])["assets"]
+    assert again == {"SOL": 2, "BTC": first["BTC"]}
+
+
+def test_json_frame():
+    frame = JsonEncoder().ticks([
+        build_update("BTC", [1000, 1010], [1.5, 1.25]),
+        build_update('we"ird', [1020], [3.0]),
+    ])
+    assert json.loads(frame) == {"type": "ticks", "ticks": [
+        {"asset": "BTC", "price": 1.5, "time": 1000},
+        {"asset": "BTC", "price": 1.25, "time": 1010},
+        {"asset": 'we"ird', "price": 3.0, "time": 1020},
+    ]}
+
+
+def test_publish_groups_a_flush_per_watched_asset(monkeypatch):
+    delivered = []
+    monkeypatch.setattr(market_hub, "topics", lambda: ["BTC"])
+    monkeypatch.setattr(market_hub, "publish_batch", delivered.append)
+
+    now = datetime(2024, 1, 2, 12, 0)
+    MarketFeed().publish_ticks([
+        {"asset_name": "BTC", "price": 1.0, "timestamp": now},
+        {"asset_name": "ETH", "price": 2.0, "timestamp": now},   # nobody watches ETH
+        {"asset_name": "BTC", "price": 3.0, "timestamp": now + timedelta(seconds=1)},
+    ])
+
+    [batch] = delivered
+    assert list(batch) == ["BTC"]
+    assert batch["BTC"].prices == [1.0, 3.0]
+    assert batch["BTC"].times == [epoch_ms(now), epoch_ms(now) + 1000]
@@ -0,0 +1,22 @@
+"""market_schema.py - client timestamps"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from pydantic import ValidationError
+
+from app.schemas.market_schema import MarketInput
+
+
+def test_timestamp_is_optional():
+    assert MarketInput(asset_name="BTC", price=1.0).timestamp is None
+
+
+def test_aware_timestamp_becomes_naive_utc():
+    tick = MarketInput(asset_name="BTC", price=1.0, timestamp="2024-01-02T14:00:00+02:00")
+    assert tick.timestamp == datetime(2024, 1, 2, 12, 0)
+
+
+def test_future_timestamp_is_rejected():
+    with pytest.raises(ValidationError):
+        MarketInput(asset_name="BTC", price=1.0, timestamp=datetime.now(timezone.utc) + timedelta(minutes=1))
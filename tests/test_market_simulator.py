@@ -0,0 +1,127 @@
+"""market_simulator.py - tick counts, timing and price paths of one step"""
+
+import threading
+
+import numpy as np
+import pytest
+
+from app.services import market_simulator
+from app.services.market_simulator import FileSink, MarketSimulator, SECONDS_PER_YEAR
+from app.services.tick_ingestor import TickIngestor
+
+
+class ListSink:
+    def __init__(self):
+        self.ticks = []
+        self.closed = False
+
+    def write(self, assets, prices, timestamps):
+        self.ticks += list(zip(assets.tolist(), prices.tolist(), timestamps.tolist()))
+
+    def close(self):
+        self.closed = True
+
+
+def make_simulator(sink, tick_rate=(10.0, 1.0), volatility=0.5, seed=7):
+    return MarketSimulator(
+        ["BTC", "ETH"], [100.0, 10.0], 0.0, volatility, list(tick_rate), sink, seed=seed
+    )
+
+
+def ticks_of(sink, asset):
+    return [(price, ts) for name, price, ts in sink.ticks if name == asset]
+
+
+def test_step_emits_ticks_due():
+    sink = ListSink()
+    simulator = make_simulator(sink)
+
+    # one tick each is due right away, then rate * elapsed
+    assert simulator.step(1.0, now=1000.0) == 11 + 2
+    assert simulator.step(0.05, now=1000.05) == 0
+    assert simulator.step(0.05, now=1000.1) == 1   # 0.1 s at 10/s = one BTC tick
+    assert simulator.ticks_emitted == 14
+
+
+def test_fractional_ticks_carry_over():
+    sink = ListSink()
+    simulator = make_simulator(sink, tick_rate=(3.0, 0.5))
+    simulator.step(0.0)
+    sink.ticks.clear()
+
+    for i in range(1000):
+        simulator.step(0.01, now=float(i))
+    assert len(ticks_of(sink, "BTC")) == 30
+    assert len(ticks_of(sink, "ETH")) == 5
+
+
+def test_tick_times_are_spaced_and_end_now():
+    sink = ListSink()
+    simulator = make_simulator(sink)
+    simulator.step(1.0, now=1000.0)
+
+    times = [ts for _, ts in ticks_of(sink, "BTC")]
+    np.testing.assert_allclose(np.diff(times), 0.1)
+    assert times[-1] == pytest.approx(1000.0)
+
+    # the next step continues from the last price of each asset
+    last = {name: price for name, price, _ in sink.ticks}
+    assert simulator.prices.tolist() == [last["BTC"], last["ETH"]]
+
+
+def test_same_seed_same_prices():
+    first, second = ListSink(), ListSink()
+    make_simulator(first).step(2.0, now=0.0)
+    make_simulator(second).step(2.0, now=0.0)
+    assert first.ticks == second.ticks
+
+
+def test_volatility_matches_settings():
+    sink = ListSink()
+    simulator = make_simulator(sink, tick_rate=(100.0, 100.0), volatility=0.8)
+    simulator.step(200.0, now=0.0)
+
+    prices = np.array([price for price, _ in ticks_of(sink, "BTC")])
+    per_tick = np.std(np.diff(np.log(prices)))
+    yearly = per_tick * np.sqrt(100.0 * SECONDS_PER_YEAR)
+    assert yearly == pytest.approx(0.8, rel=0.05)
+
+
+def test_rate_must_be_positive():
+    with pytest.raises(ValueError):
+        make_simulator(ListSink(), tick_rate=(1.0, 0.0))
+
+
+def test_run_closes_the_sink(tmp_path):
+    path = tmp_path / "ticks.csv"
+    sink = FileSink(str(path))
+    simulator = make_simulator(sink)
+    simulator.step_interval = 0.01
+
+    stop = threading.Event()
+    thread = threading.Thread(target=simulator.run, args=(stop,))
+    thread.start()
+    stop.wait(0.1)
+    stop.set()
+    thread.join()
+
+    assert sink.file.closed
+    lines = path.read_text().splitlines()
+    assert lines[0] == "asset_name,price,timestamp"
+    assert len(lines) - 1 == simulator.ticks_emitted
+
+
+def test_hub_sink_feeds_the_tick_listeners(monkeypatch):
+    ingestor = TickIngestor()
+    received = []
+    ingestor.add_listener(received.extend)
+    monkeypatch.setattr(market_simulator, "tick_ingestor", ingestor)
+
+    simulator = make_simulator(market_simulator.HubSink())
+    simulator.step(1.0, now=1_700_000_000.0)
+    simulator.step(1.0, now=1_700_000_001.0)
+
+    assert len(received) == simulator.ticks_emitted
+    assert len({tick["id"] for tick in received}) == len(received)
+    assert {tick["asset_name"] for tick in received} == {"BTC", "ETH"}
+    assert ingestor.queue.qsize() == 0   # nothing written to the database
@@ -0,0 +1,96 @@
+"""partition_service.py - partition ranges, names and bounds (no database)"""
+
+from datetime import datetime
+
+import pytest
+
+from app.services import partition_service as module
+from app.services.partition_service import (
+    BOUND_PATTERN, ensure_history_partitions, ensure_partitions, month_start, next_month,
+    partition_name, period_start,
+)
+
+
+class RecordingSession:
+    """answers the catalog queries from a list of partitions, records the DDL"""
+
+    def __init__(self, partitions=()):
+        self.partitions = list(partitions)   # (name, start, end)
+        self.sql = []
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        self.sql.append(sql)
+        session = self
+
+        class Result:
+            def all(self):
+                if "pg_inherits" in sql:
+                    return [
+                        (name, f"FOR VALUES FROM ('{start}') TO ('{end}')")
+                        for name, start, end in session.partitions
+                    ]
+                return []
+
+            def first(self):
+                return None   # nothing stray in the default partition
+        return Result()
+
+
+def test_period_start_day_and_week(monkeypatch):
+    moment = datetime(2026, 10, 15, 17, 30, 5)   # a Thursday
+    assert period_start(moment) == datetime(2026, 10, 15)
+
+    monkeypatch.setattr(module, "INTERVAL", "week")
+    assert period_start(moment) == datetime(2026, 10, 12)
+    assert module.interval_length().days == 7
+
+
+def test_unknown_interval(monkeypatch):
+    monkeypatch.setattr(module, "INTERVAL", "hour")
+    with pytest.raises(ValueError):
+        module.interval_length()
+
+
+def test_names_and_months():
+    assert partition_name(datetime(2026, 1, 5)) == "market_prices_p20260105"
+    assert month_start(datetime(2026, 1, 31, 23, 59)) == datetime(2026, 1, 1)
+    assert next_month(datetime(2026, 1, 1)) == datetime(2026, 2, 1)
+    assert next_month(datetime(2026, 12, 1)) == datetime(2027, 1, 1)
+
+
+def test_bound_pattern():
+    bound = "FOR VALUES FROM ('2026-10-18 00:00:00') TO ('2026-10-19 00:00:00')"
+    start, end = (datetime.fromisoformat(value) for value in BOUND_PATTERN.search(bound).groups())
+    assert (start, end) == (datetime(2026, 10, 18), datetime(2026, 10, 19))
+    assert BOUND_PATTERN.search("DEFAULT") is None
+
+
+def test_ensure_partitions_creates_missing_days_ahead(monkeypatch):
+    monkeypatch.setattr(module, "PARTITIONS_AHEAD", 3)
+    db = RecordingSession([("market_prices_p20261019", datetime(2026, 10, 19), datetime(2026, 10, 20))])
+
+    created = ensure_partitions(db, now=datetime(2026, 10, 18, 12, 0))
+
+    assert created == ["market_prices_p20261018", "market_prices_p20261020", "market_prices_p20261021"]
+    assert "pg_advisory_xact_lock" in db.sql[0]   # locked before anything is read
+    assert "FROM ('2026-10-21 00:00:00') TO ('2026-10-22 00:00:00')" in db.sql[-1]
+
+
+def test_ensure_partitions_skips_overlapping_ranges(monkeypatch):
+    # a weekly partition from an earlier setting still covers these days
+    monkeypatch.setattr(module, "PARTITIONS_AHEAD", 1)
+    db = RecordingSession([("market_prices_p20261012", datetime(2026, 10, 12), datetime(2026, 10, 19))])
+
+    assert ensure_partitions(db, now=datetime(2026, 10, 18)) == ["market_prices_p20261019"]
+
+
+def test_history_partitions_are_monthly():
+    db = RecordingSession()
+    created = ensure_history_partitions(db, datetime(2025, 11, 20, 8, 0), datetime(2026, 2, 10))
+
+    assert created == [
+        "market_prices_m202511", "market_prices_m202512", "market_prices_m202601", "market_prices_m202602",
+    ]
+    # the last month is cut short where the daily partitions begin
+    assert "FROM ('2026-02-01 00:00:00') TO ('2026-02-10 00:00:00')" in db.sql[-1]
@@ -0,0 +1,70 @@
+"""password_util.py / password_service.py - bcrypt hashes and upgrading legacy ones"""
+
+import hashlib
+
+import pytest
+
+from app.services.password_service import PasswordBusy, PasswordService
+from app.utils.password_util import hash_password, needs_rehash, verify_password
+
+# the cheapest cost bcrypt allows, so the tests stay fast
+ROUNDS = 4
+
+
+def legacy_hash(password: str) -> str:
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def test_bcrypt_round_trip():
+    hashed = hash_password("secret", ROUNDS)
+    assert hashed.startswith("$2b$04$")
+    assert verify_password("secret", hashed)
+    assert not verify_password("Secret", hashed)
+    assert hash_password("secret", ROUNDS) != hashed   # salted
+
+
+def test_legacy_hash_still_verifies():
+    assert verify_password("secret", legacy_hash("secret"))
+    assert not verify_password("other", legacy_hash("secret"))
+
+
+def test_needs_rehash():
+    assert needs_rehash(legacy_hash("secret"), ROUNDS)
+    assert not needs_rehash(hash_password("secret", ROUNDS), ROUNDS)
+    assert needs_rehash(hash_password("secret", ROUNDS), ROUNDS + 1)
+    assert needs_rehash("garbage", ROUNDS)
+
+
+def test_unknown_hash_does_not_verify():
+    assert not verify_password("secret", "$2b$xx$not-a-real-hash")
+
+
+def test_long_passwords_use_first_72_bytes():
+    hashed = hash_password("a" * 72, ROUNDS)
+    assert verify_password("a" * 72 + "ignored", hashed)
+
+
+@pytest.mark.asyncio
+async def test_login_upgrades_legacy_hash():
+    service = PasswordService(workers=1, rounds=ROUNDS)
+    try:
+        matches, new_hash = await service.verify("secret", legacy_hash("secret"))
+        assert matches and new_hash.startswith("$2b$04$")
+        assert verify_password("secret", new_hash)
+
+        # already current: nothing to store
+        assert await service.verify("secret", new_hash) == (True, None)
+        assert await service.verify("wrong", legacy_hash("secret")) == (False, None)
+        assert (service.stats()["rehashed"], service.stats()["failed"]) == (1, 1)
+    finally:
+        service.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_full_queue_is_refused():
+    service = PasswordService(workers=1, max_pending=0, rounds=ROUNDS)
+    try:
+        with pytest.raises(PasswordBusy):
+            await service.hash("secret")
+    finally:
+        service.shutdown()
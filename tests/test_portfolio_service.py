@@ -0,0 +1,69 @@
+"""portfolio_service.py - duplicate changes merged before the upsert"""
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.schemas.portfolio_schema import PortfolioCreate
+from app.services.portfolio_service import merge_changes, upsert_positions
+
+
+def changes(*pairs):
+    return [PortfolioCreate(asset_name=asset_name, quantity=quantity) for asset_name, quantity in pairs]
+
+
+def test_add_sums_duplicates():
+    merged = merge_changes(changes(("BTC", 1.0), ("ETH", 2.0), ("BTC", 0.5)), "add")
+    assert merged == {"BTC": 1.5, "ETH": 2.0}
+
+
+def test_set_keeps_last():
+    merged = merge_changes(changes(("BTC", 1.0), ("BTC", 3.0), ("ETH", 2.0)), "set")
+    assert merged == {"BTC": 3.0, "ETH": 2.0}
+
+
+def test_empty():
+    assert merge_changes([], "add") == {}
+
+
+class RecordingSession:
+    """captures the statement instead of running it"""
+
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, statement, execution_options=None):
+        self.statements.append(statement)
+
+        class Result:
+            def scalars(self):
+                return self
+
+            def all(self):
+                return []
+        return Result()
+
+    async def commit(self):
+        pass
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode, update", [
+    ("add", "quantity = (portfolio.quantity + excluded.quantity)"),
+    ("set", "quantity = excluded.quantity"),
+])
+async def test_one_upsert_per_batch(mode, update):
+    db = RecordingSession()
+    await upsert_positions(db, 1, changes(("BTC", 1.0), ("BTC", 2.0), ("ETH", 1.0)), mode)
+
+    assert len(db.statements) == 1
+    sql = str(db.statements[0].compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (user_id, asset_name) DO UPDATE" in sql
+    assert update in sql
+    assert sql.count("VALUES") == 1 and sql.count("%(user_id_m") == 2   # two rows after merging
+
+
+@pytest.mark.asyncio
+async def test_nothing_to_write():
+    db = RecordingSession()
+    assert await upsert_positions(db, 1, [], "add") == []
+    assert db.statements == []
@@ -0,0 +1,84 @@
+"""price_cache.py - ring buffer wraparound and read order"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app.services.price_cache import CachedPrice, PriceCache, TickRing, from_epoch, to_epoch
+
+
+def test_ring_before_it_is_full():
+    ring = TickRing(4)
+    for i in range(3):
+        ring.append(i, 100.0 + i, 1.0 + i)
+
+    assert ring.count == 3
+    ids, timestamps, prices = ring.ordered()
+    assert ids.tolist() == [0, 1, 2]
+    assert ring.ids[ring.newest_indexes(2)].tolist() == [2, 1]
+    assert ring.ids[ring.newest_indexes(10)].tolist() == [2, 1, 0]
+
+
+def test_ring_wraps_around():
+    ring = TickRing(4)
+    for i in range(11):
+        ring.append(i, 100.0 + i, 1.0 + i)
+
+    assert ring.count == 4
+    ids, timestamps, prices = ring.ordered()
+    assert ids.tolist() == [7, 8, 9, 10]   # oldest first, oldest ones overwritten
+    assert timestamps.tolist() == [107.0, 108.0, 109.0, 110.0]
+    assert prices.tolist() == [8.0, 9.0, 10.0, 11.0]
+    assert ring.ids[ring.newest_indexes(3)].tolist() == [10, 9, 8]
+
+    # copies, not views into the ring
+    ids[:] = -1
+    assert ring.ordered()[0].tolist() == [7, 8, 9, 10]
+
+
+def test_epoch_round_trip():
+    moment = datetime(2024, 1, 2, 12, 30, 15, 123000)
+    assert from_epoch(to_epoch(moment)) == moment
+
+
+def ticks(asset_name, start, prices):
+    return [
+        {"id": i, "asset_name": asset_name, "price": price, "timestamp": start + timedelta(seconds=i)}
+        for i, price in enumerate(prices)
+    ]
+
+
+def rows(asset_name, start, prices):
+    """like the DB query result: newest first"""
+    return [CachedPrice(**tick) for tick in reversed(ticks(asset_name, start, prices))]
+
+
+def test_cache_latest_and_series():
+    cache = PriceCache(depth=5)
+    start = datetime(2024, 1, 2, 12, 0)
+    cache.add_ticks(ticks("BTC", start, [float(p) for p in range(8)]))
+
+    latest = cache.latest("BTC", 3)
+    assert [tick.price for tick in latest] == [7.0, 6.0, 5.0]
+    assert latest[0].timestamp == start + timedelta(seconds=7)
+    assert cache.latest_price("BTC").price == 7.0
+
+    timestamps, prices = cache.series("BTC")
+    assert prices.tolist() == [3.0, 4.0, 5.0, 6.0, 7.0]
+    assert np.all(np.diff(timestamps) == 1.0)
+
+    assert cache.latest("ETH") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_fill_does_not_overwrite_live_ticks():
+    cache = PriceCache(depth=5)
+    start = datetime(2024, 1, 2, 12, 0)
+    cache.add_ticks(ticks("BTC", start, [1.0]))
+
+    # rows loaded from the DB (newest first) arrive after a live tick
+    cache.fill("BTC", rows("BTC", start - timedelta(hours=1), [9.0, 8.0]))
+    assert [tick.price for tick in cache.latest("BTC")] == [1.0]
+
+    cache.fill("ETH", rows("ETH", start, [1.0, 2.0, 3.0]))
+    assert [tick.price for tick in cache.latest("ETH")] == [3.0, 2.0, 1.0]
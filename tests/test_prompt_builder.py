@@ -0,0 +1,61 @@
+"""prompt_builder.py - summaries and prompts stay the same size for any amount of history"""
+
+import numpy as np
+import pytest
+
+from app.services.prompt_builder import SUMMARY_BUCKETS, SUMMARY_POINTS, build_summary_prompt, summarize_series
+from app.utils.indicators import SECONDS_PER_YEAR
+
+
+def gbm(n, step_seconds, volatility=0.6, seed=9):
+    rng = np.random.default_rng(seed)
+    timestamps = 1.7e9 + np.arange(n) * step_seconds
+    per_step = volatility * np.sqrt(step_seconds / SECONDS_PER_YEAR)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, per_step, n)))
+    return timestamps, prices
+
+
+@pytest.mark.parametrize("n", [50, 10_000, 500_000])
+def test_summary_has_fixed_size(n):
+    timestamps, prices = gbm(n, 1.0)
+    summary = summarize_series(timestamps, prices)
+
+    assert summary["count"] == n
+    assert summary["ohlc"].shape == (SUMMARY_BUCKETS, 5)
+    assert len(summary["sample"]) == SUMMARY_POINTS
+    assert summary["sample"][-1] == summary["last"] == prices[-1]
+
+
+def test_ohlc_buckets_cover_the_series():
+    timestamps, prices = gbm(10_000, 1.0)
+    ohlc = summarize_series(timestamps, prices)["ohlc"]
+
+    assert ohlc[0, 1] == prices[0]                  # first open
+    assert ohlc[-1, 4] == prices[-1]                # last close
+    assert ohlc[:, 2].max() == prices.max()
+    assert ohlc[:, 3].min() == prices.min()
+    assert np.all(np.diff(ohlc[:, 0]) > 0)
+
+
+def test_short_series():
+    summary = summarize_series([1.7e9, 1.7e9 + 1], [10.0, 11.0])
+    assert summary["ohlc"].shape[0] <= 2
+    assert summary["change_pct"] == pytest.approx(10.0)
+    assert summary["volatility"] == 0.0
+
+
+def test_volatility_across_mixed_spacing():
+    # hourly candle closes, then ticks a second apart - same process
+    hourly_t, hourly_p = gbm(720, 3600.0, seed=1)
+    ticks_t, ticks_p = gbm(3000, 1.0, seed=2)
+    timestamps = np.concatenate([hourly_t, hourly_t[-1] + 1 + (ticks_t - ticks_t[0])])
+    prices = np.concatenate([hourly_p, hourly_p[-1] / ticks_p[0] * ticks_p])
+
+    assert summarize_series(timestamps, prices)["volatility"] == pytest.approx(0.6, rel=0.1)
+
+
+def test_prompt_size_does_not_grow():
+    small = build_summary_prompt("BTC", *gbm(100, 1.0), "Low Risk")
+    large = build_summary_prompt("BTC", *gbm(200_000, 1.0), "Low Risk")
+    assert abs(len(large) - len(small)) < 100
+    assert "Asset: BTC" in large and "Risk level: Low Risk" in large
@@ -0,0 +1,83 @@
+"""risk_utils.py - VaR / CVaR / volatility, plus the drawdown used by the risk engine"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.services.price_cache import CachedPrice
+from app.utils.indicators import max_drawdown
+from app.utils.risk_utils import calculate_risk, portfolio_metrics, risk_label, risk_metrics
+
+
+@pytest.fixture
+def returns():
+    rng = np.random.default_rng(6)
+    return rng.normal(0.0005, 0.02, size=(20000, 3)) * [1.0, 2.0, 0.5]
+
+
+def test_historical_var_and_cvar_per_column(returns):
+    metrics = risk_metrics(returns, confidence=0.95)
+
+    for col in range(returns.shape[1]):
+        column = returns[:, col]
+        cutoff = np.quantile(column, 0.05)
+        assert metrics["var_historical"][col] == pytest.approx(-cutoff)
+        assert metrics["cvar_historical"][col] == pytest.approx(-column[column <= cutoff].mean())
+        assert metrics["volatility"][col] == pytest.approx(column.std(ddof=1))
+
+    # CVaR is the average of the tail, so never smaller than VaR
+    assert np.all(metrics["cvar_historical"] >= metrics["var_historical"])
+
+
+def test_parametric_matches_historical_for_normal_returns(returns):
+    metrics = risk_metrics(returns)
+    np.testing.assert_allclose(metrics["var_parametric"], metrics["var_historical"], rtol=0.05)
+    np.testing.assert_allclose(metrics["cvar_parametric"], metrics["cvar_historical"], rtol=0.05)
+
+
+def test_one_dimensional_input():
+    metrics = risk_metrics(np.array([-0.03, -0.01, 0.0, 0.01, 0.02]))
+    assert metrics["var_historical"].shape == (1,)
+
+
+def test_single_asset_portfolio_equals_asset(returns):
+    single = portfolio_metrics(returns[:, :1], [1.0])
+    asset = risk_metrics(returns[:, 0])
+    for name, values in asset.items():
+        assert single[name] == pytest.approx(values[0])
+
+
+def test_portfolio_volatility_from_covariance(returns):
+    weights = np.array([0.5, 0.3, 0.2])
+    metrics = portfolio_metrics(returns, weights)
+    assert metrics["volatility"] == pytest.approx((returns @ weights).std(ddof=1), rel=1e-6)
+
+    # diversified: less than the weighted sum of the volatilities
+    assert metrics["volatility"] < weights @ returns.std(axis=0, ddof=1)
+
+
+def test_risk_labels():
+    assert risk_label(0.1).startswith("Low Risk")
+    assert risk_label(0.5).startswith("Medium Risk")
+    assert risk_label(0.9).startswith("High Risk")
+
+
+def prices_every_second(values):
+    start = datetime(2024, 1, 2)
+    ticks = [CachedPrice(i, "BTC", value, start + timedelta(seconds=i)) for i, value in enumerate(values)]
+    return ticks[::-1]   # newest first, like the database
+
+
+def test_calculate_risk_is_scale_free():
+    rng = np.random.default_rng(8)
+    path = np.exp(np.cumsum(rng.normal(0, 1e-5, 200)))
+
+    # same % moves at $1 and $40,000 - same label
+    assert calculate_risk(prices_every_second(path)) == calculate_risk(prices_every_second(path * 40000))
+    assert calculate_risk(prices_every_second([1.0, 2.0])) == "Low Risk (Not enough data)"
+
+
+def test_max_drawdown():
+    assert max_drawdown(np.array([100.0, 120.0, 90.0, 130.0, 117.0])) == pytest.approx(90 / 120 - 1)
+    assert max_drawdown(np.array([1.0, 2.0, 3.0])) == 0.0
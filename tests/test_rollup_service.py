@@ -0,0 +1,59 @@
+"""rollup_service.py - candles from a batch of ticks, checked against a plain recompute"""
+
+import random
+from datetime import datetime, timedelta
+
+from app.services.rollup_service import RESOLUTIONS, aggregate_ticks, bucket_floor
+
+
+def test_bucket_floor():
+    timestamp = datetime(2024, 1, 2, 13, 47, 31, 500)
+    assert bucket_floor(timestamp, RESOLUTIONS["1m"]) == datetime(2024, 1, 2, 13, 47)
+    assert bucket_floor(timestamp, RESOLUTIONS["5m"]) == datetime(2024, 1, 2, 13, 45)
+    assert bucket_floor(timestamp, RESOLUTIONS["1h"]) == datetime(2024, 1, 2, 13, 0)
+    assert bucket_floor(timestamp, RESOLUTIONS["1d"]) == datetime(2024, 1, 2)
+
+
+def test_candles_match_recompute():
+    rng = random.Random(5)
+    start = datetime(2024, 1, 2, 23, 50)
+    ticks = [
+        {"asset_name": rng.choice(["BTC", "ETH"]), "price": rng.uniform(90, 110),
+         "timestamp": start + timedelta(seconds=rng.uniform(0, 1200))}
+        for _ in range(3000)
+    ]
+    rng.shuffle(ticks)   # out of order within the batch
+
+    candles = {
+        (candle["asset_name"], candle["resolution"], candle["bucket_start"]): candle
+        for candle in aggregate_ticks(ticks)
+    }
+
+    expected = {}
+    for tick in ticks:
+        for resolution, seconds in RESOLUTIONS.items():
+            key = (tick["asset_name"], resolution, bucket_floor(tick["timestamp"], seconds))
+            expected.setdefault(key, []).append(tick)
+
+    assert candles.keys() == expected.keys()
+    for key, bucket in expected.items():
+        in_order = sorted(bucket, key=lambda tick: tick["timestamp"])
+        prices = [tick["price"] for tick in bucket]
+        candle = candles[key]
+        assert candle["open"] == in_order[0]["price"]
+        assert candle["close"] == in_order[-1]["price"]
+        assert candle["high"] == max(prices)
+        assert candle["low"] == min(prices)
+        assert candle["volume"] == len(bucket)
+        assert candle["first_tick_at"] == in_order[0]["timestamp"]
+        assert candle["last_tick_at"] == in_order[-1]["timestamp"]
+
+    # the batch crosses midnight: two daily candles per asset
+    assert {key[2] for key in candles if key[1] == "1d"} == {datetime(2024, 1, 2), datetime(2024, 1, 3)}
+
+
+def test_same_timestamp_keeps_last_arrival_as_close():
+    timestamp = datetime(2024, 1, 2, 12, 0)
+    ticks = [{"asset_name": "BTC", "price": price, "timestamp": timestamp} for price in (1.0, 3.0, 2.0)]
+    candle = next(c for c in aggregate_ticks(ticks) if c["resolution"] == "1m")
+    assert (candle["open"], candle["high"], candle["low"], candle["close"]) == (1.0, 3.0, 1.0, 2.0)
@@ -0,0 +1,77 @@
+"""tick_ingestor.py - all-or-nothing queueing and the late-tick filter (no database)"""
+
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.tick_ingestor import IngestQueueFull, TickIngestor
+
+
+def test_submit_many_is_all_or_nothing():
+    ingestor = TickIngestor(max_queue_size=10)
+    assert ingestor.submit_many([("BTC", 1.0, None)] * 6) == 6
+
+    with pytest.raises(IngestQueueFull):
+        ingestor.submit_many([("BTC", 2.0, None)] * 5)
+
+    assert ingestor.queue.qsize() == 6
+    assert ingestor.stats()["submitted"] == 6
+
+
+def test_concurrent_producers_never_half_enqueue():
+    ingestor = TickIngestor(max_queue_size=1000)
+    accepted, refused = [], []
+    start = threading.Barrier(8)
+
+    def producer():
+        start.wait()
+        for _ in range(20):
+            try:
+                accepted.append(ingestor.submit_many([("ETH", 1.0, None)] * 30))
+            except IngestQueueFull:
+                refused.append(30)
+
+    threads = [threading.Thread(target=producer) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # 33 batches of 30 fit in 1000, every other batch was refused whole
+    assert ingestor.queue.qsize() == sum(accepted) == 990
+    assert len(refused) == 8 * 20 - 33
+
+
+def test_queue_full_on_submit():
+    ingestor = TickIngestor(max_queue_size=1)
+    ingestor.submit("BTC", 1.0)
+    with pytest.raises(IngestQueueFull):
+        ingestor.submit("BTC", 2.0)
+
+
+def test_late_ticks_are_not_live():
+    ingestor = TickIngestor()
+    now = datetime(2024, 1, 2, 12, 0)
+    ingestor.mark_seen("BTC", now)
+
+    ticks = [
+        {"asset_name": "BTC", "price": 1.0, "timestamp": now - timedelta(seconds=5)},   # back-filled
+        {"asset_name": "BTC", "price": 2.0, "timestamp": now},                          # same time is live
+        {"asset_name": "ETH", "price": 3.0, "timestamp": now - timedelta(days=1)},      # first ETH tick
+        {"asset_name": "BTC", "price": 4.0, "timestamp": now + timedelta(seconds=1)},
+        {"asset_name": "BTC", "price": 5.0, "timestamp": now + timedelta(milliseconds=500)},  # out of order
+    ]
+    live = ingestor._live_ticks(ticks)
+
+    assert [tick["price"] for tick in live] == [2.0, 3.0, 4.0]
+    assert ingestor.stats()["late"] == 2
+    assert ingestor.latest["BTC"] == now + timedelta(seconds=1)
+
+
+def test_remote_ticks_count_as_seen():
+    ingestor = TickIngestor()
+    now = datetime(2024, 1, 2, 12, 0)
+    ingestor.observe([{"asset_name": "SOL", "price": 1.0, "timestamp": now}])
+
+    assert ingestor._live_ticks([{"asset_name": "SOL", "price": 2.0, "timestamp": now - timedelta(seconds=1)}]) == []
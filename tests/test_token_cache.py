@@ -0,0 +1,91 @@
+"""token_cache.py - verified-token cache, expiry and the revocation denylist"""
+
+import time
+from datetime import datetime, timedelta
+
+from jose import jwt
+
+from app.auth import token_cache as module
+from app.auth.token_cache import TokenCache
+from app.utils.jwt_util import ALGORITHM, SECRET_KEY, create_jwt_token, decode_jwt_token
+
+
+def test_second_check_is_a_hit():
+    cache = TokenCache()
+    token = create_jwt_token({"user_id": 1})
+
+    first = cache.verify(token)
+    assert first["user_id"] == 1
+    assert cache.verify(token) == first
+    assert (cache.stats()["misses"], cache.stats()["hits"]) == (1, 1)
+
+
+def test_bad_and_expired_tokens_are_rejected():
+    cache = TokenCache()
+    expired = jwt.encode(
+        {"user_id": 1, "exp": datetime.utcnow() - timedelta(seconds=1)}, SECRET_KEY, algorithm=ALGORITHM
+    )
+    assert cache.verify(expired) is None
+    assert cache.verify("not-a-token") is None
+    assert cache.stats()["rejected"] == 2
+    assert cache.stats()["cached_tokens"] == 0
+
+
+def test_cached_token_is_dropped_at_its_exp(monkeypatch):
+    cache = TokenCache()
+    token = create_jwt_token({"user_id": 1})
+    exp = cache.verify(token)["exp"]
+
+    # one second after exp the cached payload is not trusted any more
+    monkeypatch.setattr(module.time, "time", lambda: exp + 1)
+    monkeypatch.setattr(module, "decode_jwt_token", lambda token: None)
+    assert cache.verify(token) is None
+    assert cache.stats()["misses"] == 2
+    assert cache.stats()["cached_tokens"] == 0
+
+
+def test_lru_size_limit():
+    cache = TokenCache(size=2)
+    tokens = [create_jwt_token({"user_id": i}) for i in range(3)]
+    for token in tokens:
+        cache.verify(token)
+    assert cache.stats()["cached_tokens"] == 2
+
+
+def test_revoke_one_token():
+    cache = TokenCache()
+    token, other = create_jwt_token({"user_id": 1}), create_jwt_token({"user_id": 1})
+
+    cache.revoke(cache.verify(token))
+    assert cache.verify(token) is None
+    assert cache.verify(other) is not None
+
+
+def test_revoke_user_keeps_newer_tokens():
+    cache = TokenCache()
+    old = create_jwt_token({"user_id": 1})
+    someone_else = create_jwt_token({"user_id": 2})
+    cache.verify(old)
+
+    cache.revoke_user(1)
+    time.sleep(0.001)
+    new = create_jwt_token({"user_id": 1})
+
+    assert cache.verify(old) is None
+    assert cache.verify(new) is not None
+    assert cache.verify(someone_else) is not None
+
+
+def test_denylist_purged_after_expiry(monkeypatch):
+    cache = TokenCache()
+    payload = decode_jwt_token(create_jwt_token({"user_id": 1}))
+    cache.revoke(payload)
+    cache.revoke_user(1)
+    assert cache.stats()["revoked_tokens"] == 1
+
+    later = payload["exp"] + module.TOKEN_EXPIRY_MINUTES * 60 + module.PURGE_INTERVAL + 1
+    monkeypatch.setattr(module.time, "time", lambda: later)
+    cache.revoke_user(2, before=later)
+
+    stats = cache.stats()
+    assert (stats["revoked_tokens"], stats["revoked_users"]) == (0, 1)
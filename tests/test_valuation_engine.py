@@ -0,0 +1,80 @@
+"""valuation_engine.py - incremental totals match a full recompute"""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services import valuation_engine as module
+from app.services.valuation_engine import ValuationEngine
+
+
+def tick(asset_name, price, timestamp):
+    return {"asset_name": asset_name, "price": price, "timestamp": timestamp}
+
+
+def test_totals_after_holdings_and_ticks():
+    engine = ValuationEngine()
+    now = datetime(2024, 1, 2, 12, 0)
+
+    engine.set_holding(1, "BTC", 2.0)
+    engine.set_holding(1, "ETH", 10.0)
+    engine.set_holding(2, "ETH", 1.0)
+    engine.add_ticks([tick("BTC", 100.0, now), tick("ETH", 10.0, now)])
+
+    assert engine.valuation(1)["total_value"] == pytest.approx(300.0)
+    assert engine.valuation(2)["total_value"] == pytest.approx(10.0)
+
+    engine.add_ticks([tick("ETH", 12.0, now + timedelta(seconds=1))])
+    assert engine.valuation(1)["total_value"] == pytest.approx(320.0)
+    assert engine.valuation(1)["change"] == pytest.approx(20.0)   # open is the first ETH price today
+
+    engine.set_holding(1, "BTC", 0.5)
+    valuation = engine.valuation(1)
+    assert valuation["total_value"] == pytest.approx(170.0)
+    assert {position["asset_name"] for position in valuation["positions"]} == {"BTC", "ETH"}
+
+    assert engine.valuation(99)["total_value"] == 0.0
+
+
+def test_new_day_resets_open():
+    engine = ValuationEngine()
+    day = datetime(2024, 1, 2, 23, 59)
+
+    engine.set_holding(1, "BTC", 1.0)
+    engine.add_ticks([tick("BTC", 100.0, day)])
+    engine.add_ticks([tick("BTC", 110.0, day + timedelta(minutes=2))])   # next UTC day
+
+    valuation = engine.valuation(1)
+    assert valuation["total_value"] == pytest.approx(110.0)
+    assert valuation["change"] == 0.0
+
+
+def test_growing_matrix_matches_recompute():
+    rng = random.Random(4)
+    engine = ValuationEngine()
+    now = datetime(2024, 1, 2, 12, 0)
+
+    # more users and assets than the initial matrix holds
+    users = range(module.INITIAL_USERS + 10)
+    assets = [f"SYM{i}" for i in range(module.INITIAL_ASSETS + 5)]
+    holdings = {}
+    prices = {}
+
+    for step in range(2000):
+        if rng.random() < 0.3:
+            user_id, asset_name = rng.choice(users), rng.choice(assets)
+            quantity = rng.choice([0.0, rng.uniform(0, 10)])
+            holdings[user_id, asset_name] = quantity
+            engine.set_holding(user_id, asset_name, quantity)
+        else:
+            asset_name = rng.choice(assets)
+            prices[asset_name] = rng.uniform(1, 1000)
+            engine.add_ticks([tick(asset_name, prices[asset_name], now + timedelta(milliseconds=step))])
+
+    for user_id in users:
+        expected = sum(
+            quantity * prices.get(asset_name, 0.0)
+            for (holder, asset_name), quantity in holdings.items() if holder == user_id
+        )
+        assert engine.valuation(user_id)["total_value"] == pytest.approx(expected, abs=0.01)